@@ -1,15 +1,20 @@
 import os
+import json
+import time
+import asyncio
 from fastapi import HTTPException
 
 # Fetch user requests with queue position and resume name
 from fastapi import Body
 from fastapi import FastAPI, UploadFile, File, Form, Query, Request
-from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from utils.candidate_resume_database import CandidateResumeDatabase
 from data.dbms_manager import DBManager
+from data.async_dbms import AsyncDBManager
+from utils.progress_store import RequestProgressStore
 
 app = FastAPI()
 
@@ -24,12 +29,13 @@ app.add_middleware(
 
 def initialize():
     info = []
-    global db, agent3, agent2, agent4, dbms
+    global db, agent3, agent2, agent4, dbms, adbms, progress_store
     db = None
     agent3 = None
     agent2 = None
     agent4 = None
     dbms = None
+    adbms = None
     try:
         db = CandidateResumeDatabase()
         info.append("CandidateResumeDatabase initialized successfully.")
@@ -42,6 +48,11 @@ def initialize():
         if dbms.test_connection() == False:
             print("Database connection failed. Server initialization terminated.")
             import sys; sys.exit(1)
+        dbms.ensure_schema()
+        # Handlers await this facade so blocking DB/file I/O never runs on the event loop
+        adbms = AsyncDBManager(dbms)
+        # Written by the workers, tailed by /user/request/stream
+        progress_store = RequestProgressStore()
     except Exception as e:
         info.append(f"DBManager failed: {e}")
         print("Database connection failed. Server initialization terminated.")
@@ -58,7 +69,7 @@ async def home():
 # API to fetch all user names
 @app.get("/users")
 async def get_users():
-    users = dbms.fetch_all_user_names()
+    users = await adbms.fetch_all_user_names()
     return JSONResponse({"users": users})
 
 # Login API
@@ -67,7 +78,7 @@ async def login(Name: str = Form(...), Pin: str = Form(...)):
     # Pin should be a 4-digit string
     if not (Pin.isdigit() and len(Pin) == 4):
         return JSONResponse({"success": False, "error": "Pin must be a 4-digit number."}, status_code=400)
-    success, user_id = dbms.verify_user_pin(Name, Pin)
+    success, user_id = await adbms.verify_user_pin(Name, Pin)
     if success:
         return JSONResponse({"success": True, "Id": user_id})
     else:
@@ -80,20 +91,63 @@ async def fetch_user_requests(payload: dict = Body(...)):
     n = payload.get("n")
     if not user_id or not isinstance(page_num, int) or not isinstance(n, int):
         return JSONResponse({"error": "user_id, page_num, and n are required."}, status_code=400)
-    entries = dbms.fetch_user_requests(user_id, page_num, n)
+    entries, total = await adbms.fetch_user_requests(user_id, page_num, n)
     # print(entries)
-    return JSONResponse({"requests": entries})
+    return JSONResponse({"requests": entries, "total": total})
 
 @app.post("/user/fetch/request/state")
 async def fetch_request_state(payload: dict = Body(...)):
     request_id = payload.get("request_id")
     if not request_id:
         raise HTTPException(status_code=400, detail="request_id is required.")
-    result = dbms.fetch_request_state(request_id)
+    result = await adbms.fetch_request_state(request_id)
     # print(result)
     if "error" in result:
         return JSONResponse({"success": False, "error": result["error"]}, status_code=404)
-    return JSONResponse({"success": True, "status": result["status"], "agents": result["agents"]})
+    return JSONResponse({"success": True, "status": result["status"], "agents": result["agents"], "stages": result["stages"]})
+
+# Statuses after which no worker will touch the request again
+STREAM_CLOSED_STATUSES = ("finished", "pending", "rejected", DBManager.DEAD_LETTER_STATUS)
+
+@app.get("/user/request/stream")
+async def stream_request_progress(request: Request, request_id: str = Query(...), after: int = Query(0)):
+    """
+    Server-sent events for one request: the current status, then per-agent progress and partial output as the
+    worker produces it. Reconnecting clients resume after the Last-Event-ID header (or `after`).
+    """
+    state = await adbms.fetch_request_state(request_id)
+    if "error" in state:
+        return JSONResponse({"success": False, "error": state["error"]}, status_code=404)
+    try:
+        last_seq = max(after, int(request.headers.get("last-event-id", 0) or 0))
+    except ValueError:
+        # Not an id this endpoint sent; replay from `after` rather than failing the reconnect
+        last_seq = after
+
+    async def events():
+        nonlocal last_seq
+        yield f"event: status\ndata: {json.dumps({'status': state['status']})}\n\n"
+        closed = state["status"] in STREAM_CLOSED_STATUSES
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            rows = await adbms.run(progress_store.read_since, request_id, last_seq)
+            for row in rows:
+                last_seq = row["seq"]
+                yield f"id: {row['seq']}\nevent: {row['event']}\ndata: {json.dumps(row, ensure_ascii=False, default=str)}\n\n"
+                if row["event"] in RequestProgressStore.TERMINAL_EVENTS:
+                    return
+            if closed and not rows:
+                # Already done before the client connected and the whole log has been replayed
+                return
+            if rows:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/user/request/delete")
 async def delete_user_request(payload: dict = Body(...)):
@@ -101,7 +155,7 @@ async def delete_user_request(payload: dict = Body(...)):
     if not request_id:
         return JSONResponse({"success": False, "error": "request_id is required."}, status_code=400)
     try:
-        success, error = dbms.delete_db_entry("tblRequests", request_id)
+        success, error = await adbms.delete_db_entry("tblRequests", request_id)
         if success:
             return JSONResponse({"success": True})
         else:
@@ -114,7 +168,7 @@ async def download_curated_resume(payload: dict = Body(...)):
     request_id = payload.get("request_id")
     if not request_id:
         return JSONResponse({"error": "request_id is required."}, status_code=400)
-    abs_file_path, resume_name = dbms.get_curated_resume(request_id)
+    abs_file_path, resume_name = await adbms.get_curated_resume(request_id)
     print(abs_file_path)
     if not abs_file_path or not os.path.exists(abs_file_path):
         return JSONResponse({"error": "Curated resume not found."}, status_code=404)
@@ -133,7 +187,7 @@ async def upload_resume(user_id: str = Form(...), file: UploadFile = File(...),
         file_bytes = await file.read()
         if ResumeId:
             # Update existing resume file and name
-            success, result = dbms.update_resume_file(
+            success, result = await adbms.update_resume_file(
                 ResumeId=ResumeId,
                 ResumeName=file_name,
                 file_bytes=file_bytes,
@@ -142,7 +196,7 @@ async def upload_resume(user_id: str = Form(...), file: UploadFile = File(...),
             action = "updated"
         else:
             # Use the original file_name for display, but save as ResumeId.docx
-            success, result = dbms.save_new_resume(
+            success, result = await adbms.save_new_resume(
                 UserId=user_id,
                 ResumeName=file_name,
                 file_bytes=file_bytes,
@@ -159,7 +213,7 @@ async def upload_resume(user_id: str = Form(...), file: UploadFile = File(...),
     
 @app.get("/resume/download")
 async def download_resume(ResumeId: str = Query(...)):
-    abs_file_path, resume_name = dbms.get_resume_file_info(ResumeId)
+    abs_file_path, resume_name = await adbms.get_resume_file_info(ResumeId)
     if not abs_file_path or not os.path.exists(abs_file_path):
         return JSONResponse({"error": "Resume not found."}, status_code=404)
     return FileResponse(
@@ -175,7 +229,7 @@ async def approve_user_request(payload: dict = Body(...)):
     agent4_updated = payload.get("agent4_updated")
     if not request_id or approve is None:
         return JSONResponse({"success": False, "error": "request_id and approve are required."}, status_code=400)
-    success, error = dbms.update_request_approval(request_id, approve, agent4_updated)
+    success, error = await adbms.update_request_approval(request_id, approve, agent4_updated)
     if success:
         msg = "Request approved." if approve else "Request rejected."
         return JSONResponse({"success": True, "message": msg})
@@ -184,7 +238,7 @@ async def approve_user_request(payload: dict = Body(...)):
 
 @app.post("/resume/rename")
 async def rename_resume(ResumeId: str = Form(...), new_name: str = Form(...)):
-    success = dbms.rename_resume(ResumeId, new_name)
+    success = await adbms.rename_resume(ResumeId, new_name)
     if success:
         return JSONResponse({"success": True, "message": "Resume renamed successfully."})
     else:
@@ -194,7 +248,7 @@ async def rename_resume(ResumeId: str = Form(...), new_name: str = Form(...)):
 async def list_resumes(user_id: str = Form(...), mode: str = Form("default")):
     # mode: "default" or "curated"
     is_curated = True if mode.lower() == "curated" else False
-    resumes = dbms.fetch_user_resumes(user_id, is_curated)
+    resumes = await adbms.fetch_user_resumes(user_id, is_curated)
     return JSONResponse({"resumes": resumes})
 
 @app.post("/resume/curate")
@@ -204,7 +258,7 @@ async def curate_resume_endpoint(payload: dict = Body(...)):
     job_desc = payload.get("job_desc")
     if not (resume_id and user_id and job_desc):
         return JSONResponse({"success": False, "error": "resume_id, user_id, and job_desc are required."}, status_code=400)
-    success, result = dbms.curate_new_resume(user_id, resume_id, job_desc)
+    success, result = await adbms.curate_new_resume(user_id, resume_id, job_desc)
     if not success:
         return JSONResponse({"success": False, "error": result}, status_code=500)
     return JSONResponse({"success": True, "curated_resume_id": result, "message": "Curated resume created and request queued."})
@@ -215,7 +269,7 @@ async def delete_resume(payload: dict = Body(...)):
     if not resume_id:
         return JSONResponse({"success": False, "error": "resume_id is required."}, status_code=400)
     try:
-        success, error = dbms.delete_db_entry("tblResume", resume_id)
+        success, error = await adbms.delete_db_entry("tblResume", resume_id)
         if success:
             return JSONResponse({"success": True})
         else:
@@ -224,6 +278,18 @@ async def delete_resume(payload: dict = Body(...)):
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
+@app.get("/requests/failed")
+async def list_failed_requests(user_id: str = Query(None), n: int = Query(100)):
+    """Dead-lettered requests: given up after DBManager.MAX_ATTEMPTS claims, with the last error."""
+    entries = await adbms.fetch_dead_letter_requests(user_id, n)
+    return JSONResponse({"requests": entries, "max_attempts": DBManager.MAX_ATTEMPTS})
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return JSONResponse({"db_pool": dbms.pool_stats(),
+                         "job_analysis_cache": await adbms.job_analysis_cache_stats()})
+
 
 if __name__ == "__main__":
     print("PEPPER ready to assist")
@@ -6,9 +6,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.wordparser import WordFileManager
 from utils.model_llm import ModelLLM
+from utils import model_registry
+from agents.prompt_builder import PromptBuilder
 
 class Agent2VirtualMe:
-    def __init__(self, OBJ_model:ModelLLM):
+    def __init__(self, OBJ_model:ModelLLM=None):
 
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
         self.system_prompt = (
@@ -41,20 +43,26 @@ class Agent2VirtualMe:
             "If a section is missing from the input, skip it in your output."
             "Ignore the 'TITLE' key from the provided resume json."
         )
-        self.OBJ_ModelLLM = OBJ_model
+        self.OBJ_ModelLLM = OBJ_model if OBJ_model is not None else model_registry.acquire_model()
+        self.OBJ_ModelLLM.register_prefix("Agent2", self.system_prompt)
         self.generation_args = {"max_new_tokens": 768, "temperature": 0.2, "do_sample": True}
+        # Constrains the model to exactly the JSON the system prompt asks for (see ModelLLM.query)
+        self.response_schema = {
+            "type": "object",
+            "properties": {
+                "title_impression": {"type": "string"},
+                "strengths": {"type": "array", "items": {"type": "string"}},
+                "resume_style": {"type": "string"},
+                "section_analysis": {"type": "object", "additionalProperties": {"type": "string"}}},
+            "required": ["title_impression", "strengths", "resume_style", "section_analysis"],
+            "additionalProperties": False}
+        self.OBJ_prompt = PromptBuilder(self.OBJ_ModelLLM, "Agent2", self.system_prompt, max_new_tokens=self.generation_args["max_new_tokens"])
 
     def build_prompt(self, resume_json: dict):
-        resume_str = json.dumps(resume_json, indent=2)
-        prompt = (
-            f"Resume JSON:\n{resume_str}\n\n"
-            "Return a single narrative summary of the candidate's strengths, technical areas, and unique professional themes."
-        )
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-        return messages
+        # Run formatting is noise for this agent and goes first when the prompt is over budget
+        return self.OBJ_prompt.build(
+            [{"label": "Resume JSON", "content": resume_json, "priority": 0, "drop_keys": ("formatting",)}],
+            instruction="Return a single narrative summary of the candidate's strengths, technical areas, and unique professional themes.")
 
     def parse_response(self, response:str):
         try:
@@ -68,10 +76,11 @@ class Agent2VirtualMe:
         return recruiter_result
     
 
-    def run(self, resume_json: dict):
+    def run(self, resume_json: dict, on_text=None):
         prompt = self.build_prompt(resume_json)
         
-        response = self.OBJ_ModelLLM.query(prompt, self.generation_args)
+        response = self.OBJ_ModelLLM.query(prompt, self.generation_args, on_text=on_text, response_schema=self.response_schema)
+        self.OBJ_prompt.log_usage(response)
         
         response = self.parse_response(response)
         return response
@@ -85,8 +94,8 @@ class Agent2VirtualMe:
 if __name__ == "__main__":
     # Example usage: parse a resume and generate a synopsis
     resume_path = r"d:\Career\Resume\Pradyumn_Pathak_Resume.docx"
-    OBJ = WordFileManager(resume_path)
-    OBJ_ModelLLM = ModelLLM()
+    OBJ_ModelLLM = model_registry.acquire_model()
+    OBJ = WordFileManager(resume_path, OBJ_ModelLLM)
     OBJ.read()
     resume_json = OBJ.export_json()  # returns dict
     agent = Agent2VirtualMe(OBJ_ModelLLM)
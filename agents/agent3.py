@@ -4,10 +4,12 @@ import json
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.model_llm import ModelLLM
+from utils import model_registry
+from agents.prompt_builder import PromptBuilder
 
 class Agent3Recruiter:
     
-    def __init__(self, OBJ_model:ModelLLM):
+    def __init__(self, OBJ_model:ModelLLM=None):
 
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
         self.system_prompt = (
@@ -25,11 +27,23 @@ class Agent3Recruiter:
             "Also include 'terminological' keywords that may be present in the job description, some examples can be things like 'end-to-end' 'under the hood', etc."
             "Ignore full sentences or soft skills. Output just a flat, comma-separated list of keywords.")
         
-        self.OBJ_ModelLLM = OBJ_model
+        self.OBJ_ModelLLM = OBJ_model if OBJ_model is not None else model_registry.acquire_model()
+        self.OBJ_ModelLLM.register_prefix("Agent3", self.system_prompt)
+        self.OBJ_ModelLLM.register_prefix("Agent3-ATS", self.ats_prompt)
         self.generation_args = {
             "max_new_tokens": 768,
             "temperature": 0.2,
             "do_sample": True}
+        # The recruiter answer is constrained to this JSON; the ATS answer stays a free comma-separated list
+        self.response_schema = {
+            "type": "object",
+            "properties": {
+                "must_haves": {"type": "array", "items": {"type": "string"}},
+                "good_to_haves": {"type": "array", "items": {"type": "string"}}},
+            "required": ["must_haves", "good_to_haves"],
+            "additionalProperties": False}
+        self.OBJ_prompt = PromptBuilder(self.OBJ_ModelLLM, "Agent3", self.system_prompt, max_new_tokens=self.generation_args["max_new_tokens"])
+        self.OBJ_ats_prompt = PromptBuilder(self.OBJ_ModelLLM, "Agent3-ATS", self.ats_prompt, max_new_tokens=self.generation_args["max_new_tokens"])
 
     def build_prompt(self, job_json, mode="recruiter"):
         company = job_json.get("company", None)
@@ -37,28 +51,20 @@ class Agent3Recruiter:
         description = job_json.get("description", "")
         company_str = f"Company: {company}\n" if company else ""
         title_str = f"Job Title: {title}\n" if title else ""
+        # Only the description is trimmed if the prompt is over budget
+        parts = [{"label": "Job Description", "content": description, "priority": 0}]
         if mode == "recruiter":
-            prompt = (
-                f"{company_str}{title_str}"
-                f"Job Description:\n{description}\n\n"
+            return self.OBJ_prompt.build(parts, preamble=f"{company_str}{title_str}".strip(), instruction=(
                 "Return a JSON object with two fields:\n"
                 "- must_haves: list of qualities/skills/traits that are absolutely required\n"
                 "- good_to_haves: list of qualities/skills/traits that are beneficial but not mandatory\n"
-                "Be realistic and practical, not just idealistic.\n")
-            
-            messages = [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": prompt}]
-            return messages
+                "Be realistic and practical, not just idealistic.\n"))
         
         elif mode == "ats":
-            prompt = (
-                f"{company_str}{title_str}"
-                f"Job Description:\n{description}\n\n"
+            return self.OBJ_ats_prompt.build(parts, preamble=f"{company_str}{title_str}".strip(), instruction=(
                 "Extract only the top 5-8 relevant keywords, tools, technologies, certifications, and frameworks that should be present in a resume. "
                 "Do not include keywords like the company name, location, product name, or any other non-essential terms."
-                "Ignore full sentences or soft skills. Output just a flat, comma-separated list of keywords.")
-            
-            messages = [{"role": "system", "content": self.ats_prompt}, {"role": "user", "content": prompt}]
-            return messages
+                "Ignore full sentences or soft skills. Output just a flat, comma-separated list of keywords."))
         
         else:
             raise ValueError("mode must be 'recruiter' or 'ats'")
@@ -86,7 +92,7 @@ class Agent3Recruiter:
 
             return ats_keywords
 
-    def run(self, job_json_str):
+    def run(self, job_json_str, on_text=None):
         # Accepts a JSON string as input
         if isinstance(job_json_str, str):
             job_json = json.loads(job_json_str)
@@ -98,7 +104,11 @@ class Agent3Recruiter:
         # Batch tokenize
 
         inputs = [recruiter_messages, ats_messages]
-        recruiter_response, ats_response = self.OBJ_ModelLLM.query(inputs, self.generation_args)
+        # Both prompts go out as one batch, which is not streamed: on_text only receives single-prompt output
+        recruiter_response, ats_response = self.OBJ_ModelLLM.query(inputs, self.generation_args, on_text=on_text,
+                                                                  response_schema=[self.response_schema, None])
+        self.OBJ_prompt.log_usage(recruiter_response)
+        self.OBJ_ats_prompt.log_usage(ats_response)
 
         # Parse recruiter output (still expects JSON)
         recruiter_result = self.parse_response(recruiter_response, mode="recruiter")
@@ -131,7 +141,7 @@ if __name__ == "__main__":
                     "referral": False,
                     "description": "Tesla is on a path to build humanoid robots at scale to automate repetitive and boring tasks. Core to the Optimus, the manipulation stack presents a unique opportunity to work on state-of-the-art algorithms for object manipulation culminating in their deployment to real world production applications. Our robotic manipulation software engineers develop and own this stack from inception to deployment. Most importantly, you will see your work repeatedly shipped to and utilized by thousands of Humanoid Robots in real world applications. What You’ll Do Design and develop our learned robotic manipulation software stack and algorithms Develop robotic manipulation capabilities including but not limited to (re)grasping, pick-and-place, and more dexterous behaviors to enable useful work in both structured and unstructured environments Model robotic manipulation processes to enable analysis, simulation, planning, and controls Reason about uncertainty due to measurements and physical interaction with the environment, and develop algorithms that adapt well to imperfect information Assist with overall software architecture design, including designing interfaces between subsystems Ship production quality, safety-critical software Collaborate with a team of exceptional individuals laser focused on bringing useful bi-ped humanoid robots into the real world What You’ll Bring Production quality modern C++ or Python Experience in deep imitation learning or reinforcement learning in realistic applications Exposure to robotics learning through tactile and/or vision-based sensors. Experience writing both production-level Python (including Numpy and Pytorch) and modern C++ Proven track record of training and deploying real world neural networks Familiarity with 3D computer vision and/or graphics pipelines Experience with Natural Language Processing Experience with distributed deep learning systems Prior work in Robotics, State estimation, Visual Odometry, SLAM, Structure from Motion, 3D Reconstruction"
                     }
-    OBJ_ModelLLM = ModelLLM()
+    OBJ_ModelLLM = model_registry.acquire_model()
     agent = Agent3Recruiter(OBJ_ModelLLM)
     result = agent.run(example_json)
     print(json.dumps(result, indent=2))
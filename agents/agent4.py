@@ -7,13 +7,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.wordparser import WordFileManager
 from utils.model_llm import ModelLLM
+from utils import model_registry
+from agents.prompt_builder import PromptBuilder, compact_json
 
 class Agent4CareerAdvisor:
     
-    def __init__(self, OBJ_ModelLLM:ModelLLM):
+    def __init__(self, OBJ_ModelLLM:ModelLLM=None):
 
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
-        example_output = json.dumps({
+        example_output = compact_json({
                         "SUMMARY": {
                             "needs_editing": True,
                             "reason": "The summary needs to more explicitly align with the robotics and 3D vision requirements of the job. It currently emphasizes Gen-AI and general deep learning.",
@@ -41,29 +43,33 @@ class Agent4CareerAdvisor:
             "Here's an exmaple of the output format for a 'SUMMARY' section of a resume and what you need to do:\n" +
             example_output
         )
-        self.OBJ_ModelLLM = OBJ_ModelLLM
+        self.OBJ_ModelLLM = OBJ_ModelLLM if OBJ_ModelLLM is not None else model_registry.acquire_model()
+        self.OBJ_ModelLLM.register_prefix("Agent4", self.system_prompt)
         self.generation_args = {
             "max_new_tokens": 768,
             "temperature": 0.2,
             "do_sample": True
         }
+        # Section name -> edit advice, the shape of example_output above
+        self.response_schema = {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "properties": {
+                    "needs_editing": {"type": "boolean"},
+                    "reason": {"type": "string"},
+                    "edit_instructions": {"type": "array", "items": {"type": "string"}}},
+                "required": ["needs_editing", "reason", "edit_instructions"]}}
+        self.OBJ_prompt = PromptBuilder(self.OBJ_ModelLLM, "Agent4", self.system_prompt, max_new_tokens=self.generation_args["max_new_tokens"])
 
 
     def build_prompt(self, resume_json: dict, vimi_json: dict, recruiter_json: dict):
-        resume_str = json.dumps(resume_json, indent=2)
-        vimi_str = json.dumps(vimi_json, indent=2)
-        recruiter_str = json.dumps(recruiter_json, indent=2)
-        prompt = (
-            f"Resume summary from Agent 2 (VirtualMe):\n{vimi_str}\n\n"
-            f"Recruiter/ATS analysis from Agent 3 (Recruiter):\n{recruiter_str}\n\n"
-            f"Resume JSON:\n{resume_str}\n\n"
-            "Based on the above, provide section-wise JSON suggestions for what to add, update, or remove in the resume to better align with the job. For each section or entry, specify if it needs editing, a short reason, and clear edit instructions. Output only the JSON."
-        )
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": prompt}
-        ]
-        return messages
+        # Over budget, Agent 2's impression is trimmed first, then the resume; the job analysis is kept longest
+        return self.OBJ_prompt.build(
+            [{"label": "Resume summary from Agent 2 (VirtualMe)", "content": vimi_json, "priority": 0},
+             {"label": "Recruiter/ATS analysis from Agent 3 (Recruiter)", "content": recruiter_json, "priority": 2},
+             {"label": "Resume JSON", "content": resume_json, "priority": 1, "drop_keys": ("formatting",)}],
+            instruction="Based on the above, provide section-wise JSON suggestions for what to add, update, or remove in the resume to better align with the job. For each section or entry, specify if it needs editing, a short reason, and clear edit instructions. Output only the JSON.")
 
     def parse_response(self, response: str):
         
@@ -82,10 +88,11 @@ class Agent4CareerAdvisor:
         except Exception:
             return {"error": "Could not parse agent4 output", "raw": response}
     
-    def run(self, vimi_json: dict, recruiter_json: dict, resume_json: dict):
+    def run(self, vimi_json: dict, recruiter_json: dict, resume_json: dict, on_text=None):
         messages = self.build_prompt(resume_json, vimi_json, recruiter_json)
 
-        response = self.OBJ_ModelLLM.query(messages, self.generation_args)
+        response = self.OBJ_ModelLLM.query(messages, self.generation_args, on_text=on_text, response_schema=self.response_schema)
+        self.OBJ_prompt.log_usage(response)
 
         response = self.parse_response(response)
         return response
@@ -103,8 +110,8 @@ if __name__ == "__main__":
 
     # Load resume JSON as before
     resume_path = r"d:\Career\Resume\Pradyumn_Pathak_Resume.docx"
-    OBJ = WordFileManager(resume_path)
-    OBJ_ModelLLM = ModelLLM()
+    OBJ_ModelLLM = model_registry.acquire_model()
+    OBJ = WordFileManager(resume_path, OBJ_ModelLLM)
     OBJ.read()
     resume_json = OBJ.export_json()  # returns dict
 
@@ -6,10 +6,12 @@ import re
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.wordparser import WordFileManager
 from utils.model_llm import ModelLLM
+from utils import model_registry
+from agents.prompt_builder import PromptBuilder
 
 class Agent5ResumeCoach:
     
-    def __init__(self, OBJ_model:ModelLLM):
+    def __init__(self, OBJ_model:ModelLLM=None):
 
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
         self.system_prompt = (
@@ -35,27 +37,32 @@ class Agent5ResumeCoach:
                                 "Do not output any explanations — only the JSON list of modifications.\n\n"
                                 "Output nothing else.")
         
-        self.OBJ_ModelLLM = OBJ_model
+        self.OBJ_ModelLLM = OBJ_model if OBJ_model is not None else model_registry.acquire_model()
+        self.OBJ_ModelLLM.register_prefix("Agent5", self.system_prompt)
         self.generation_args = {
             "max_new_tokens": 768,
             "temperature": 0.2,
             "do_sample": True}
+        # A list of {"section", "replace": {"original", "updated"}} or {"section", "delete"} items
+        self.response_schema = {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "section": {"type": "string"},
+                    "replace": {"type": "object",
+                                "properties": {"original": {"type": "string"}, "updated": {"type": "string"}},
+                                "required": ["original", "updated"]},
+                    "delete": {"type": "string"}},
+                "required": ["section"]}}
+        self.OBJ_prompt = PromptBuilder(self.OBJ_ModelLLM, "Agent5", self.system_prompt, max_new_tokens=self.generation_args["max_new_tokens"])
 
     def build_prompt(self, resume_json, coach_feedback):
-
-        if not isinstance(resume_json, str):
-            resume_json = json.dumps(resume_json, ensure_ascii=False, indent=2)
-        if not isinstance(coach_feedback, str):
-            coach_feedback = json.dumps(coach_feedback, ensure_ascii=False, indent=2)
-
-        prompt = (
-            "Use the following data to generate your edit list.\n\n"
-            f"Resume JSON:\n{resume_json}\n\n"
-            f"Resume Coach Suggestions:\n{coach_feedback}\n\n"
-        )
-        messages = [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": prompt}]
-
-        return messages
+        # Strings are passed through as they are; the coach suggestions are kept longer than the resume when trimming
+        return self.OBJ_prompt.build(
+            [{"label": "Resume JSON", "content": resume_json, "priority": 0, "drop_keys": ("formatting",)},
+             {"label": "Resume Coach Suggestions", "content": coach_feedback, "priority": 1}],
+            preamble="Use the following data to generate your edit list.")
 
 
         
@@ -88,11 +95,12 @@ class Agent5ResumeCoach:
             return {"error": "Could not parse agent5 output", "raw": response}
         
 
-    def run(self, resume_coach_feedback, resume_json):
+    def run(self, resume_coach_feedback, resume_json, on_text=None):
 
-        agent5_inputs = self.build_prompt(resume_coach_feedback, resume_json)
+        agent5_inputs = self.build_prompt(resume_json, resume_coach_feedback)
         # Batch tokenize
-        agent5_response = self.OBJ_ModelLLM.query(agent5_inputs, self.generation_args)
+        agent5_response = self.OBJ_ModelLLM.query(agent5_inputs, self.generation_args, on_text=on_text, response_schema=self.response_schema)
+        self.OBJ_prompt.log_usage(agent5_response)
 
         # Parse recruiter output (still expects JSON)
         agent5_result = self.parse_response(agent5_response)
@@ -114,8 +122,8 @@ if __name__ == "__main__":
 
     # Load resume JSON as before
     resume_path = r"data/candidate_data/default_resumes/f72f1abc-e7f5-4a99-9d37-6a546a5ab4e8.docx"
-    OBJ = WordFileManager(resume_path)
-    OBJ_ModelLLM = ModelLLM()
+    OBJ_ModelLLM = model_registry.acquire_model()
+    OBJ = WordFileManager(resume_path, OBJ_ModelLLM)
     OBJ.read()
     resume_json = OBJ.export_json()  # returns dict
 
@@ -123,7 +131,6 @@ if __name__ == "__main__":
     with open(agent4_json_path, 'r', encoding='utf-8') as f:
         resume_coach_feedback = json.load(f)
 
-    OBJ_ModelLLM = ModelLLM()
     agent = Agent5ResumeCoach(OBJ_ModelLLM)
     result = agent.run(resume_coach_feedback, resume_json)
     print(json.dumps(result, indent=2))
@@ -0,0 +1,141 @@
+import copy
+import json
+
+
+def compact_json(obj) -> str:
+    """JSON without indentation or spaces after separators; indent=2 costs tokens and tells the model nothing."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptBuilder:
+    """
+    Builds an agent's [system, user] messages from labelled parts. Dict/list parts are serialized with compact_json,
+    the whole prompt is measured with the model's tokenizer (ModelLLM.count_tokens) and, while it is over the agent's
+    token budget, parts are trimmed lowest priority first. Every call's prompt/completion token counts are logged.
+
+    Trimming tokenizes a part once to turn the tokens to cut into characters, then cuts by length alone; the whole
+    prompt is counted again only after each such cut (count_tokens is a round trip behind RemoteModelLLM).
+
+    The budget is `max_prompt_tokens`, overridden per agent by model_config.json PromptTokenBudgets {"Agent4": n},
+    and never more than the model's context window minus the agent's max_new_tokens.
+    """
+
+    # Cut this much more than the token estimate asks for, so one cut usually brings a prompt under budget
+    TRIM_MARGIN = 1.01
+
+    def __init__(self, OBJ_model, agent_name: str, system_prompt: str, max_prompt_tokens: int = 6144, max_new_tokens: int = 768):
+        self.OBJ_ModelLLM = OBJ_model
+        self.agent_name = agent_name
+        self.system_prompt = system_prompt
+        budgets = (getattr(OBJ_model, "config", None) or {}).get("PromptTokenBudgets", {})
+        self.max_prompt_tokens = budgets.get(agent_name, max_prompt_tokens)
+        context_window = getattr(OBJ_model, "context_window", None)
+        if context_window:
+            self.max_prompt_tokens = min(self.max_prompt_tokens, context_window - max_new_tokens)
+        self.last_prompt_tokens = 0
+        self.last_trimmed = []
+
+    @staticmethod
+    def render(parts: list, instruction: str = "", preamble: str = "") -> str:
+        blocks = [preamble] if preamble else []
+        for part in parts:
+            content = part["content"]
+            blocks.append(f"{part['label']}:\n{content if isinstance(content, str) else compact_json(content)}")
+        if instruction:
+            blocks.append(instruction)
+        return "\n\n".join(blocks)
+
+    def messages(self, user_prompt: str) -> list:
+        return [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": user_prompt}]
+
+    @staticmethod
+    def _drop_keys(content, keys) -> bool:
+        dropped = False
+        if isinstance(content, dict):
+            for key in [key for key in content if key in keys]:
+                del content[key]
+                dropped = True
+            for value in content.values():
+                dropped = PromptBuilder._drop_keys(value, keys) or dropped
+        elif isinstance(content, list):
+            for value in content:
+                dropped = PromptBuilder._drop_keys(value, keys) or dropped
+        return dropped
+
+    @staticmethod
+    def _longest_list(content):
+        best = content if isinstance(content, list) else None
+        children = content.values() if isinstance(content, dict) else content if isinstance(content, list) else ()
+        for child in children:
+            candidate = PromptBuilder._longest_list(child)
+            if candidate is not None and (best is None or len(candidate) > len(best)):
+                best = candidate
+        return best
+
+    def _shrink(self, part) -> bool:
+        """One trimming step on a part (in place): drop its drop_keys, else the last item of its longest list,
+        else its last key; strings lose their last fifth. False once there is nothing left to cut."""
+        content = part["content"]
+        if isinstance(content, str):
+            if not content:
+                return False
+            part["content"] = content[:len(content) * 4 // 5]
+            return True
+        if part.get("drop_keys") and self._drop_keys(content, set(part["drop_keys"])):
+            return True
+        longest = self._longest_list(content)
+        if longest is not None and len(longest) > 1:
+            longest.pop()
+            return True
+        if isinstance(content, dict) and content:
+            content.pop(next(reversed(content)))
+            return True
+        if isinstance(content, list) and content:
+            content.pop()
+            return True
+        return False
+
+    def _trim(self, part, excess_tokens: int) -> bool:
+        """Cuts about `excess_tokens` (plus TRIM_MARGIN) from a part in place. Its text is tokenized once for its
+        characters per token; _shrink steps then run until the text is short enough. False if nothing was cut."""
+        content = part["content"]
+        text = content if isinstance(content, str) else compact_json(content)
+        if not text:
+            return False
+        chars_per_token = len(text) / max(1, self.OBJ_ModelLLM.count_tokens(text))
+        target_chars = len(text) - int(excess_tokens * self.TRIM_MARGIN * chars_per_token + 1)
+        if isinstance(content, str):
+            part["content"] = content[:max(0, target_chars)]
+            return True
+        trimmed = False
+        while len(compact_json(part["content"])) > target_chars and self._shrink(part):
+            trimmed = True
+        return trimmed
+
+    def build(self, parts: list, instruction: str = "", preamble: str = "") -> list:
+        """
+        parts: [{"label": str, "content": str | dict | list, "priority": int, "drop_keys": (keys removed first)}].
+        Higher priority parts are kept longer; a part without "priority" is never trimmed. Returns the messages.
+        """
+        parts = [dict(part, content=copy.deepcopy(part["content"])) for part in parts]
+        messages = self.messages(self.render(parts, instruction, preamble))
+        tokens = self.OBJ_ModelLLM.count_tokens(messages)
+        self.last_trimmed = []
+        for part in sorted((part for part in parts if "priority" in part), key=lambda part: part["priority"]):
+            while tokens > self.max_prompt_tokens and self._trim(part, tokens - self.max_prompt_tokens):
+                messages = self.messages(self.render(parts, instruction, preamble))
+                tokens = self.OBJ_ModelLLM.count_tokens(messages)
+                if part["label"] not in self.last_trimmed:
+                    self.last_trimmed.append(part["label"])
+        if tokens > self.max_prompt_tokens:
+            print(f"\t\t [⚠️-ERROR] {self.agent_name} prompt is {tokens} tokens, over its {self.max_prompt_tokens} token budget after trimming")
+        elif self.last_trimmed:
+            print(f"\t\t [🧠-INFO] {self.agent_name} prompt trimmed to {tokens}/{self.max_prompt_tokens} tokens: {', '.join(self.last_trimmed)}")
+        self.last_prompt_tokens = tokens
+        return messages
+
+    def log_usage(self, *responses):
+        """Logs the last prompt's token count with the completion tokens of the response(s) it produced."""
+        completion_tokens = sum(self.OBJ_ModelLLM.count_tokens(response) for response in responses if isinstance(response, str))
+        print(f"\t\t [🧠-INFO] {self.agent_name} tokens | prompt: {self.last_prompt_tokens}/{self.max_prompt_tokens} | completion: {completion_tokens}")
+        return self.last_prompt_tokens, completion_tokens
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from data.dbms_manager import DBManager
+
+
+class AsyncDBManager:
+    """
+    Async facade over DBManager for the FastAPI handlers.
+
+    Every DBManager method becomes awaitable: `await adbms.fetch_user_requests(...)` runs the blocking
+    pyodbc call (and any file I/O it does) on a bounded thread pool, so the event loop keeps serving other
+    requests meanwhile. The executor has as many threads as the connection pool has connections, so
+    concurrent requests scale with connections instead of queueing behind one another.
+    """
+
+    def __init__(self, dbms: DBManager, max_workers: int = None):
+        self.dbms = dbms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or dbms.pool.max_size, thread_name_prefix="dbms")
+
+    async def run(self, func, *args, **kwargs):
+        """Runs any blocking callable on the DB executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.dbms, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return call
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,159 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import pyodbc
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out of the pool within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool of pyodbc connections.
+
+    - At most `max_size` connections exist at once; callers wait up to `checkout_timeout` seconds for one.
+    - Idle connections are health-checked with `SELECT 1` when borrowed and replaced if they are dead.
+    - Connections older than `max_lifetime` seconds are closed and replaced instead of being reused.
+    - Connections are rolled back when returned, so no transaction leaks between callers.
+    """
+
+    def __init__(self, connection_string: str, max_size: int = 8, checkout_timeout: float = 10.0,
+                 max_lifetime: float = 1800.0, health_check: bool = True, connect=None):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self._connect = connect or pyodbc.connect
+
+        self._cond = threading.Condition()
+        self._idle = deque()    # (conn, created_at)
+        self._created_at = {}   # id(conn) -> created_at, for connections currently checked out
+        self._size = 0          # open connections, idle + in use
+
+        self.metrics = {"checkouts": 0, "created": 0, "recycled": 0, "health_check_failures": 0,
+                        "waits": 0, "wait_time": 0.0, "timeouts": 0}
+
+    def _open(self):
+        conn = self._connect(self.connection_string)
+        with self._cond:
+            self.metrics["created"] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def acquire(self):
+        """Checks a connection out of the pool, opening a new one if the pool is not full yet."""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        wait_start = time.monotonic()
+        while True:
+            conn, created_at, reuse = None, None, False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        raise PoolTimeoutError(f"No database connection available after {self.checkout_timeout}s "
+                                               f"({self._size}/{self.max_size} in use)")
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, created_at = self._idle.popleft()
+                    reuse = True
+                else:
+                    self._size += 1  # reserve the slot before connecting outside the lock
+
+            if reuse:
+                if time.monotonic() - created_at > self.max_lifetime:
+                    self._discard(conn, metric="recycled")
+                    continue
+                if self.health_check and not self._is_alive(conn):
+                    self._discard(conn, metric="health_check_failures")
+                    continue
+            else:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+
+            with self._cond:
+                self._created_at[id(conn)] = created_at
+                self.metrics["checkouts"] += 1
+                if waited:
+                    self.metrics["waits"] += 1
+                    self.metrics["wait_time"] += time.monotonic() - wait_start
+            return conn
+
+    def release(self, conn, discard: bool = False):
+        """Returns a connection to the pool. Broken connections should be released with discard=True."""
+        if not discard:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                discard = True
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), time.monotonic())
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    def _discard(self, conn, metric: str = None):
+        """Closes a connection and frees its slot; `metric` names the counter recording why, updated with the size."""
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            if metric is not None:
+                self.metrics[metric] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """`with pool.connection() as conn:` borrows a connection and always gives it back."""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            in_use = len(self._created_at)
+            return {"size": self._size, "in_use": in_use, "idle": len(self._idle), "max_size": self.max_size,
+                    **self.metrics, "wait_time": round(self.metrics["wait_time"], 4)}
@@ -1,28 +1,91 @@
 import os
 import json
-import pyodbc
 from utils.candidate_resume_database import CandidateResumeDatabase
-from utils.wordparser import WordFileManager
+from utils import model_registry
+from utils.parse_cache import get_parse_cache
+from utils.task_notifier import TaskNotifier
+from data.connection_pool import ConnectionPool
 import uuid
 import datetime
 
 
 class DBManager:
 
-    def __init__(self):
+    # SQL Server connection; DATABASE is the production one, benchmarks pass a scratch database instead
+    CONNECTION_STRING = r'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER=DESKTOP-SC072N0\MSSQLSERVER01;DATABASE={database};Trusted_Connection=yes;'
+    DATABASE = "pepper"
+
+    # Connection pool defaults, see data/connection_pool.py
+    POOL_SIZE = 8
+    POOL_CHECKOUT_TIMEOUT = 10.0
+    POOL_MAX_LIFETIME = 1800.0
+
+    # Which requests are waiting for a worker and in what order they are picked up.
+    # Shared by the dequeue and by the queue positions shown to users.
+    QUEUE_FILTER = "[Status] IN ('queued', 'approved')"
+    QUEUE_ORDER_BY = "CASE WHEN [Status]='Approved' THEN 0 ELSE 1 END, [CreatedOn] ASC, [Id] ASC"
+
+    # A claimed request is leased to its worker for LEASE_SECONDS; the worker's heartbeat (utils/lease_heartbeat.py)
+    # renews it. Expired leases go back on the queue, and after MAX_ATTEMPTS claims to DEAD_LETTER_STATUS.
+    LEASE_SECONDS = 120
+    MAX_ATTEMPTS = 3
+    DEAD_LETTER_STATUS = "failed"
+
+    # How long a shared Agent3 job analysis is reused before the posting is analysed again
+    JOB_ANALYSIS_TTL_HOURS = 7 * 24
+
+    # Indexes the request listing and the queue rely on; created by ensure_schema()
+    SCHEMA_STATEMENTS = [
+        "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tblRequests_UserId_CreatedOn') "
+        "CREATE INDEX IX_tblRequests_UserId_CreatedOn ON tblRequests (UserId, CreatedOn DESC, Id DESC) INCLUDE (Status, Endpoint, ResumeId)",
+        "IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tblRequests_Status_CreatedOn') "
+        "CREATE INDEX IX_tblRequests_Status_CreatedOn ON tblRequests (Status, CreatedOn, Id)",
+        # Which worker claimed a request and when (see get_next_pending_request)
+        "IF COL_LENGTH('tblRequests', 'WorkerId') IS NULL ALTER TABLE tblRequests ADD WorkerId NVARCHAR(128) NULL",
+        "IF COL_LENGTH('tblRequests', 'ClaimedOn') IS NULL ALTER TABLE tblRequests ADD ClaimedOn DATETIME2 NULL",
+        # Claim leases, retries and the dead-letter status (see requeue_expired_leases)
+        "IF COL_LENGTH('tblRequests', 'LeaseExpiresOn') IS NULL ALTER TABLE tblRequests ADD LeaseExpiresOn DATETIME2 NULL",
+        "IF COL_LENGTH('tblRequests', 'ClaimedFromStatus') IS NULL ALTER TABLE tblRequests ADD ClaimedFromStatus NVARCHAR(32) NULL",
+        "IF COL_LENGTH('tblRequests', 'Attempts') IS NULL ALTER TABLE tblRequests ADD Attempts INT NOT NULL CONSTRAINT DF_tblRequests_Attempts DEFAULT 0",
+        "IF COL_LENGTH('tblRequests', 'LastError') IS NULL ALTER TABLE tblRequests ADD LastError NVARCHAR(MAX) NULL",
+        # Agent3 analyses shared across users, keyed by utils/job_fingerprint.py (see fetch_job_analysis)
+        "IF OBJECT_ID('tblJobAnalysisCache', 'U') IS NULL CREATE TABLE tblJobAnalysisCache ("
+        "Fingerprint CHAR(64) NOT NULL, Model NVARCHAR(128) NOT NULL, Analysis NVARCHAR(MAX) NOT NULL, "
+        "CreatedOn DATETIME2 NOT NULL, ExpiresOn DATETIME2 NOT NULL, Hits INT NOT NULL DEFAULT 0, "
+        "LastHitOn DATETIME2 NULL, CONSTRAINT PK_tblJobAnalysisCache PRIMARY KEY (Fingerprint, Model))",
+        # All-time lookup totals of that cache in a single row; a miss has no cache row to be counted on
+        "IF OBJECT_ID('tblJobAnalysisCacheStats', 'U') IS NULL CREATE TABLE tblJobAnalysisCacheStats ("
+        "Id INT NOT NULL CONSTRAINT PK_tblJobAnalysisCacheStats PRIMARY KEY, Hits BIGINT NOT NULL, Misses BIGINT NOT NULL)",
+        "IF NOT EXISTS (SELECT 1 FROM tblJobAnalysisCacheStats WHERE [Id] = 1) INSERT INTO tblJobAnalysisCacheStats ([Id], [Hits], [Misses]) VALUES (1, 0, 0)",
+        # Per-stage checkpoints of a running request (see save_stage_checkpoint)
+        "IF COL_LENGTH('tblRequestOutputs', 'StageCheckpoints') IS NULL ALTER TABLE tblRequestOutputs ADD StageCheckpoints NVARCHAR(MAX) NULL",
+    ]
+
+    # Agent output columns of tblRequestOutputs
+    AGENT_COLUMNS = ["Agent2", "Agent3", "Agent4", "Agent5"]
+
+    def __init__(self, OBJ_ModelLLM=None, pool_size: int = None, database: str = None):
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
+        self.OBJ_ModelLLM = OBJ_ModelLLM
         self.candidate_db = CandidateResumeDatabase()
-        self.connection_string = r'DRIVER={ODBC Driver 17 for SQL Server};SERVER=DESKTOP-SC072N0\MSSQLSERVER01;DATABASE=pepper;Trusted_Connection=yes;'
+        self.connection_string = self.CONNECTION_STRING.format(database=database or self.DATABASE)
+        self.pool = ConnectionPool(self.connection_string,
+                                   max_size=pool_size or self.POOL_SIZE,
+                                   checkout_timeout=self.POOL_CHECKOUT_TIMEOUT,
+                                   max_lifetime=self.POOL_MAX_LIFETIME)
+        # Wakes an idle worker right away when this process enqueues work
+        self.notifier = TaskNotifier()
 
     def test_connection(self):
         """Test the database connection!"""
 
         try:
-            self.conn = pyodbc.connect(self.connection_string)
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
-            
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                result = cursor.fetchone()
+                cursor.close()
+
             if result and result[0] == 1:
                 print("\t\t [✅-INFO] Connection successful!")
                 return True
@@ -30,31 +93,44 @@ class DBManager:
                 print("\t\t [⚠️-ERROR] Connected, but unexpected result:", result)
                 return False
 
-        except pyodbc.Error as e:
+        except Exception as e:
             print("\t\t [❌-ERROR] Connection failed:", e)
             return False
-        finally:
-            if 'conn' in locals():
-                self.conn.close()
+
+    def ensure_schema(self):
+        """Applies the idempotent DDL in SCHEMA_STATEMENTS (indexes, columns and tables newer code relies on)."""
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                for statement in self.SCHEMA_STATEMENTS:
+                    cursor.execute(statement)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] ensure_schema failed: {e}")
+            return False
+
+    def pool_stats(self):
+        """Connection pool metrics: size, in_use, idle, waits, wait_time, timeouts, ..."""
+        return self.pool.stats()
+
+    def get_model(self):
+        """Lazily fetch the shared ModelLLM, only needed when a resume has to be parsed."""
+        if self.OBJ_ModelLLM is None:
+            self.OBJ_ModelLLM = model_registry.acquire_model()
+        return self.OBJ_ModelLLM
 
     def fetch_all_user_names(self):
         """
         Returns a list of all user names from tblUsers.
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT Name FROM tblUsers")
-            rows = cursor.fetchall()
-            return [row[0] for row in rows]
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT Name FROM tblUsers")
+                rows = cursor.fetchall()
+                return [row[0] for row in rows]
         except Exception as e:
             print(f"Error fetching user names: {e}")
             return []
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def verify_user_pin(self, Name: str, Pin: str):
         """
@@ -62,42 +138,31 @@ class DBManager:
         Returns (True, Id) if credentials are valid, (False, None) otherwise.
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT Id FROM tblUsers WHERE Name = ? AND Pin = ?", Name, Pin)
-            result = cursor.fetchone()
-            if result:
-                return True, result[0]
-            else:
-                return False, None
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT Id FROM tblUsers WHERE Name = ? AND Pin = ?", Name, Pin)
+                result = cursor.fetchone()
+                if result:
+                    return True, result[0]
+                else:
+                    return False, None
         except Exception as e:
             print(f"Error verifying user pin: {e}")
             return False, None
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def fetch_all_resume_names(self, UserId:str):
         """
         Fetches all resume names for a given user from the database.
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT FilePath FROM tblResume WHERE UserId = ?", UserId)
-            rows = cursor.fetchall()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT FilePath FROM tblResume WHERE UserId = ?", UserId)
+                rows = cursor.fetchall()
+
+                return [os.path.basename(row) for row in rows]
 
-            return [os.path.basename(row) for row in rows]
-        
         except Exception as e:
             print(f"Error fetching resumes: {e}")
             return []
-        
-        finally:
-            cursor.close()
-            conn.close()
 
     def create_new_request(self, UserId: str, ResumeId: str, Status: str, EndPoint: str, Type: str, Input, created_on=None):
         """
@@ -105,31 +170,26 @@ class DBManager:
         [Id, UserId, ResumeId, Status, EndPoint, CreatedOn, Type, Input]
         Returns True if successful, False and error message otherwise.
         """
-        import datetime
         try:
             RequestId = str(uuid.uuid4())
             if created_on is None:
                 created_on = datetime.datetime.now()
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO tblRequests (Id, UserId, ResumeId, Status, EndPoint, CreatedOn, Type, Input)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                RequestId, UserId, ResumeId, Status, EndPoint, created_on, Type, Input
-            )
-            conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO tblRequests (Id, UserId, ResumeId, Status, EndPoint, CreatedOn, Type, Input)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    RequestId, UserId, ResumeId, Status, EndPoint, created_on, Type, Input
+                )
+                conn.commit()
+            if Status in ("queued", "approved"):
+                self.notifier.notify(Type)
             print(f"Request {RequestId} created successfully for user {UserId}.")
             return True, RequestId
         except Exception as e:
             print(f"Error creating request: {e}")
             return False, str(e)
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def save_new_resume(self, UserId: str, ResumeName: str, file_bytes: bytes, IsCurated: bool = False, ResumeJson: str = None, candidate_db=None, created_on=None):
         """
@@ -141,7 +201,6 @@ class DBManager:
             ResumeId = str(uuid.uuid4())
             # Save the file as ResumeId.docx using CandidateResumeDatabase
             if candidate_db is None:
-                from utils.candidate_resume_database import CandidateResumeDatabase
                 candidate_db = CandidateResumeDatabase()
             filename = ResumeId + ".docx"
             save_path = candidate_db.save_resume_file(file_bytes, filename)
@@ -151,18 +210,17 @@ class DBManager:
             rel_file_path = rel_file_path[1:] if rel_file_path.startswith('/') else rel_file_path
             # Use provided created_on or generate new
             if created_on is None:
-                import datetime
                 created_on = datetime.datetime.now()
             # Save entry in tblResume (now with CreatedOn)
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO tblResume (Id, UserId, ResumeName, FilePath, IsCurated, ResumeJson, CreatedOn) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                ResumeId, UserId, ResumeName, rel_file_path, IsCurated, ResumeJson, created_on
-            )
-            conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO tblResume (Id, UserId, ResumeName, FilePath, IsCurated, ResumeJson, CreatedOn) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ResumeId, UserId, ResumeName, rel_file_path, IsCurated, ResumeJson, created_on
+                )
+                conn.commit()
             print(f"Resume {save_path} saved successfully for user {UserId}.")
-            # Create a new request for parsing this resume, pass created_on for consistency
+            # Create a new request for parsing this resume, pass created_on for consistency.
+            # The connection above is returned first so the pool is never borrowed from twice per call.
             status, result = self.create_new_request(
                 UserId=UserId,
                 ResumeId=ResumeId,
@@ -179,11 +237,6 @@ class DBManager:
         except Exception as e:
             print(f"Error saving resume: {e}")
             return False, str(e)
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def curate_new_resume(self, user_id: str, resume_id: str, job_desc: dict):
         """
@@ -211,13 +264,12 @@ class DBManager:
             # 3. Create new Id
             new_resume_id = str(uuid.uuid4())
             # 4. Insert into tblResume
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO tblResume (Id, UserId, ResumeName, FilePath, IsCurated, ResumeJson, CreatedOn, EditedBy) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                new_resume_id, user_id, new_resume_name, file_path, True, None, created_on, resume_id
-            )
-            conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO tblResume (Id, UserId, ResumeName, FilePath, IsCurated, ResumeJson, CreatedOn, EditedBy) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    new_resume_id, user_id, new_resume_name, file_path, True, None, created_on, resume_id
+                )
+                conn.commit()
             # 5. Create new request for curation
             status, result = self.create_new_request(
                 UserId=user_id,
@@ -234,34 +286,23 @@ class DBManager:
         except Exception as e:
             print(f"Error curating resume: {e}")
             return False, str(e)
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def get_resume_file_info(self, ResumeId: str):
         """
         Returns (absolute_file_path, resume_name) for the given ResumeId, or (None, None) if not found.
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT FilePath, ResumeName FROM tblResume WHERE Id = ?", ResumeId)
-            row = cursor.fetchone()
-            if not row:
-                return None, None
-            rel_file_path, resume_name = row.FilePath, row.ResumeName
-            abs_file_path = self.get_resume_full_path(rel_file_path)
-            return abs_file_path, resume_name
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT FilePath, ResumeName FROM tblResume WHERE Id = ?", ResumeId)
+                row = cursor.fetchone()
+                if not row:
+                    return None, None
+                rel_file_path, resume_name = row.FilePath, row.ResumeName
+                abs_file_path = self.get_resume_full_path(rel_file_path)
+                return abs_file_path, resume_name
         except Exception as e:
             print(f"Error fetching resume file info: {e}")
             return None, None
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def get_curated_resume(self, request_id: str):
         """
@@ -269,13 +310,13 @@ class DBManager:
         Returns (abs_file_path, resume_name) or (None, None) if not found.
         """
         try:
-            with self.conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute("SELECT ResumeId FROM tblRequests WHERE Id = ?", request_id)
                 row = cursor.fetchone()
-                if not row or not row[0]:
-                    return None, None
-                resume_id = row[0]
-                return self.get_resume_file_info(resume_id)
+            if not row or not row[0]:
+                return None, None
+            resume_id = row[0]
+            return self.get_resume_file_info(resume_id)
         except Exception as e:
             print(f"Error fetching curated resume file info: {e}")
             return None, None
@@ -287,33 +328,30 @@ class DBManager:
         """
         try:
             if candidate_db is None:
-                from utils.candidate_resume_database import CandidateResumeDatabase
                 candidate_db = CandidateResumeDatabase()
-            # Get the relative file path from DB
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT FilePath FROM tblResume WHERE Id = ?", ResumeId)
-            row = cursor.fetchone()
-            if not row:
-                return False, "ResumeId not found."
-            rel_file_path = row.FilePath[2:]
-            # Get full path
-            full_path = self.get_resume_full_path(rel_file_path)
-            # Overwrite the file
-            with open(full_path, 'wb') as f:
-                f.write(file_bytes)
-            # Update ResumeName if provided
-            cursor.execute("UPDATE tblResume SET ResumeName = ? WHERE Id = ?", ResumeName, ResumeId)
-            conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                # Get the relative file path from DB
+                cursor.execute("SELECT FilePath FROM tblResume WHERE Id = ?", ResumeId)
+                row = cursor.fetchone()
+                if not row:
+                    return False, "ResumeId not found."
+                rel_file_path = row.FilePath[2:]
+                # Get full path
+                full_path = self.get_resume_full_path(rel_file_path)
+                # Drop the cached parse of the old contents before overwriting the file
+                if os.path.exists(full_path):
+                    with open(full_path, 'rb') as f:
+                        get_parse_cache().invalidate_bytes(f.read())
+                # Overwrite the file
+                with open(full_path, 'wb') as f:
+                    f.write(file_bytes)
+                # Update ResumeName if provided
+                cursor.execute("UPDATE tblResume SET ResumeName = ? WHERE Id = ?", ResumeName, ResumeId)
+                conn.commit()
             return True, ResumeId
         except Exception as e:
             print(f"Error updating resume: {e}")
             return False, str(e)
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def rename_resume(self, ResumeId: str, new_name: str):
         """
@@ -321,19 +359,13 @@ class DBManager:
         Returns True on success, False otherwise.
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("UPDATE tblResume SET ResumeName = ? WHERE Id = ?", new_name, ResumeId)
-            conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("UPDATE tblResume SET ResumeName = ? WHERE Id = ?", new_name, ResumeId)
+                conn.commit()
             return True
         except Exception as e:
             print(f"Error renaming resume: {e}")
             return False
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def get_resume_full_path(self, rel_file_path: str) -> str:
         """
@@ -344,49 +376,48 @@ class DBManager:
 
     def fetch_user_requests(self, user_id: str, page_num: int, n: int):
         """
-        Fetches paginated request entries for a user from tblRequests, joined with tblResume for ResumeName if ResumeId is present.
-        Each entry includes endpoint, status (queue position or 'Finished'), and resumeName (if present).
+        Fetches one page of request entries for a user from tblRequests, joined with tblResume for ResumeName if ResumeId is present.
+        The page and the total count are computed in SQL (OFFSET/FETCH on CreatedOn, Id), so the cost does not grow with the user's history.
+        Each entry includes endpoint, status (queue position for queued requests, otherwise a label), and resumeName (if present).
+        Returns (entries, total_count).
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            # Fetch all requests for the user, joined with ResumeName if ResumeId is present, ordered by CreatedOn DESC
-            query = '''
-                SELECT r.Id, r.UserId, r.ResumeId, r.Status, r.Endpoint, r.CreatedOn, res.ResumeName
+            page_num = max(1, page_num)
+            n = max(1, n)
+            # Queue positions use the same filter and ordering the worker dequeues with
+            query = f'''
+                WITH Queue AS (
+                    SELECT Id, ROW_NUMBER() OVER (ORDER BY {self.QUEUE_ORDER_BY}) AS QueuePosition
+                    FROM tblRequests
+                    WHERE {self.QUEUE_FILTER}
+                )
+                SELECT r.Id, r.Status, r.Endpoint, r.CreatedOn, res.ResumeName, q.QueuePosition,
+                       COUNT(*) OVER () AS TotalCount
                 FROM tblRequests r
                 LEFT JOIN tblResume res ON r.ResumeId = res.Id
+                LEFT JOIN Queue q ON q.Id = r.Id
                 WHERE r.UserId = ? AND (r.IsDeleted IS NULL OR r.IsDeleted != 1)
-                ORDER BY r.CreatedOn DESC
+                ORDER BY r.CreatedOn DESC, r.Id DESC
+                OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
             '''
-            cursor.execute(query, user_id)
-            rows = cursor.fetchall()
-            # Pre-fetch all requests for queue position calculation (pending/processing, any user)
-            cursor.execute('''
-                SELECT Id, CreatedOn, Status FROM tblRequests WHERE Status IN ('pending', 'processing')
-            ''')
-            all_pending = cursor.fetchall()
-            # Build a list of (Id, CreatedOn) for queue calculation
-            pending_dict = {row.Id: row.CreatedOn for row in all_pending}
-            # Prepare paginated result
-            start = (page_num - 1) * n
-            end = start + n
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, user_id, (page_num - 1) * n, n)
+                rows = cursor.fetchall()
+                if rows:
+                    total = rows[0].TotalCount
+                else:
+                    # Past the last page: the window count has no row to ride on
+                    cursor.execute("SELECT COUNT(*) FROM tblRequests WHERE UserId = ? AND (IsDeleted IS NULL OR IsDeleted != 1)", user_id)
+                    total = cursor.fetchone()[0]
+
+            status_labels = {'finished': 'Finished', 'pending': 'Pending', 'approved': 'Approved',
+                             'rejected': 'Rejected', 'processing': 'Processing', self.DEAD_LETTER_STATUS: 'Failed'}
             result = []
-            for idx, row in enumerate(rows):
-                # Calculate queue position if not finished
-                queue_position = None
-                status_field_reply = queue_position
-
-                if row.Status == 'finished':
-                    status_field_reply = 'Finished'
-                elif row.Status == 'pending':
-                    status_field_reply = 'Pending'
-                elif row.Status == 'approved':
-                    status_field_reply = 'Approved'
-                elif row.Status == 'rejected':
-                    status_field_reply = 'Rejected'
-                elif queue_position is not None and row.Status != 'finished':
-                    queue_position += 1 if queue_position is not None else None
-                    status_field_reply = queue_position
+            for row in rows:
+                if row.Status == 'queued' and row.QueuePosition is not None:
+                    status_field_reply = int(row.QueuePosition)
+                else:
+                    status_field_reply = status_labels.get(row.Status, row.Status)
 
                 entry = {
                     'RequestId': row.Id,
@@ -396,84 +427,76 @@ class DBManager:
                     'resumeName': row.ResumeName if row.ResumeName else None
                 }
                 result.append(entry)
-            # Pagination
-            paginated = result[start:end]
-            return paginated
+            return result, total
         except Exception as e:
             print(f"Error fetching user requests: {e}")
-            return []
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
+            return [], 0
 
     def update_request_approval(self, request_id: str, approve: bool, agent4_updated:str):
         """
         Updates the Status of tblRequests for the given request_id to 'Approved' or 'Rejected'.
-        Uses self.conn for the update.
         Returns (True, None) on success, (False, error_message) on failure.
         """
         try:
             new_status = "approved" if approve else "rejected"
-            with self.conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute(
                     "UPDATE tblRequests SET Status = ? WHERE Id = ?",
                     new_status, request_id
                 )
-                self.conn.commit()
+                conn.commit()
                 cursor.execute(
                     "UPDATE tblRequestOutputs SET Agent4 = ? WHERE RequestId = ?",
                     agent4_updated, request_id
                 )
-                self.conn.commit()
+                conn.commit()
+            if approve:
+                self.notifier.notify("approved")
             return True, None
         except Exception as e:
             print(f"Error updating request approval: {e}")
-            self.conn.rollback()
             return False, str(e)
 
     def fetch_request_state(self, request_id: str):
         """
         Given a request_id, fetches the status from tblRequests. If status is 'finished' or 'pending',
-        fetches agent outputs from tblRequestOutputs. Returns dict: {"status": ..., "agents": {...}}
+        fetches agent outputs from tblRequestOutputs. Returns dict: {"status": ..., "agents": {...}, "stages": {...}}
+        where stages holds the timing of every stage checkpointed so far ({stage: {"seconds", "finished_on"}}).
         """
 
-        agent_keys = ["Agent2", "Agent3", "Agent4", "Agent5"]
+        agent_keys = self.AGENT_COLUMNS
         try:
-
-            cursor = self.conn.cursor()
-            # 1. Get status from tblRequests
-            cursor.execute("SELECT Status FROM tblRequests WHERE Id = ?", request_id)
-            row = cursor.fetchone()
-            if not row:
-                return {"error": "Request not found."}
-            status = row.Status if hasattr(row, 'Status') else row[0]
-            agents = {k: None for k in agent_keys}
-            if status in ("finished", "approved", "pending"):
-                # 2. Get agent outputs from tblRequestOutputs
-                cursor.execute(f"SELECT {', '.join(agent_keys)} FROM tblRequestOutputs WHERE RequestId = ?", request_id)
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                # 1. Get status from tblRequests
+                cursor.execute("SELECT Status FROM tblRequests WHERE Id = ?", request_id)
+                row = cursor.fetchone()
+                if not row:
+                    return {"error": "Request not found."}
+                status = row.Status if hasattr(row, 'Status') else row[0]
+                agents = {k: None for k in agent_keys}
+                stages = {}
+                # 2. Get agent outputs and stage checkpoints from tblRequestOutputs
+                cursor.execute(f"SELECT {', '.join(agent_keys)}, StageCheckpoints FROM tblRequestOutputs WHERE RequestId = ?", request_id)
                 agent_row = cursor.fetchone()
                 if agent_row:
-                    for idx, k in enumerate(agent_keys):
-                        val = agent_row[idx]
-                        if isinstance(val, str):
-                            try:
-                                agents[k] = json.loads(val)
-                            except Exception:
+                    if status in ("finished", "approved", "pending"):
+                        for idx, k in enumerate(agent_keys):
+                            val = agent_row[idx]
+                            if isinstance(val, str):
+                                try:
+                                    agents[k] = json.loads(val)
+                                except Exception:
+                                    agents[k] = val
+                            else:
                                 agents[k] = val
-                        else:
-                            agents[k] = val
+                    checkpoints = json.loads(agent_row[len(agent_keys)]) if agent_row[len(agent_keys)] else {}
+                    stages = {stage: {"seconds": entry.get("seconds"), "finished_on": entry.get("finished_on")}
+                              for stage, entry in checkpoints.items()}
             # If status is 'queued', just return empty agent content
-            return {"status": status, "agents": agents}
+            return {"status": status, "agents": agents, "stages": stages}
         except Exception as e:
             print(f"\t\t [❌-ERROR] fetch_request_state failed: {e}")
             return {"error": str(e)}
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                self.conn.close()
 
     def fetch_user_resumes(self, UserId: str, is_curated: bool):
         """
@@ -481,13 +504,12 @@ class DBManager:
         Returns a list of dicts: {ResumeId, Name, HasJson}
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT Id, ResumeName, ResumeJson, CreatedOn FROM tblResume WHERE UserId = ? AND IsCurated = ? AND  (IsDeleted IS NULL OR IsDeleted != 1) ORDER BY CreatedOn DESC",
-                UserId, is_curated
-            )
-            rows = cursor.fetchall()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT Id, ResumeName, ResumeJson, CreatedOn FROM tblResume WHERE UserId = ? AND IsCurated = ? AND  (IsDeleted IS NULL OR IsDeleted != 1) ORDER BY CreatedOn DESC",
+                    UserId, is_curated
+                )
+                rows = cursor.fetchall()
             result = []
             for row in rows:
                 resume_id = row.Id
@@ -504,100 +526,383 @@ class DBManager:
         except Exception as e:
             print(f"Error fetching user resumes: {e}")
             return []
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
-    def get_next_pending_request(self):
+    def get_next_pending_request(self, worker_id: str = None, task_types: list = None):
         """
-        Fetch the next pending request from tblRequest where Status != 'finished'.
+        Atomically claims the next pending request from tblRequests (Status 'queued' or 'approved').
         Prioritize Status='Approved', then order by CreatedOn (oldest first).
-        Returns a dict with all columns for the top 1 entry, or None if no such entry exists.
-        """
+        The row is picked and flipped to 'processing' (with WorkerId and ClaimedOn) in one UPDATE; UPDLOCK/READPAST
+        make concurrent workers skip rows another worker is claiming, so N workers can drain the queue without
+        processing a request twice. The claim also starts a LEASE_SECONDS lease, counts the attempt and remembers
+        the status it was claimed from, so requeue_expired_leases can put it back if the worker dies.
+        Returns a dict with the claimed row's columns, where Status is the status it had *before* the claim
+        ('queued' or 'approved'), or None if the queue is empty. task_types optionally restricts the request Types.
+        """
+        type_filter = ""
+        if task_types:
+            type_filter = f"AND [Type] IN ({', '.join(['?'] * len(task_types))}) "
+        # Parameters in statement order: the CTE's type filter, then the UPDATE's WorkerId and lease length
+        params = list(task_types or []) + [worker_id, self.LEASE_SECONDS]
         query = (
-            "SELECT TOP 1 [Id], [UserId], [ResumeId], [Status], [Endpoint], [CreatedOn], [Type], [Input] "
-            "FROM tblRequests "
-            # "WHERE [Status] IN ('queued', 'pending') "
-            "WHERE [Status] IN ('queued', 'approved') "
-            "ORDER BY CASE WHEN [Status]='Approved' THEN 0 ELSE 1 END, [CreatedOn] ASC"
+            "WITH NextRequest AS ("
+            "    SELECT TOP 1 * FROM tblRequests WITH (ROWLOCK, UPDLOCK, READPAST) "
+            f"   WHERE {self.QUEUE_FILTER} {type_filter}"
+            f"   ORDER BY {self.QUEUE_ORDER_BY}"
+            ") "
+            "UPDATE NextRequest SET [Status] = 'processing', [WorkerId] = ?, [ClaimedOn] = SYSDATETIME(), "
+            "[LeaseExpiresOn] = DATEADD(second, ?, SYSDATETIME()), [Attempts] = [Attempts] + 1, [ClaimedFromStatus] = [Status] "
+            "OUTPUT inserted.[Id], inserted.[UserId], inserted.[ResumeId], deleted.[Status] AS [Status], inserted.[Endpoint], "
+            "inserted.[CreatedOn], inserted.[Type], inserted.[Input], inserted.[WorkerId], inserted.[ClaimedOn], inserted.[Attempts]"
         )
         try:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query)
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, *params)
                 row = cursor.fetchone()
+                columns = [column[0] for column in cursor.description] if row else None
+                conn.commit()
                 if row:
-                    columns = [column[0] for column in cursor.description]
                     return dict(zip(columns, row))
                 else:
                     return None
         except Exception as e:
             print(f"\t\t[❌-ERROR] get_next_pending_request failed: {e}")
             return None
-        
+
+    def renew_lease(self, request_id: str, worker_id: str):
+        """
+        Extends a claimed request's lease by LEASE_SECONDS. Returns True if renewed, False if the request no longer
+        belongs to this worker (its lease expired and it was re-queued or dead-lettered), None if the DB call failed.
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE tblRequests SET [LeaseExpiresOn] = DATEADD(second, ?, SYSDATETIME()) "
+                    "WHERE [Id] = ? AND [WorkerId] = ? AND [Status] = 'processing'",
+                    self.LEASE_SECONDS, request_id, worker_id)
+                renewed = cursor.rowcount > 0
+                conn.commit()
+            return renewed
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] renew_lease failed: {e}")
+            return None
+
+    def requeue_expired_leases(self):
+        """
+        Puts 'processing' requests whose lease expired (their worker died or hung) back in the status they were
+        claimed from, or moves them to DEAD_LETTER_STATUS once they used up MAX_ATTEMPTS claims. Requests claimed
+        before leases existed count as expired LEASE_SECONDS after ClaimedOn, or after CreatedOn for rows that
+        predate ClaimedOn too.
+        Returns {"requeued": [ids], "dead_lettered": [ids]}.
+        """
+        query = (
+            "UPDATE tblRequests WITH (ROWLOCK, READPAST) SET "
+            "[Status] = CASE WHEN [Attempts] >= ? THEN ? ELSE COALESCE([ClaimedFromStatus], 'queued') END, "
+            "[LastError] = CONCAT('Lease expired on attempt ', [Attempts], ' (worker ', [WorkerId], ')'), "
+            "[LeaseExpiresOn] = NULL "
+            "OUTPUT inserted.[Id], inserted.[Status] "
+            "WHERE [Status] = 'processing' "
+            "AND COALESCE([LeaseExpiresOn], DATEADD(second, ?, [ClaimedOn]), DATEADD(second, ?, [CreatedOn])) < SYSDATETIME()"
+        )
+        result = {"requeued": [], "dead_lettered": []}
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, self.MAX_ATTEMPTS, self.DEAD_LETTER_STATUS, self.LEASE_SECONDS, self.LEASE_SECONDS)
+                rows = cursor.fetchall()
+                conn.commit()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] requeue_expired_leases failed: {e}")
+            return result
+        for request_id, status in rows:
+            result["dead_lettered" if status == self.DEAD_LETTER_STATUS else "requeued"].append(request_id)
+        if result["requeued"]:
+            print(f"\t\t [⚠️-ERROR] Re-queued {len(result['requeued'])} request(s) whose worker lease expired")
+            self.notifier.notify("requeued")
+        if result["dead_lettered"]:
+            print(f"\t\t [⚠️-ERROR] Moved {len(result['dead_lettered'])} request(s) to '{self.DEAD_LETTER_STATUS}' after {self.MAX_ATTEMPTS} attempts")
+        return result
+
+    def release_request(self, request_id: str, worker_id: str, error: str, retry: bool = True):
+        """
+        Gives up a claimed request after the worker failed on it: back on the queue in the status it was claimed
+        from, or to DEAD_LETTER_STATUS if it used up MAX_ATTEMPTS or `retry` is False (it can never succeed).
+        Returns the new status, or None if the request no longer belonged to this worker.
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE tblRequests SET "
+                    "[Status] = CASE WHEN [Attempts] >= ? THEN ? ELSE COALESCE([ClaimedFromStatus], 'queued') END, "
+                    "[LastError] = ?, [LeaseExpiresOn] = NULL "
+                    "OUTPUT inserted.[Status] "
+                    "WHERE [Id] = ? AND [WorkerId] = ? AND [Status] = 'processing'",
+                    self.MAX_ATTEMPTS if retry else 0, self.DEAD_LETTER_STATUS, error, request_id, worker_id)
+                row = cursor.fetchone()
+                conn.commit()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] release_request failed: {e}")
+            return None
+        if row and row[0] != self.DEAD_LETTER_STATUS:
+            self.notifier.notify("requeued")
+        return row[0] if row else None
+
+    def fetch_dead_letter_requests(self, user_id: str = None, limit: int = 100):
+        """
+        Requests that failed MAX_ATTEMPTS times (Status DEAD_LETTER_STATUS), newest claim first, optionally for one
+        user. Returns a list of dicts: {RequestId, UserId, Type, endpoint, Attempts, LastError, WorkerId, ClaimedOn, CreatedOn}.
+        """
+        user_filter = "AND [UserId] = ? " if user_id else ""
+        params = [self.DEAD_LETTER_STATUS] + ([user_id] if user_id else []) + [max(1, limit)]
+        query = (
+            "SELECT [Id], [UserId], [Type], [Endpoint], [Attempts], [LastError], [WorkerId], [ClaimedOn], [CreatedOn] "
+            "FROM tblRequests WHERE [Status] = ? AND ([IsDeleted] IS NULL OR [IsDeleted] != 1) "
+            f"{user_filter}ORDER BY [ClaimedOn] DESC, [Id] DESC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+        )
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, *params)
+                rows = cursor.fetchall()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] fetch_dead_letter_requests failed: {e}")
+            return []
+        return [{
+            "RequestId": row.Id,
+            "UserId": row.UserId,
+            "Type": row.Type,
+            "endpoint": row.Endpoint,
+            "Attempts": row.Attempts,
+            "LastError": row.LastError,
+            "WorkerId": row.WorkerId,
+            "ClaimedOn": row.ClaimedOn.strftime("%Y-%m-%d %H:%M:%S") if row.ClaimedOn else None,
+            "CreatedOn": row.CreatedOn.strftime("%Y-%m-%d %H:%M:%S"),
+        } for row in rows]
+
     def update_task_info(self, request_id, agent_outputs: dict = None, status: str = "processing"):
         """
         If agent_outputs is None or empty, update tblRequests.Status to status and insert only RequestId/Status in tblResumeOutputs.
         Otherwise, insert agent outputs into tblResumeOutputs and update Status in tblResume.
         """
         try:
-            if not agent_outputs:
-                # Only update tblRequests and upsert minimal tblRequestOutputs
-                with self.conn.cursor() as cursor:
-                    cursor.execute("UPDATE tblRequests SET Status = ? WHERE Id = ?", (status, request_id))
+            with self.pool.connection() as conn:
+                if not agent_outputs:
+                    # Only update tblRequests and upsert minimal tblRequestOutputs
+                    with conn.cursor() as cursor:
+                        cursor.execute("UPDATE tblRequests SET Status = ? WHERE Id = ?", (status, request_id))
+                        # Check if entry exists
+                        cursor.execute("SELECT 1 FROM tblRequestOutputs WHERE RequestId = ?", (request_id,))
+                        exists = cursor.fetchone()
+                        if exists:
+                            cursor.execute("UPDATE tblRequestOutputs SET Status = ? WHERE RequestId = ?", (status, request_id))
+                        else:
+                            cursor.execute("INSERT INTO tblRequestOutputs ([RequestId], [Status]) VALUES (?, ?)", (request_id, status))
+                    conn.commit()
+                else:
+                    # Prepare columns and values for upsert
+                    agent_columns = ["Agent2", "Agent3", "Agent4", "Agent5"]
+                    set_clauses = []
+                    set_values = []
+                    for agent in agent_columns:
+                        if agent in agent_outputs:
+                            set_clauses.append(f"[{agent}] = ?")
+                            set_values.append(json.dumps(agent_outputs[agent]))
+                    set_clauses.append("[Status] = ?")
+                    set_values.append(status)
                     # Check if entry exists
-                    cursor.execute("SELECT 1 FROM tblRequestOutputs WHERE RequestId = ?", (request_id,))
-                    exists = cursor.fetchone()
-                    if exists:
-                        cursor.execute("UPDATE tblRequestOutputs SET Status = ? WHERE RequestId = ?", (status, request_id))
-                    else:
-                        cursor.execute("INSERT INTO tblRequestOutputs ([RequestId], [Status]) VALUES (?, ?)", (request_id, status))
-                self.conn.commit()
-            else:
-                # Prepare columns and values for upsert
-                agent_columns = ["Agent2", "Agent3", "Agent4", "Agent5"]
-                set_clauses = []
-                set_values = []
-                for agent in agent_columns:
-                    if agent in agent_outputs:
-                        set_clauses.append(f"[{agent}] = ?")
-                        set_values.append(json.dumps(agent_outputs[agent]))
-                set_clauses.append("[Status] = ?")
-                set_values.append(status)
-                # Check if entry exists
-                with self.conn.cursor() as cursor:
-                    cursor.execute("SELECT 1 FROM tblRequestOutputs WHERE RequestId = ?", (request_id,))
-                    exists = cursor.fetchone()
-                    if exists:
-                        # Update only the agent columns and status
-                        update_stmt = f"UPDATE tblRequestOutputs SET {', '.join(set_clauses)} WHERE RequestId = ?"
-                        cursor.execute(update_stmt, (*set_values, request_id))
-                    else:
-                        # Insert new row with only the provided agent columns and status
-                        columns = ["RequestId"] + [agent for agent in agent_columns if agent in agent_outputs] + ["Status"]
-                        values = [request_id] + [json.dumps(agent_outputs[agent]) for agent in agent_columns if agent in agent_outputs] + [status]
-                        col_str = ", ".join(f"[{col}]" for col in columns)
-                        param_str = ", ".join(["?"] * len(values))
-                        insert_query = f"INSERT INTO tblRequestOutputs ({col_str}) VALUES ({param_str})"
-                        cursor.execute(insert_query, values)
-                    # Also update tblRequests.Status
-                    cursor.execute("UPDATE tblRequests SET Status = ? WHERE Id = ?", (status, request_id))
-                self.conn.commit()
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1 FROM tblRequestOutputs WHERE RequestId = ?", (request_id,))
+                        exists = cursor.fetchone()
+                        if exists:
+                            # Update only the agent columns and status
+                            update_stmt = f"UPDATE tblRequestOutputs SET {', '.join(set_clauses)} WHERE RequestId = ?"
+                            cursor.execute(update_stmt, (*set_values, request_id))
+                        else:
+                            # Insert new row with only the provided agent columns and status
+                            columns = ["RequestId"] + [agent for agent in agent_columns if agent in agent_outputs] + ["Status"]
+                            values = [request_id] + [json.dumps(agent_outputs[agent]) for agent in agent_columns if agent in agent_outputs] + [status]
+                            col_str = ", ".join(f"[{col}]" for col in columns)
+                            param_str = ", ".join(["?"] * len(values))
+                            insert_query = f"INSERT INTO tblRequestOutputs ({col_str}) VALUES ({param_str})"
+                            cursor.execute(insert_query, values)
+                        # Also update tblRequests.Status
+                        cursor.execute("UPDATE tblRequests SET Status = ? WHERE Id = ?", (status, request_id))
+                    conn.commit()
         except Exception as e:
+            # The pool rolls the connection back when it is returned
             print(f"\t\t [❌-ERROR] update_task_info failed: {e}")
-            self.conn.rollback()
+
+    def save_stage_checkpoint(self, request_id: str, stage: str, output, seconds: float, column: str = None, inputs_hash: str = None):
+        """
+        Records that one stage of a request finished, as soon as it finishes, so a request picked up again after a
+        crash resumes from its first unfinished stage (see fetch_stage_checkpoints).
+        tblRequestOutputs.StageCheckpoints holds {stage: {"seconds", "finished_on", "output" | "column", "inputs_hash"}}:
+        with `column` (one of AGENT_COLUMNS) the output goes into that agent column instead of being stored twice.
+        With `inputs_hash` (a hash of what the stage was run on) the output is kept in the checkpoint as well, so it
+        stays the stage's own output after the column is edited (update_request_approval) and can be reused for
+        identical inputs. Returns True on success; a failed checkpoint only costs a re-run of the stage.
+        """
+        if column is not None and column not in self.AGENT_COLUMNS:
+            raise ValueError(f"column must be one of {self.AGENT_COLUMNS}")
+        entry = {"seconds": round(seconds, 3), "finished_on": datetime.datetime.now().isoformat(timespec="seconds")}
+        if column is None or inputs_hash is not None:
+            entry["output"] = output
+        if column is not None:
+            entry["column"] = column
+        if inputs_hash is not None:
+            entry["inputs_hash"] = inputs_hash
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                # UPDLOCK keeps the read-modify-write of the checkpoint map atomic
+                cursor.execute("SELECT StageCheckpoints FROM tblRequestOutputs WITH (UPDLOCK, ROWLOCK) WHERE RequestId = ?", request_id)
+                row = cursor.fetchone()
+                checkpoints = json.loads(row[0]) if row and row[0] else {}
+                checkpoints[stage] = entry
+                values = {"StageCheckpoints": json.dumps(checkpoints, ensure_ascii=False)}
+                if column is not None:
+                    values[column] = json.dumps(output)
+                if row:
+                    set_str = ", ".join(f"[{col}] = ?" for col in values)
+                    cursor.execute(f"UPDATE tblRequestOutputs SET {set_str} WHERE RequestId = ?", (*values.values(), request_id))
+                else:
+                    values["Status"] = "processing"
+                    col_str = ", ".join(f"[{col}]" for col in ["RequestId", *values])
+                    param_str = ", ".join(["?"] * (len(values) + 1))
+                    cursor.execute(f"INSERT INTO tblRequestOutputs ({col_str}) VALUES ({param_str})", (request_id, *values.values()))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] save_stage_checkpoint failed for {stage}: {e}")
+            return False
+
+    def fetch_stage_checkpoints(self, request_id: str):
+        """
+        Returns {"status", "stages": {stage: {"output", "stage_output", "inputs_hash", "seconds", "finished_on"}},
+        "agents": {AgentN: output}} for a request, whatever its status (a claimed request is already 'processing').
+        "output" is the current value (the agent column, which users may have edited); "stage_output" is what the
+        stage itself produced, when it was kept (see save_stage_checkpoint). Empty dicts if nothing was saved yet.
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {', '.join(f'o.[{agent}]' for agent in self.AGENT_COLUMNS)}, o.[StageCheckpoints], r.[Status] "
+                    "FROM tblRequestOutputs o LEFT JOIN tblRequests r ON r.[Id] = o.[RequestId] WHERE o.[RequestId] = ?",
+                    request_id)
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] fetch_stage_checkpoints failed: {e}")
+            return {"status": None, "stages": {}, "agents": {}}
+        if not row:
+            return {"status": None, "stages": {}, "agents": {}}
+        agents = {}
+        for idx, agent in enumerate(self.AGENT_COLUMNS):
+            val = row[idx]
+            try:
+                agents[agent] = json.loads(val) if isinstance(val, str) else val
+            except Exception:
+                agents[agent] = val
+        checkpoints = json.loads(row[len(self.AGENT_COLUMNS)]) if row[len(self.AGENT_COLUMNS)] else {}
+        stages = {}
+        for stage, entry in checkpoints.items():
+            output = agents.get(entry["column"]) if "column" in entry else entry.get("output")
+            stages[stage] = {"output": output, "stage_output": entry.get("output"), "inputs_hash": entry.get("inputs_hash"),
+                             "seconds": entry.get("seconds"), "finished_on": entry.get("finished_on")}
+        return {"status": row[len(self.AGENT_COLUMNS) + 1], "stages": stages, "agents": agents}
+
+    def fetch_job_analysis(self, fingerprint: str, model: str):
+        """
+        Returns the cached Agent3 output for a job fingerprint (utils/job_fingerprint.py) analysed by `model`,
+        or None if there is none or it expired. Every lookup counts as a hit or a miss in tblJobAnalysisCacheStats
+        (job_analysis_cache_stats()), whatever the caller does next; hits are also counted on the row itself.
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE tblJobAnalysisCache SET [Hits] = [Hits] + 1, [LastHitOn] = SYSDATETIME() "
+                    "OUTPUT inserted.[Analysis] "
+                    "WHERE [Fingerprint] = ? AND [Model] = ? AND [ExpiresOn] > SYSDATETIME()",
+                    fingerprint, model)
+                row = cursor.fetchone()
+                try:
+                    cursor.execute("UPDATE tblJobAnalysisCacheStats SET [Hits] = [Hits] + ?, [Misses] = [Misses] + ? WHERE [Id] = 1",
+                                   1 if row else 0, 0 if row else 1)
+                except Exception as e:
+                    # Losing a count must not lose the cached analysis
+                    print(f"\t\t [⚠️-ERROR] fetch_job_analysis could not count the lookup: {e}")
+                conn.commit()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] fetch_job_analysis failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def save_job_analysis(self, fingerprint: str, model: str, analysis):
+        """
+        Stores (or refreshes, restarting its TTL) the Agent3 output for a job fingerprint after a cache miss.
+        """
+        query = (
+            "MERGE tblJobAnalysisCache WITH (HOLDLOCK) AS target "
+            "USING (SELECT ? AS [Fingerprint], ? AS [Model], ? AS [Analysis]) AS source "
+            "ON target.[Fingerprint] = source.[Fingerprint] AND target.[Model] = source.[Model] "
+            "WHEN MATCHED THEN UPDATE SET [Analysis] = source.[Analysis], [CreatedOn] = SYSDATETIME(), "
+            "[ExpiresOn] = DATEADD(hour, ?, SYSDATETIME()) "
+            "WHEN NOT MATCHED THEN INSERT ([Fingerprint], [Model], [Analysis], [CreatedOn], [ExpiresOn], [Hits]) "
+            "VALUES (source.[Fingerprint], source.[Model], source.[Analysis], SYSDATETIME(), DATEADD(hour, ?, SYSDATETIME()), 0);"
+        )
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, fingerprint, model, json.dumps(analysis, ensure_ascii=False),
+                               self.JOB_ANALYSIS_TTL_HOURS, self.JOB_ANALYSIS_TTL_HOURS)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] save_job_analysis failed: {e}")
+            return False
+
+    def fetch_curated_job_descriptions(self, after: tuple = None, limit: int = 1000):
+        """
+        One page of the job descriptions of curation requests whose Agent3 output is stored, oldest first, for
+        backfilling the near-duplicate job index (utils/job_index.py). `after` is the (CreatedOn, Id) of the last
+        row of the previous page. Returns a list of dicts {Id, Input, CreatedOn}, empty past the last page, or
+        None if the query failed. The connection goes back to the pool before the caller hashes anything.
+        """
+        keyset = "AND (r.[CreatedOn] > ? OR (r.[CreatedOn] = ? AND r.[Id] > ?)) " if after else ""
+        params = [max(1, limit)] + ([after[0], after[0], after[1]] if after else [])
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT TOP (?) r.[Id], r.[Input], r.[CreatedOn] FROM tblRequests r "
+                    "JOIN tblRequestOutputs o ON o.[RequestId] = r.[Id] "
+                    "WHERE r.[Type] = 'Curate' AND o.[Agent3] IS NOT NULL AND (r.[IsDeleted] IS NULL OR r.[IsDeleted] != 1) "
+                    f"{keyset}ORDER BY r.[CreatedOn], r.[Id]", *params)
+                rows = cursor.fetchall()
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] fetch_curated_job_descriptions failed: {e}")
+            return None
+        return [{"Id": row.Id, "Input": row.Input, "CreatedOn": row.CreatedOn} for row in rows]
+
+    def job_analysis_cache_stats(self):
+        """Size and all-time hit rate of tblJobAnalysisCache, counted over every lookup by every worker."""
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*), SUM(CASE WHEN [ExpiresOn] > SYSDATETIME() THEN 1 ELSE 0 END), "
+                    "(SELECT [Hits] FROM tblJobAnalysisCacheStats WHERE [Id] = 1), "
+                    "(SELECT [Misses] FROM tblJobAnalysisCacheStats WHERE [Id] = 1) FROM tblJobAnalysisCache")
+                entries, live, hits, misses = cursor.fetchone()
+                hits, misses = hits or 0, misses or 0
+        except Exception as e:
+            print(f"\t\t [❌-ERROR] job_analysis_cache_stats failed: {e}")
+            return {"error": str(e)}
+        return {"entries": entries, "live_entries": live or 0, "hits": hits, "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "ttl_hours": self.JOB_ANALYSIS_TTL_HOURS}
 
     def update_tblResume(self, resume_id: str, resume_json: str, FilePath: str = None):
         """
         Updates ResumeJson column in tblResume for the given resume_id. If FilePath is provided, also updates FilePath column.
-        Uses self.conn for the update.
         """
         try:
             # Ensure resume_json is a string
             if not isinstance(resume_json, str):
                 resume_json = json.dumps(resume_json, ensure_ascii=False)
-            with self.conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 if FilePath is not None:
                     FilePath = FilePath.replace('\\', '/')
                     FilePath = FilePath[1:] if FilePath.startswith('/') else FilePath
@@ -610,45 +915,47 @@ class DBManager:
                         "UPDATE tblResume SET ResumeJson = ? WHERE Id = ?",
                         resume_json, resume_id
                     )
-                self.conn.commit()
+                conn.commit()
             return True
         except Exception as e:
             print(f"\t\t [❌-ERROR] update_tblResume failed: {e}")
-            self.conn.rollback()
             return False
-        
+
     def fetch_resume_detail(self, resume_id: str, fetch_resume_parse: bool = False):
         """
         Fetches the full resume detail including Id, UserId, ResumeName, FilePath, IsCurated, ResumeJson, CreatedOn.
         If fetch_resume_parse is True, also returns parsed resume JSON using WordFileManager.export_json.
         """
         try:
-            with self.conn.cursor() as cursor:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
                 cursor.execute("SELECT * FROM tblResume WHERE Id = ?", resume_id)
                 row = cursor.fetchone()
+                if not row:
+                    return None
+                columns = [column[0] for column in cursor.description]
+                result = dict(zip(columns, row))
+                cursor.execute("SELECT ResumeJson FROM tblResume WHERE Id = ?", result['EditedBy'])
+                row = cursor.fetchone()
                 if row:
-                    columns = [column[0] for column in cursor.description]
-                    result = dict(zip(columns, row))
-                    if fetch_resume_parse:
-                        rel_path = result.get("FilePath")
-                        if rel_path:
-                            abs_path = os.path.join(self.PATH_self_dir, rel_path)
-                            try:
-                                parser = WordFileManager(abs_path)
-                                parser.read()
-                                result["parsed_json"] = parser.export_json()
-                            except Exception as e:
-                                print(f"\t\t [❌-ERROR] Could not parse resume file: {e}")
-                                result["parsed_json"] = None
-                        else:
-                            result["parsed_json"] = None
-                    cursor.execute("SELECT ResumeJson FROM tblResume WHERE Id = ?", result['EditedBy'])
-                    row = cursor.fetchone()
-                    if row:
-                        result["ResumeJson"] = row[0]
-                    return result
+                    result["ResumeJson"] = row[0]
+
+            # Parse outside the connection block so the pooled connection is not held during parsing
+            if fetch_resume_parse:
+                rel_path = result.get("FilePath")
+                if rel_path:
+                    abs_path = os.path.join(self.PATH_self_dir, rel_path)
+                    try:
+                        # python-docx / docxedit / lxml are only loaded once a resume is actually parsed
+                        from utils.wordparser import WordFileManager
+                        parser = WordFileManager(abs_path, self.get_model())
+                        parser.read()
+                        result["parsed_json"] = parser.export_json()
+                    except Exception as e:
+                        print(f"\t\t [❌-ERROR] Could not parse resume file: {e}")
+                        result["parsed_json"] = None
                 else:
-                    return None
+                    result["parsed_json"] = None
+            return result
         except Exception as e:
             print(f"\t\t [❌-ERROR] fetch_resume_detail failed: {e}")
             return None
@@ -664,31 +971,31 @@ class DBManager:
         """
         try:
             if TableName == "tblResume":
-                # Set IsDeleted = 1 for the Id
-                with self.conn.cursor() as cursor:
-                    cursor.execute("UPDATE tblResume SET IsDeleted = 1 WHERE Id = ?", Id)
-                    # Fetch FilePath
-                    cursor.execute("SELECT FilePath FROM tblResume WHERE Id = ?", Id)
-                    row = cursor.fetchone()
-                    if row and row[0]:
-                        rel_file_path = row[0]
-                        abs_file_path = self.get_resume_full_path(rel_file_path)
-                        print(abs_file_path)
-                        # Delete the file if it exists
-                        if os.path.exists(abs_file_path):
-                            os.remove(abs_file_path)
-                self.conn.commit()
+                with self.pool.connection() as conn:
+                    # Set IsDeleted = 1 for the Id
+                    with conn.cursor() as cursor:
+                        cursor.execute("UPDATE tblResume SET IsDeleted = 1 WHERE Id = ?", Id)
+                        # Fetch FilePath
+                        cursor.execute("SELECT FilePath FROM tblResume WHERE Id = ?", Id)
+                        row = cursor.fetchone()
+                        if row and row[0]:
+                            rel_file_path = row[0]
+                            abs_file_path = self.get_resume_full_path(rel_file_path)
+                            print(abs_file_path)
+                            # Delete the file if it exists
+                            if os.path.exists(abs_file_path):
+                                os.remove(abs_file_path)
+                    conn.commit()
                 return True, None
             elif TableName == "tblRequests":
-                # Set IsDelete = 1 for the Id
-                with self.conn.cursor() as cursor:
-                    cursor.execute("UPDATE tblRequests SET IsDeleted = 1 WHERE Id = ?", Id)
-                self.conn.commit()
+                with self.pool.connection() as conn:
+                    # Set IsDelete = 1 for the Id
+                    with conn.cursor() as cursor:
+                        cursor.execute("UPDATE tblRequests SET IsDeleted = 1 WHERE Id = ?", Id)
+                    conn.commit()
                 return True, None
             else:
                 return False, f"Unsupported TableName: {TableName}"
         except Exception as e:
             print(f"\t\t [❌-ERROR] delete_db_entry failed: {e}")
-            self.conn.rollback()
             return False, str(e)
-
@@ -1,18 +1,18 @@
+import argparse
 import multiprocessing
 import subprocess
 import time
-from worker import Worker  # or whatever your infinite loop function is
+from supervisor import WorkerSupervisor
 
 def start_server():
     # Start the FastAPI server as a subprocess
     subprocess.Popen(["python", "pepper.py"])  # make sure pepper.py has `if __name__ == "__main__"` block
 
-def start_worker():
-    # Your worker loop - can be imported and started directly
-    OBJ_Worker = Worker()
-    OBJ_Worker.start_worker_loop()
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Launch the Pepper server and its queue workers")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes sharing one model")
+    args = parser.parse_args()
+
     # Step 1: Start FastAPI server
     print("\n\n\t\t [🚀-INIT] Launching Pepper server and worker...")
     server_process = multiprocessing.Process(target=start_server)
@@ -21,5 +21,6 @@ if __name__ == "__main__":
     # Optional: Wait a few seconds to let server initialize
     time.sleep(1)
 
-    # Step 2: Start the request worker in this process
-    start_worker()  # This blocks forever (infinite loop)
+    # Step 2: Start the inference service and the request workers; restarts them if they die
+    OBJ_Supervisor = WorkerSupervisor(n_workers=args.workers)
+    OBJ_Supervisor.run()  # This blocks forever
@@ -0,0 +1,150 @@
+import os
+import time
+import threading
+import multiprocessing
+from utils.task_notifier import TaskListener, EventWakeup
+from utils.inference_service import run_inference_server, ADDRESS_ENV, AUTHKEY_ENV, DEFAULT_PORT
+
+
+def run_worker(wakeup):
+    """Default worker process body: the regular queue Worker."""
+    from worker import Worker
+    OBJ_Worker = Worker(wakeup=wakeup)
+    OBJ_Worker.start_worker_loop()
+
+
+def _worker_main(target, inference_address: str, authkey_hex: str, event, args):
+    # Makes model_registry.acquire_model() hand out the shared inference service in this process
+    os.environ[ADDRESS_ENV] = inference_address
+    os.environ[AUTHKEY_ENV] = authkey_hex
+    target(EventWakeup(event), *args)
+
+
+class WorkerSupervisor:
+    """
+    Runs `n_workers` queue worker processes next to one inference process that owns the model.
+
+    - The inference process loads the model once and serves query() over local IPC (utils/inference_service.py),
+      so N workers cost one copy of the weights.
+    - Workers and the inference process are restarted when they die, with a back-off for processes that keep
+      crashing right after start.
+    - The supervisor owns the enqueue listener (utils/task_notifier.py) and wakes every idle worker on a ping.
+    """
+
+    MONITOR_INTERVAL = 1.0
+    RESTART_BACKOFF_MIN = 1.0
+    RESTART_BACKOFF_MAX = 60.0
+    HEALTHY_UPTIME = 30.0   # a process that ran this long before dying restarts without back-off
+
+    def __init__(self, n_workers: int = 2, worker_target=run_worker, worker_args: tuple = (), model_factory=None,
+                 inference_port: int = None, listen: bool = True):
+        self.n_workers = n_workers
+        self.worker_target = worker_target
+        self.worker_args = worker_args
+        self.model_factory = model_factory
+        # spawn everywhere: it is the only start method on Windows and the safe one with CUDA
+        self.ctx = multiprocessing.get_context("spawn")
+        self.authkey = os.urandom(16)
+        self.inference_address = ("127.0.0.1", inference_port or DEFAULT_PORT)
+        self.listen = listen
+
+        self.inference_process = None
+        self.workers = {}       # worker_no -> {"process", "event", "started_at", "backoff", "restart_at"}
+        self.restarts = 0
+        self.listener = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _start_inference(self):
+        ready = self.ctx.Event()
+        self.inference_process = self.ctx.Process(target=run_inference_server, name="pepper-inference", daemon=True,
+                                                  args=(self.inference_address, self.authkey, ready, self.model_factory))
+        self.inference_process.start()
+        while not ready.wait(1.0):
+            if not self.inference_process.is_alive():
+                raise RuntimeError(f"Inference service exited with code {self.inference_process.exitcode} during startup")
+
+    def _start_worker(self, worker_no: int):
+        state = self.workers.setdefault(worker_no, {"event": self.ctx.Event(), "backoff": 0.0})
+        address = f"{self.inference_address[0]}:{self.inference_address[1]}"
+        state["process"] = self.ctx.Process(target=_worker_main, name=f"pepper-worker-{worker_no}", daemon=True,
+                                            args=(self.worker_target, address, self.authkey.hex(), state["event"], self.worker_args))
+        state["process"].start()
+        state["started_at"] = time.monotonic()
+        state["restart_at"] = None
+
+    def start(self):
+        print(f"\t\t [🚀-INIT] Supervisor starting the inference service and {self.n_workers} workers ...")
+        self._start_inference()
+        for worker_no in range(self.n_workers):
+            self._start_worker(worker_no)
+        self._threads = [threading.Thread(target=self._monitor_loop, name="supervisor-monitor", daemon=True)]
+        if self.listen:
+            self.listener = TaskListener()
+            self._threads.append(threading.Thread(target=self._wakeup_loop, name="supervisor-wakeup", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"\t\t [✅-INFO] Supervisor running {self.n_workers} workers (pids {[s['process'].pid for s in self.workers.values()]})")
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self.MONITOR_INTERVAL):
+            if not self.inference_process.is_alive():
+                print(f"\t\t [❌-ERROR] Inference service died (exit code {self.inference_process.exitcode}), restarting ...")
+                self.restarts += 1
+                try:
+                    self._start_inference()
+                except RuntimeError as e:
+                    print(f"\t\t [❌-ERROR] {e}")
+            now = time.monotonic()
+            for worker_no, state in self.workers.items():
+                process = state["process"]
+                if process.is_alive() or self._stop.is_set():
+                    continue
+                if state["restart_at"] is None:
+                    if now - state["started_at"] < self.HEALTHY_UPTIME:
+                        state["backoff"] = min(max(state["backoff"] * 2, self.RESTART_BACKOFF_MIN), self.RESTART_BACKOFF_MAX)
+                    else:
+                        state["backoff"] = 0.0
+                    state["restart_at"] = now + state["backoff"]
+                    print(f"\t\t [❌-ERROR] Worker {worker_no} (pid {process.pid}) died with exit code {process.exitcode}, "
+                          f"restarting in {state['backoff']:.0f}s")
+                elif now >= state["restart_at"]:
+                    self.restarts += 1
+                    self._start_worker(worker_no)
+                    print(f"\t\t [✅-INFO] Worker {worker_no} restarted (pid {state['process'].pid})")
+
+    def _wakeup_loop(self):
+        while not self._stop.is_set():
+            if self.listener.wait(1.0):
+                for state in self.workers.values():
+                    state["event"].set()
+
+    def stats(self) -> dict:
+        return {"workers": self.n_workers,
+                "alive": sum(state["process"].is_alive() for state in self.workers.values()),
+                "restarts": self.restarts,
+                "inference_alive": self.inference_process is not None and self.inference_process.is_alive()}
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        processes = [state["process"] for state in self.workers.values()] + [self.inference_process]
+        for process in processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process is not None:
+                process.join(5)
+        if self.listener is not None:
+            self.listener.close()
+        print(f"\t\t [✅-INFO] Supervisor stopped. {self.stats()}")
+
+    def run(self):
+        """Blocks until interrupted."""
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
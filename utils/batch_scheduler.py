@@ -0,0 +1,116 @@
+import json
+import time
+import threading
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    """
+    Collects prompts from concurrent callers for up to `window_ms` and runs them as one batched call.
+
+    Prompts are only batched together when they share the same generation args and fall in the same
+    power-of-two length bucket, so one long prompt does not pad a batch of short ones. A group is flushed
+    when it reaches `max_batch_size` or when the window opened by its first prompt expires. All batches
+    run on the scheduler's single dispatcher thread, which also keeps generate() off concurrent threads.
+
+    run_batch(prompts, generation_args) -> list of results, one per prompt, in order.
+    length_fn(prompt) -> prompt length in tokens, used for bucketing.
+    """
+
+    def __init__(self, run_batch, window_ms: float = 20, max_batch_size: int = 8, length_fn=None):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.length_fn = length_fn
+
+        self._cond = threading.Condition()
+        self._groups = {}       # (args key, length bucket) -> {"deadline", "args", "items": [(prompt, future)]}
+        self._closed = False
+        self.metrics = {"requests": 0, "batches": 0, "batched_requests": 0, "max_batch": 0, "wait_time": 0.0}
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="batch-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def _group_key(self, prompt, generation_args):
+        args_key = json.dumps(generation_args or {}, sort_keys=True, default=str)
+        length = self.length_fn(prompt) if self.length_fn else 0
+        return args_key, max(0, length - 1).bit_length()
+
+    def submit(self, prompt, generation_args: dict = None) -> Future:
+        """Queues one prompt (one chat conversation); the returned future resolves to its response."""
+        future = Future()
+        future.submitted_at = time.monotonic()
+        key = self._group_key(prompt, generation_args)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {"deadline": time.monotonic() + self.window, "args": generation_args, "items": []}
+            group["items"].append((prompt, future))
+            self.metrics["requests"] += 1
+            self._cond.notify()
+        return future
+
+    def query(self, prompt, generation_args: dict = None):
+        """Blocking submit(): waits for the batch holding this prompt and returns its response."""
+        return self.submit(prompt, generation_args).result()
+
+    def _next_batch(self):
+        """Blocks until some group is full or past its deadline, then takes up to max_batch_size prompts from it."""
+        with self._cond:
+            while True:
+                if self._closed and not self._groups:
+                    return None
+                now = time.monotonic()
+                ready = [key for key, group in self._groups.items()
+                         if len(group["items"]) >= self.max_batch_size or group["deadline"] <= now or self._closed]
+                if ready:
+                    key = min(ready, key=lambda k: self._groups[k]["deadline"])
+                    group = self._groups[key]
+                    items, group["items"] = group["items"][:self.max_batch_size], group["items"][self.max_batch_size:]
+                    if group["items"]:
+                        # Leftovers of a full group go out right away rather than waiting for a new window
+                        group["deadline"] = now
+                    else:
+                        del self._groups[key]
+                    return group["args"], items
+                timeout = min(group["deadline"] for group in self._groups.values()) - now if self._groups else None
+                self._cond.wait(timeout)
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            generation_args, items = batch
+            prompts = [prompt for prompt, _ in items]
+            now = time.monotonic()
+            with self._cond:
+                self.metrics["batches"] += 1
+                self.metrics["batched_requests"] += len(items) if len(items) > 1 else 0
+                self.metrics["max_batch"] = max(self.metrics["max_batch"], len(items))
+                self.metrics["wait_time"] += sum(now - future.submitted_at for _, future in items)
+            try:
+                results = self.run_batch(prompts, generation_args)
+                if len(results) != len(items):
+                    raise RuntimeError(f"run_batch returned {len(results)} results for {len(items)} prompts")
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._cond:
+            batches = self.metrics["batches"]
+            return {**self.metrics, "wait_time": round(self.metrics["wait_time"], 4),
+                    "mean_batch_size": round(self.metrics["requests"] / batches, 2) if batches else 0.0,
+                    "window_ms": self.window * 1000, "max_batch_size": self.max_batch_size}
+
+    def close(self):
+        """Flushes whatever is queued, then stops the dispatcher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join()
@@ -0,0 +1,169 @@
+"""
+Streaming, read-only .docx reader.
+
+Iterparses the main document part straight out of the zip and yields lightweight paragraph records
+(text, runs with bold/italic/font size, style name) for the top-level body paragraphs, i.e. the same
+paragraphs python-docx exposes as `Document.paragraphs`. No python-docx proxy objects are built, and
+each paragraph subtree is freed as soon as it has been read.
+"""
+import io
+import zipfile
+import posixpath
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+STYLES_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+W_BODY, W_P, W_R, W_HYPERLINK = _w("body"), _w("p"), _w("r"), _w("hyperlink")
+W_PPR, W_PSTYLE, W_RPR, W_VAL = _w("pPr"), _w("pStyle"), _w("rPr"), _w("val")
+W_B, W_I, W_SZ = _w("b"), _w("i"), _w("sz")
+W_T, W_TAB, W_PTAB, W_BR, W_CR, W_NOBREAKHYPHEN = _w("t"), _w("tab"), _w("ptab"), _w("br"), _w("cr"), _w("noBreakHyphen")
+W_TYPE = _w("type")
+
+
+class RunRecord:
+    """Read-only stand-in for docx.text.run.Run with just the fields the parser uses."""
+    __slots__ = ("text", "bold", "italic", "size_pt")
+
+    def __init__(self, text, bold, italic, size_pt):
+        self.text = text
+        self.bold = bold
+        self.italic = italic
+        self.size_pt = size_pt
+
+
+class ParagraphRecord:
+    """Read-only stand-in for docx.text.paragraph.Paragraph."""
+    __slots__ = ("text", "runs", "style_name")
+
+    def __init__(self, text, runs, style_name):
+        self.text = text
+        self.runs = runs
+        self.style_name = style_name
+
+
+def _on_off(elem):
+    """Same tri-state python-docx reports for w:b / w:i: None if absent, else the boolean value."""
+    if elem is None:
+        return None
+    return elem.get(W_VAL, "true") in ("1", "true", "on")
+
+
+def _run_text(r):
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag in (W_TAB, W_PTAB):
+            parts.append("\t")
+        elif tag == W_BR:
+            parts.append("\n" if child.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+        elif tag == W_CR:
+            parts.append("\n")
+        elif tag == W_NOBREAKHYPHEN:
+            parts.append("-")
+    return "".join(parts)
+
+
+def _run_record(r):
+    rPr = r.find(W_RPR)
+    bold = italic = size_pt = None
+    if rPr is not None:
+        bold = _on_off(rPr.find(W_B))
+        italic = _on_off(rPr.find(W_I))
+        sz = rPr.find(W_SZ)
+        if sz is not None and sz.get(W_VAL):
+            size_pt = int(sz.get(W_VAL)) / 2  # half-points
+    return RunRecord(_run_text(r), bold, italic, size_pt)
+
+
+def _paragraph_record(p, style_names, default_style):
+    runs = []
+    text_parts = []
+    for child in p:
+        if child.tag == W_R:
+            run = _run_record(child)
+            runs.append(run)
+            text_parts.append(run.text)
+        elif child.tag == W_HYPERLINK:
+            text_parts.extend(_run_text(r) for r in child.iterchildren(W_R))
+    style_id = None
+    pPr = p.find(W_PPR)
+    if pPr is not None:
+        pStyle = pPr.find(W_PSTYLE)
+        if pStyle is not None:
+            style_id = pStyle.get(W_VAL)
+    style_name = style_names.get(style_id, default_style) if style_id else default_style
+    return ParagraphRecord("".join(text_parts), runs, style_name)
+
+
+def _part_targets(zf, rels_path, base_dir):
+    """Maps relationship type -> part name for a .rels file."""
+    if rels_path not in zf.namelist():
+        return {}
+    targets = {}
+    for rel in etree.fromstring(zf.read(rels_path)).iterchildren(f"{{{R_NS}}}Relationship"):
+        target = rel.get("Target")
+        if rel.get("TargetMode") == "External" or not target:
+            continue
+        name = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base_dir, target))
+        targets[rel.get("Type")] = name
+    return targets
+
+
+def _style_names(zf, styles_part):
+    """Returns ({paragraph style id: name}, default paragraph style name)."""
+    if not styles_part or styles_part not in zf.namelist():
+        return {}, "Normal"
+    names = {}
+    default_style = "Normal"
+    for style in etree.fromstring(zf.read(styles_part)).iterchildren(_w("style")):
+        if style.get(_w("type")) != "paragraph":
+            continue
+        name_elem = style.find(_w("name"))
+        name = name_elem.get(W_VAL) if name_elem is not None else style.get(_w("styleId"))
+        # python-docx reports built-in names capitalised ("heading 1" -> "Heading 1")
+        name = name[0].upper() + name[1:] if name and name.islower() else name
+        names[style.get(_w("styleId"))] = name
+        if style.get(_w("default")) in ("1", "true", "on"):
+            default_style = name
+    return names, default_style
+
+
+def iter_body_paragraphs(source):
+    """
+    Yields a ParagraphRecord for every top-level body paragraph of the .docx at `source`
+    (a path, bytes or a binary file object), in document order.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as zf:
+        package_rels = _part_targets(zf, "_rels/.rels", "")
+        document_part = package_rels.get(OFFICE_DOCUMENT_REL, "word/document.xml")
+        document_dir = posixpath.dirname(document_part)
+        document_rels = _part_targets(zf, posixpath.join(document_dir, "_rels", posixpath.basename(document_part) + ".rels"), document_dir)
+        style_names, default_style = _style_names(zf, document_rels.get(STYLES_REL))
+
+        with zf.open(document_part) as xml_stream:
+            for _, elem in etree.iterparse(xml_stream, events=("end",), remove_blank_text=False):
+                parent = elem.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue
+                if elem.tag == W_P:
+                    yield _paragraph_record(elem, style_names, default_style)
+                # Free every finished top-level block (paragraphs, tables, ...) as we go
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+
+def read_body_paragraphs(source) -> list:
+    return list(iter_body_paragraphs(source))
@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from google import genai
+from google.genai import types, errors
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets shared by every Gemini call of the process.
+    acquire(tokens) blocks until both buckets have room; a limit of 0 means unlimited. The buckets hold
+    `burst_seconds` worth of budget, so by default a full minute's quota may be spent at once.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, burst_seconds: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._request_capacity = max(1.0, rpm * burst_seconds / 60) if rpm else 0
+        self._token_capacity = max(1.0, tpm * burst_seconds / 60) if tpm else 0
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.wait_time = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        if self.rpm:
+            self._requests = min(self._request_capacity, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self._token_capacity, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Returns how long the caller was held back."""
+        # A single request larger than the whole bucket still goes through once the bucket is full
+        tokens = min(tokens, self._token_capacity) if self.tpm else 0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                request_wait = (1 - self._requests) * 60 / self.rpm if self.rpm and self._requests < 1 else 0.0
+                token_wait = (tokens - self._tokens) * 60 / self.tpm if self.tpm and self._tokens < tokens else 0.0
+                if request_wait <= 0 and token_wait <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    self.wait_time += waited
+                    return waited
+            delay = max(request_wait, token_wait)
+            time.sleep(delay)
+            waited += delay
+
+    def debit(self, tokens: int):
+        """Corrects the token bucket once the real usage of a request is known (may be negative)."""
+        if self.tpm and tokens:
+            with self._lock:
+                self._tokens = min(self._token_capacity, self._tokens - tokens)
+
+
+class GeminiClient:
+    """
+    One genai.Client (one pooled HTTP connection set) per process, wrapped with:
+    - a RateLimiter in front of every request,
+    - retries with full-jitter exponential backoff on 429 / 5xx / transport errors (honouring Retry-After),
+    - a thread pool so a list of prompts (Agent3's recruiter + ATS pair) is sent concurrently.
+    base_url points the client at another endpoint, e.g. a local stand-in server for benchmarks.
+    """
+
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", base_url: str = None, rpm: float = 0, tpm: float = 0,
+                 max_concurrency: int = 8, max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 burst_seconds: float = 60.0):
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.model = model
+        self.limiter = RateLimiter(rpm, tpm, burst_seconds)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._metrics_lock = threading.Lock()
+        self.metrics = {"requests": 0, "retries": 0, "failures": 0, "prompt_tokens": 0, "backoff_time": 0.0}
+
+    @staticmethod
+    def build_config(system_prompt: str, thinking_budget, response_schema: dict = None):
+        config = {"system_instruction": system_prompt}
+        if not thinking_budget:
+            config["thinking_config"] = types.ThinkingConfig(thinking_budget=0)
+        if response_schema is not None:
+            # Native structured output: the API only returns JSON matching the schema
+            config["response_mime_type"] = "application/json"
+            config["response_json_schema"] = response_schema
+        return types.GenerateContentConfig(**config)
+
+    @staticmethod
+    def estimate_tokens(conversation) -> int:
+        # ~4 characters per token; corrected from usage_metadata once the response arrives
+        return sum(len(message['content']) for message in conversation) // 4 + 1
+
+    def is_retryable(self, error) -> bool:
+        if isinstance(error, errors.APIError):
+            return error.code in self.RETRYABLE_STATUS
+        return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+    def backoff_delay(self, attempt: int, error) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _count(self, key, value=1):
+        with self._metrics_lock:
+            self.metrics[key] += value
+
+    def generate(self, conversation, thinking_budget=False, response_schema: dict = None) -> str:
+        """One [system, user] conversation -> response text, rate limited and retried."""
+        config = self.build_config(conversation[0]['content'], thinking_budget, response_schema)
+        estimate = self.estimate_tokens(conversation)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            self._count("requests")
+            try:
+                response = self.client.models.generate_content(model=self.model, contents=conversation[1]['content'], config=config)
+            except Exception as e:
+                if not self.is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                print(f"\t\t [⚠️-ERROR] Gemini request failed ({getattr(e, 'code', type(e).__name__)}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                self._count("retries")
+                self._count("backoff_time", delay)
+                time.sleep(delay)
+                continue
+            usage = getattr(response, "usage_metadata", None)
+            prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate
+            self.limiter.debit(prompt_tokens - estimate)
+            self._count("prompt_tokens", prompt_tokens)
+            return response.text
+
+    def generate_many(self, conversations, thinking_budget=False, response_schema=None) -> list:
+        """Sends every conversation concurrently; responses come back in input order. response_schema may be one per conversation."""
+        schemas = response_schema if isinstance(response_schema, list) else [response_schema] * len(conversations)
+        futures = [self.executor.submit(self.generate, conversation, thinking_budget, schema)
+                   for conversation, schema in zip(conversations, schemas)]
+        return [future.result() for future in futures]
+
+    def stream(self, conversation, thinking_budget=False, response_schema: dict = None):
+        """Yields response text chunks. Only the request itself is retried, never a stream that already produced output."""
+        config = self.build_config(conversation[0]['content'], thinking_budget, response_schema)
+        estimate = self.estimate_tokens(conversation)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            self._count("requests")
+            produced = False
+            try:
+                for chunk in self.client.models.generate_content_stream(model=self.model, contents=conversation[1]['content'], config=config):
+                    if chunk.text:
+                        produced = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                if produced or not self.is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                self._count("retries")
+                self._count("backoff_time", delay)
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {**self.metrics, "backoff_time": round(self.metrics["backoff_time"], 3),
+                    "rate_limit_wait": round(self.limiter.wait_time, 3), "rpm": self.limiter.rpm, "tpm": self.limiter.tpm}
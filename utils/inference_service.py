@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from multiprocessing.managers import BaseManager, IteratorProxy
+
+
+# Workers find the shared inference process through these; WorkerSupervisor sets them in every worker process
+ADDRESS_ENV = "PEPPER_INFERENCE_ADDRESS"     # "host:port"
+AUTHKEY_ENV = "PEPPER_INFERENCE_AUTHKEY"     # hex
+DEFAULT_PORT = int(os.environ.get("PEPPER_INFERENCE_PORT", 47832))
+
+
+def parse_address(address: str):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class InferenceService:
+    """
+    The one model instance shared by all worker processes. Lives in the inference process and is served over
+    a multiprocessing manager; workers reach it through RemoteModelLLM. Local (torch) models are not safe to
+    generate() from several threads at once, so their queries are serialized, unless the model batches
+    concurrent queries itself (ModelLLM.batch_scheduler runs every generate() on one thread). API backends
+    are never serialized.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        serialize = getattr(model, "local_model", False) and getattr(model, "batch_scheduler", None) is None
+        self._lock = threading.Lock() if serialize else None
+        self._stats_lock = threading.Lock()
+        self.queries = 0
+        self.query_time = 0.0
+
+    def query(self, prompt, generation_args: dict = None, thinking_budget=False, use_cache=None):
+        t1 = time.time()
+        kwargs = {} if use_cache is None else {"use_cache": use_cache}
+        if self._lock is None:
+            response = self.model.query(prompt, generation_args, thinking_budget, **kwargs)
+        else:
+            with self._lock:
+                response = self.model.query(prompt, generation_args, thinking_budget, **kwargs)
+        with self._stats_lock:
+            self.queries += 1
+            self.query_time += time.time() - t1
+        return response
+
+    def query_stream(self, prompt, generation_args: dict = None, thinking_budget=False, use_cache=None):
+        """Generator, handed to the client as an iterator proxy. ModelLLM serializes generate() itself."""
+        with self._stats_lock:
+            self.queries += 1
+        yield from self.model.query_stream(prompt, generation_args, thinking_budget, use_cache)
+
+    def register_prefix(self, name: str, system_prompt: str):
+        if hasattr(self.model, "register_prefix"):
+            self.model.register_prefix(name, system_prompt)
+
+    def count_tokens(self, content) -> int:
+        return self.model.count_tokens(content)
+
+    def info(self) -> dict:
+        config = getattr(self.model, "config", None) or {}
+        return {"ModelLoaded": getattr(self.model, "ModelLoaded", None),
+                "local_model": getattr(self.model, "local_model", None),
+                "context_window": getattr(self.model, "context_window", None),
+                "ARGS_generation": getattr(self.model, "ARGS_generation", None),
+                "config": {k: v for k, v in config.items() if k != "API_KEY"}}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = {"queries": self.queries, "query_time": round(self.query_time, 3), "pid": os.getpid()}
+        if getattr(self.model, "batch_scheduler", None) is not None:
+            stats["batching"] = self.model.batch_scheduler.stats()
+        if getattr(self.model, "response_cache", None) is not None:
+            stats["response_cache"] = self.model.response_cache.stats()
+        if getattr(self.model, "prefix_cache", None) is not None:
+            stats["prefix_cache"] = self.model.prefix_cache.stats()
+        if getattr(self.model, "gemini", None) is not None:
+            stats["gemini"] = self.model.gemini.stats()
+        if getattr(self.model, "generation_stats", None) is not None:
+            stats["generation"] = dict(self.model.generation_stats)
+        if getattr(self.model, "json_stats", None) is not None:
+            stats["json_constrained"] = dict(self.model.json_stats)
+        return stats
+
+
+class InferenceServerManager(BaseManager):
+    pass
+
+
+class InferenceClientManager(BaseManager):
+    pass
+
+
+# query_stream() returns a generator, which is served as an iterator proxy so chunks cross the process boundary as they come
+STREAM_TYPEID = "StreamIterator"
+InferenceClientManager.register("get_service")
+InferenceClientManager.register(STREAM_TYPEID, proxytype=IteratorProxy, create_method=False)
+
+
+def run_inference_server(address, authkey: bytes, ready_event=None, model_factory=None):
+    """
+    Process target: loads the model once and serves it until the process is terminated.
+    `model_factory` is a picklable callable returning a model with query(); defaults to the registry's ModelLLM.
+    """
+    # This process owns the model, it must not try to reach itself remotely
+    os.environ.pop(ADDRESS_ENV, None)
+    if model_factory is None:
+        from utils import model_registry
+        model = model_registry.acquire_model()
+    else:
+        model = model_factory()
+    service = InferenceService(model)
+    InferenceServerManager.register("get_service", callable=lambda: service, method_to_typeid={"query_stream": STREAM_TYPEID})
+    InferenceServerManager.register(STREAM_TYPEID, proxytype=IteratorProxy, create_method=False)
+    server = InferenceServerManager(address=address, authkey=authkey).get_server()
+    print(f"\t\t [✅-INFO] Inference service serving {service.info()['ModelLoaded']} on {address[0]}:{address[1]} (pid {os.getpid()})")
+    if ready_event is not None:
+        ready_event.set()
+    server.serve_forever()
+
+
+class RemoteModelLLM:
+    """
+    Drop-in stand-in for ModelLLM inside worker processes: query() is forwarded to the shared inference
+    process. Reconnects (waiting up to `connect_timeout` seconds) if the inference process was restarted.
+    """
+
+    def __init__(self, address: str, authkey: bytes, connect_timeout: float = 60.0):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._connect()
+        info = self._service.info()
+        self.ModelLoaded = info["ModelLoaded"]
+        self.local_model = info["local_model"]
+        self.ARGS_generation = info["ARGS_generation"]
+        self.config = info["config"]
+        self.context_window = info.get("context_window")
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                manager = InferenceClientManager(address=self.address, authkey=self.authkey)
+                manager.connect()
+                self._service = manager.get_service()
+                return
+            except (ConnectionError, EOFError, OSError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def query(self, prompt, generation_args: dict = None, thinking_budget=False, use_cache=None, on_text=None, response_schema=None):
+        if response_schema is not None:
+            # Same as ModelLLM.query: the schema rides in the generation args
+            base_args = generation_args if generation_args is not None else self.ARGS_generation
+            generation_args = {**base_args, "response_schema": response_schema}
+        if on_text is not None and not isinstance(prompt[0], list):
+            chunks = []
+            for chunk in self.query_stream(prompt, generation_args, thinking_budget, use_cache):
+                chunks.append(chunk)
+                on_text(chunk)
+            return "".join(chunks).strip()
+        return self._call("query", prompt, generation_args, thinking_budget, use_cache)
+
+    def _call(self, method: str, *args):
+        """Calls a method of the inference service, reconnecting once if it was restarted."""
+        try:
+            return getattr(self._service, method)(*args)
+        except (ConnectionError, EOFError, BrokenPipeError):
+            print("\t\t [⚠️-ERROR] Lost the inference service, reconnecting ...")
+            self._connect()
+            return getattr(self._service, method)(*args)
+
+    def query_stream(self, prompt, generation_args: dict = None, thinking_budget=False, use_cache=None):
+        try:
+            stream = self._service.query_stream(prompt, generation_args, thinking_budget, use_cache)
+        except (ConnectionError, EOFError, BrokenPipeError):
+            print("\t\t [⚠️-ERROR] Lost the inference service, reconnecting ...")
+            self._connect()
+            stream = self._service.query_stream(prompt, generation_args, thinking_budget, use_cache)
+        yield from stream
+
+    def register_prefix(self, name: str, system_prompt: str):
+        self._call("register_prefix", name, system_prompt)
+
+    def count_tokens(self, content) -> int:
+        return self._call("count_tokens", content)
+
+    def stats(self) -> dict:
+        return self._call("stats")
+
+
+def remote_model_from_env():
+    """RemoteModelLLM for the address in the environment, or None when this process should load its own model."""
+    address = os.environ.get(ADDRESS_ENV)
+    if not address:
+        return None
+    return RemoteModelLLM(address, bytes.fromhex(os.environ.get(AUTHKEY_ENV, "")))
@@ -0,0 +1,23 @@
+import json
+import hashlib
+import unicodedata
+
+
+def normalize_text(text) -> str:
+    """Case- and whitespace-insensitive form of a job field: NFKC, casefolded, runs of whitespace collapsed."""
+    if text is None:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).casefold().split())
+
+
+def job_fingerprint(job_json) -> str:
+    """
+    Key of a job posting for the shared Agent3 analysis cache (DBManager.fetch_job_analysis): the normalized
+    company and jobid plus the SHA-256 of the normalized description, so the same posting pasted by different
+    users (different spacing, capitalisation or scraper metadata) maps to one entry.
+    """
+    if isinstance(job_json, str):
+        job_json = json.loads(job_json)
+    description_hash = hashlib.sha256(normalize_text(job_json.get("description")).encode("utf-8")).hexdigest()
+    key = "\x1f".join([normalize_text(job_json.get("company")), normalize_text(job_json.get("jobid")), description_hash])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
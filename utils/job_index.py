@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import threading
+import numpy as np
+from utils.job_fingerprint import normalize_text, job_fingerprint
+
+
+WORD = re.compile(r"\w+")
+
+
+class JobIndex:
+    """
+    Near-duplicate index over the job descriptions curated so far, so a reposted job (same text, different
+    boilerplate or formatting) can reuse an earlier request's Agent3 output instead of being analysed again.
+
+    Each posting (title + description, normalized like utils/job_fingerprint.py) becomes a set of word 3-gram
+    shingles and a NUM_PERM MinHash signature; the share of equal signature values estimates the Jaccard
+    similarity of two postings. Signatures are split into BANDS bands and a query only compares candidates
+    sharing at least one whole band (LSH), all in NumPy.
+
+    Signatures are kept in a SQLite file under data/dbms, like the parse and response caches: an insert is one
+    row, and every worker process picks up rows added by the others (refresh()) before it queries.
+    """
+
+    NUM_PERM = 128
+    BANDS = 32
+    SHINGLE = 3
+    # A backfill whose process has not reported progress for this long is presumed dead and may be taken over
+    BACKFILL_STALE_SECONDS = 600
+
+    def __init__(self, db_path: str = None, threshold: float = 0.8, seed: int = 1):
+        self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        self.db_path = db_path or os.path.join(self.PATH_self_dir, 'data', 'dbms', 'job_index.db')
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        # One seed per MinHash permutation; see _permute
+        self.perm_seeds = rng.integers(0, 1 << 63, self.NUM_PERM, dtype=np.uint64)
+        self.band_mix = rng.integers(1, 1 << 63, self.NUM_PERM // self.BANDS, dtype=np.uint64) | np.uint64(1)
+        self._lock = threading.Lock()
+        self.signatures = np.empty((1024, self.NUM_PERM), dtype=np.uint32)
+        # Band-major, so a query compares one contiguous row per band
+        self.band_keys = np.empty((self.BANDS, 1024), dtype=np.uint64)
+        self.request_ids = []
+        self._positions = {}
+        self._word_hashes = {}
+        self._last_rowid = 0
+        self.queries = 0
+        self.matches = 0
+        self.query_seconds = 0.0
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tblJobIndex ("
+                "RowId INTEGER PRIMARY KEY AUTOINCREMENT, RequestId TEXT NOT NULL UNIQUE, Fingerprint TEXT NOT NULL, "
+                "Signature BLOB NOT NULL, CreatedOn REAL NOT NULL)")
+            # Who runs the one-time backfill from the database, and whether it is done (see backfill)
+            conn.execute("CREATE TABLE IF NOT EXISTS tblJobIndexMeta (Name TEXT PRIMARY KEY, Status TEXT NOT NULL, UpdatedOn REAL NOT NULL)")
+        self.refresh()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def __len__(self):
+        return len(self.request_ids)
+
+    @staticmethod
+    def job_text(job_desc) -> str:
+        if isinstance(job_desc, str):
+            job_desc = json.loads(job_desc)
+        return normalize_text(f"{job_desc.get('title') or ''} {job_desc.get('description') or ''}")
+
+    @staticmethod
+    def _permute(values):
+        """The 64-bit MurmurHash3 finalizer, applied in place. Linear (a * x + b) mod p permutations are
+        cheaper but their MinHash estimates came out about 4x noisier than the binomial bound."""
+        values ^= values >> np.uint64(33)
+        values *= np.uint64(0xFF51AFD7ED558CCD)
+        values ^= values >> np.uint64(33)
+        values *= np.uint64(0xC4CEB9FE1A85EC53)
+        values ^= values >> np.uint64(33)
+        return values
+
+    def signature(self, text: str):
+        """MinHash signature (uint32[NUM_PERM]) of a normalized text, or None if it has no words."""
+        words = WORD.findall(text)
+        if not words:
+            return None
+        if len(self._word_hashes) > 500_000:
+            self._word_hashes.clear()
+        cache = self._word_hashes
+        hashes = np.array([cache[word] if word in cache else cache.setdefault(word, zlib.crc32(word.encode("utf-8")))
+                           for word in words], dtype=np.uint64)
+        if len(hashes) >= self.SHINGLE:
+            # Combine each run of SHINGLE word hashes into one 32-bit shingle hash
+            shingles = hashes[:len(hashes) - self.SHINGLE + 1].copy()
+            for offset in range(1, self.SHINGLE):
+                shingles = shingles * np.uint64(0x9E3779B1) + hashes[offset:len(hashes) - self.SHINGLE + 1 + offset]
+            shingles &= np.uint64(0xFFFFFFFF)
+        else:
+            shingles = hashes
+        shingles = np.unique(shingles)
+        permuted = self._permute(shingles[None, :] ^ self.perm_seeds[:, None])
+        return (permuted.min(axis=1) >> np.uint64(32)).astype(np.uint32)
+
+    def _band_keys(self, signatures):
+        """One 64-bit key per band: equal keys mean the band's NUM_PERM // BANDS values are (almost surely) equal."""
+        rows = signatures.reshape(len(signatures), self.BANDS, -1).astype(np.uint64)
+        return (rows * self.band_mix).sum(axis=2)
+
+    def _append(self, request_ids: list, signatures):
+        count = len(self.request_ids)
+        needed = count + len(request_ids)
+        if needed > len(self.signatures):
+            capacity = max(needed, len(self.signatures) * 2)
+            self.signatures = np.resize(self.signatures, (capacity, self.NUM_PERM))
+            band_keys = np.empty((self.BANDS, capacity), dtype=np.uint64)
+            band_keys[:, :count] = self.band_keys[:, :count]
+            self.band_keys = band_keys
+        self.signatures[count:needed] = signatures
+        self.band_keys[:, count:needed] = self._band_keys(signatures).T
+        for offset, request_id in enumerate(request_ids):
+            self._positions[request_id] = count + offset
+        self.request_ids.extend(request_ids)
+
+    def refresh(self):
+        """Loads the rows other processes inserted since the last refresh."""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT RowId, RequestId, Signature FROM tblJobIndex WHERE RowId > ? ORDER BY RowId",
+                                    (self._last_rowid,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Job index refresh failed: {e}")
+            return 0
+        if rows:
+            with self._lock:
+                fresh = [(row_id, request_id, blob) for row_id, request_id, blob in rows if request_id not in self._positions]
+                if fresh:
+                    signatures = np.frombuffer(b"".join(blob for _, _, blob in fresh), dtype=np.uint32).reshape(len(fresh), self.NUM_PERM)
+                    self._append([request_id for _, request_id, _ in fresh], signatures)
+                self._last_rowid = rows[-1][0]
+        return len(rows)
+
+    def add_many(self, entries) -> int:
+        """
+        Indexes (request_id, job_desc) pairs, job_desc being the request's job JSON (dict or string). Requests already
+        indexed and postings without any text are skipped. Returns how many were added.
+        """
+        rows = []
+        for request_id, job_desc in entries:
+            if request_id in self._positions:
+                continue
+            signature = self.signature(self.job_text(job_desc))
+            if signature is not None:
+                rows.append((request_id, job_fingerprint(job_desc), signature.tobytes(), time.time()))
+        if not rows:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR IGNORE INTO tblJobIndex (RequestId, Fingerprint, Signature, CreatedOn) VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Job index insert failed: {e}")
+            return 0
+        self.refresh()
+        return len(rows)
+
+    def add(self, request_id: str, job_desc) -> bool:
+        return self.add_many([(request_id, job_desc)]) > 0
+
+    def _claim_backfill(self) -> bool:
+        """
+        Takes the backfill for this process, unless it is done or another process reported progress on it within
+        BACKFILL_STALE_SECONDS. BEGIN IMMEDIATE makes the check and the claim one step across processes.
+        """
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT Status, UpdatedOn FROM tblJobIndexMeta WHERE Name = 'backfill'").fetchone()
+            if row and (row[0] == "done" or time.time() - row[1] < self.BACKFILL_STALE_SECONDS):
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO tblJobIndexMeta (Name, Status, UpdatedOn) VALUES ('backfill', ?, ?)",
+                         (f"running:{os.getpid()}", time.time()))
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Job index backfill claim failed: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def _set_backfill(self, status: str = None):
+        """Reports backfill progress (or `status`); status None gives the backfill up so another process retries it."""
+        with self._connect() as conn:
+            if status is None:
+                conn.execute("DELETE FROM tblJobIndexMeta WHERE Name = 'backfill'")
+            else:
+                conn.execute("UPDATE tblJobIndexMeta SET Status = ?, UpdatedOn = ? WHERE Name = 'backfill'", (status, time.time()))
+
+    def backfill(self, fetch_page) -> int:
+        """
+        Indexes earlier curation requests once per index file, whichever process gets there first.
+        `fetch_page(after)` returns the next page of dicts with Id, Input and CreatedOn after the (CreatedOn, Id)
+        `after` (DBManager.fetch_curated_job_descriptions), an empty page at the end or None on failure.
+        Returns how many were added; 0 at once if the backfill is done or running in another process.
+        """
+        if not self._claim_backfill():
+            return 0
+        added = 0
+        finished = False
+        after = None
+        try:
+            while (rows := fetch_page(after)):
+                added += self.add_many([(row["Id"], row["Input"]) for row in rows])
+                after = (rows[-1]["CreatedOn"], rows[-1]["Id"])
+                self._set_backfill(f"running:{os.getpid()}")
+            finished = rows is not None
+        finally:
+            self._set_backfill("done" if finished else None)
+        print(f"\t\t [📦-INFO] Job index backfilled with {added} earlier job descriptions ({len(self)} indexed)"
+              + ("" if finished else ", stopped early and will be retried"))
+        return added
+
+    def nearest(self, job_desc, exclude: str = None):
+        """
+        The most similar indexed posting with estimated Jaccard similarity >= threshold, as
+        {"request_id", "similarity"}, or None. `exclude` skips one request id (the request being processed).
+        """
+        started = time.perf_counter()
+        self.refresh()
+        signature = self.signature(self.job_text(job_desc))
+        match = None
+        if signature is not None and self.request_ids:
+            with self._lock:
+                count = len(self.request_ids)
+                query_keys = self._band_keys(signature[None, :])[0]
+                shares_band = self.band_keys[0, :count] == query_keys[0]
+                for band in range(1, self.BANDS):
+                    shares_band |= self.band_keys[band, :count] == query_keys[band]
+                candidates = np.flatnonzero(shares_band)
+                if exclude in self._positions:
+                    candidates = candidates[candidates != self._positions[exclude]]
+                if len(candidates):
+                    agreeing = np.count_nonzero(self.signatures[candidates] == signature, axis=1)
+                    best = int(agreeing.argmax())
+                    similarity = agreeing[best] / self.NUM_PERM
+                    if similarity >= self.threshold:
+                        match = {"request_id": self.request_ids[candidates[best]], "similarity": round(float(similarity), 4)}
+        self.queries += 1
+        self.matches += match is not None
+        self.query_seconds += time.perf_counter() - started
+        return match
+
+    def stats(self):
+        return {"entries": len(self), "queries": self.queries, "matches": self.matches,
+                "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0}
@@ -0,0 +1,278 @@
+import re
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+
+TYPE_START = {"object": "{", "array": "[", "string": '"', "number": "-0123456789", "integer": "-0123456789",
+              "boolean": "tf", "null": "n"}
+WHITESPACE = " \t\n\r"
+ESCAPES = '"\\/bfnrtu'
+HEX = "0123456789abcdefABCDEF"
+NUMBER_PREFIX = re.compile(r"-?(0|[1-9]\d*)?(\.\d*)?([eE][+-]?\d*)?")
+NUMBER_FULL = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+
+
+class JsonPrefixState:
+    """
+    Incremental JSON validator. feed(text) returns False as soon as the text so far can no longer be the start of
+    a JSON document matching the schema; `done` turns True when the top-level value is closed.
+
+    The schema is checked one level at a time: the type of each value (from its first character), the allowed keys
+    of objects with additionalProperties false and their required keys. Nested keywords like enum or pattern are
+    not enforced; the agents validate their own content.
+    """
+
+    __slots__ = ("schema", "stack", "mode", "expect", "buf", "unicode_left", "escape", "done")
+
+    def __init__(self, schema: dict = None):
+        self.schema = schema or {}
+        self.stack = []         # frames (kind, schema, keys_seen, current_key), treated as immutable so copy() stays cheap
+        self.mode = "value"
+        self.expect = self.schema
+        self.buf = ""
+        self.unicode_left = 0
+        self.escape = False
+        self.done = False
+
+    def copy(self):
+        other = JsonPrefixState.__new__(JsonPrefixState)
+        other.schema, other.stack, other.mode, other.expect = self.schema, list(self.stack), self.mode, self.expect
+        other.buf, other.unicode_left, other.escape, other.done = self.buf, self.unicode_left, self.escape, self.done
+        return other
+
+    def feed(self, text: str) -> bool:
+        for char in text:
+            if not self._step(char):
+                return False
+        return True
+
+    @staticmethod
+    def _types(schema):
+        types = (schema or {}).get("type")
+        return [types] if isinstance(types, str) else types
+
+    def _child_schema(self, frame, key=None):
+        kind, schema, _, _ = frame
+        if kind == "[":
+            return schema.get("items") or {}
+        properties = schema.get("properties", {})
+        if key in properties:
+            return properties[key]
+        additional = schema.get("additionalProperties")
+        return additional if isinstance(additional, dict) else {}
+
+    @staticmethod
+    def _allowed_keys(schema):
+        if schema.get("additionalProperties") is False and "properties" in schema:
+            return schema["properties"].keys()
+        return None
+
+    def _value_done(self):
+        self.mode = "after" if self.stack else "done"
+        self.done = not self.stack
+
+    def _start_value(self, char) -> bool:
+        types = self._types(self.expect)
+        if types is not None and not any(char in TYPE_START[t] for t in types if t in TYPE_START):
+            return False
+        if char == "{":
+            self.stack.append(("{", self.expect or {}, frozenset(), None))
+            self.mode = "obj_first"
+        elif char == "[":
+            self.stack.append(("[", self.expect or {}, frozenset(), None))
+            self.mode = "arr_first"
+        elif char == '"':
+            self.mode, self.escape, self.unicode_left = "string", False, 0
+        elif char in "-0123456789":
+            self.mode, self.buf = "number", char
+        elif char in "tfn":
+            self.mode, self.buf = "literal", {"t": "rue", "f": "alse", "n": "ull"}[char]
+        else:
+            return False
+        return True
+
+    def _close(self, char) -> bool:
+        kind, schema, keys_seen, _ = self.stack[-1]
+        if (kind, char) not in (("{", "}"), ("[", "]")):
+            return False
+        if kind == "{" and not set(schema.get("required", ())) <= keys_seen:
+            return False
+        self.stack.pop()
+        self._value_done()
+        return True
+
+    def _string_char(self, char) -> bool:
+        """One character inside a string; returns None when the closing quote was consumed."""
+        if self.unicode_left:
+            if char not in HEX:
+                return False
+            self.unicode_left -= 1
+        elif self.escape:
+            if char not in ESCAPES:
+                return False
+            self.escape = False
+            self.unicode_left = 4 if char == "u" else 0
+        elif char == "\\":
+            self.escape = True
+        elif char == '"':
+            return None
+        elif ord(char) < 0x20:
+            return False
+        return True
+
+    def _step(self, char) -> bool:
+        mode = self.mode
+        if mode == "done":
+            return False
+        if mode == "string":
+            result = self._string_char(char)
+            if result is None:
+                self._value_done()
+                return True
+            return result
+        if mode == "key":
+            result = self._string_char(char)
+            frame = self.stack[-1]
+            allowed = self._allowed_keys(frame[1])
+            if result is None:
+                if self.buf in frame[2] or (allowed is not None and self.buf not in allowed):
+                    return False
+                self.stack[-1] = (frame[0], frame[1], frame[2] | {self.buf}, self.buf)
+                self.mode = "colon"
+                return True
+            self.buf += char
+            if result and allowed is not None:
+                return any(key.startswith(self.buf) and key not in frame[2] for key in allowed)
+            return result
+        if mode == "number":
+            integer = "integer" in (self._types(self.expect) or ())
+            if char in "0123456789.eE+-" and NUMBER_PREFIX.fullmatch(self.buf + char) and not (integer and char in ".eE"):
+                self.buf += char
+                return True
+            if not NUMBER_FULL.fullmatch(self.buf):
+                return False
+            self._value_done()
+            return self._step(char)
+        if mode == "literal":
+            if not self.buf or char != self.buf[0]:
+                return False
+            self.buf = self.buf[1:]
+            if not self.buf:
+                self._value_done()
+            return True
+
+        if char in WHITESPACE:
+            # No whitespace before the top-level value: the first token has to open the JSON
+            return bool(self.stack) or mode != "value"
+        if mode == "value":
+            return self._start_value(char)
+        if mode == "arr_first":
+            if char == "]":
+                return self._close(char)
+            self.expect = self._child_schema(self.stack[-1])
+            return self._start_value(char)
+        if mode in ("obj_first", "obj_key"):
+            if char == "}" and mode == "obj_first":
+                return self._close(char)
+            if char != '"':
+                return False
+            self.mode, self.buf, self.escape, self.unicode_left = "key", "", False, 0
+            return True
+        if mode == "colon":
+            if char != ":":
+                return False
+            frame = self.stack[-1]
+            self.mode, self.expect = "value", self._child_schema(frame, frame[3])
+            return True
+        if mode == "after":
+            if char == ",":
+                frame = self.stack[-1]
+                if frame[0] == "{":
+                    self.mode = "obj_key"
+                else:
+                    self.mode, self.expect = "value", self._child_schema(frame)
+                return True
+            return self._close(char)
+        return False
+
+
+_TOKEN_PIECES = {}
+
+
+def token_pieces(tokenizer) -> list:
+    """
+    Text each token id adds when appended to a sequence, computed once per tokenizer. Decoding a token after an
+    anchor keeps the leading space SentencePiece tokens carry. Special tokens and partial UTF-8 byte tokens map to ""
+    and are never allowed inside constrained output.
+    """
+    key = id(tokenizer)
+    if key not in _TOKEN_PIECES:
+        anchor = tokenizer.encode("a", add_special_tokens=False)[-1]
+        prefix = tokenizer.decode([anchor])
+        texts = tokenizer.batch_decode([[anchor, token_id] for token_id in range(len(tokenizer))], skip_special_tokens=True)
+        pieces = [text[len(prefix):] if text.startswith(prefix) else "" for text in texts]
+        _TOKEN_PIECES[key] = ["" if "�" in piece else piece for piece in pieces]
+    return _TOKEN_PIECES[key]
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would make a row's output invalid JSON for its schema. Candidates are checked in logit
+    order and the `top_k` best valid ones stay available, so sampling still works within valid continuations. Once
+    a row's top-level value is closed only EOS is left. Rows with schema None are not touched.
+    """
+
+    def __init__(self, tokenizer, schemas: list, prompt_length: int, eos_token_ids, top_k: int = 32, max_scan: int = 2048):
+        self.pieces = token_pieces(tokenizer)
+        self.states = [JsonPrefixState(schema) if schema is not None else None for schema in schemas]
+        self.consumed = prompt_length
+        self.eos_token_ids = [eos_token_ids] if isinstance(eos_token_ids, int) else list(eos_token_ids)
+        self.top_k = top_k
+        self.max_scan = max_scan
+        self.dead_ends = 0
+
+    def advance(self, input_ids):
+        """Feeds the tokens generated since the last call into the row states."""
+        if input_ids.shape[1] <= self.consumed:
+            return
+        new_tokens = input_ids[:, self.consumed:].tolist()
+        self.consumed = input_ids.shape[1]
+        for state, tokens in zip(self.states, new_tokens):
+            if state is None or state.done:
+                continue
+            for token_id in tokens:
+                state.feed(self.pieces[token_id])
+
+    def __call__(self, input_ids, scores):
+        self.advance(input_ids)
+        mask = torch.full_like(scores, float("-inf"))
+        candidates = torch.topk(scores, k=min(self.max_scan, scores.shape[-1]), dim=-1).indices.tolist()
+        for row, state in enumerate(self.states):
+            if state is None:
+                mask[row] = 0
+                continue
+            allowed = []
+            if not state.done:
+                for token_id in candidates[row]:
+                    piece = self.pieces[token_id]
+                    if piece and state.copy().feed(piece):
+                        allowed.append(token_id)
+                        if len(allowed) >= self.top_k:
+                            break
+                if not allowed:
+                    # No valid continuation within reach; end the row instead of emitting broken JSON
+                    self.dead_ends += 1
+            mask[row, allowed or self.eos_token_ids] = 0
+        return scores + mask
+
+
+class JsonCompleteCriteria(StoppingCriteria):
+    """Stops each constrained row as soon as its top-level JSON value is closed, without waiting for EOS."""
+
+    def __init__(self, processor: JsonSchemaLogitsProcessor):
+        self.processor = processor
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.processor.advance(input_ids)
+        return torch.tensor([state is not None and state.done for state in self.processor.states],
+                            dtype=torch.bool, device=input_ids.device)
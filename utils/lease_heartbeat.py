@@ -0,0 +1,58 @@
+import threading
+
+
+class LeaseLost(RuntimeError):
+    """The request's lease expired and it was re-queued; another worker may already be processing it."""
+
+
+class LeaseHeartbeat:
+    """
+    Keeps a claimed request's lease alive (DBManager.renew_lease) from a daemon thread while the worker processes
+    it, so long LLM calls never outlive the lease. The lease is renewed every `interval` seconds, a third of the
+    lease by default, so two missed renewals in a row still do not lose it.
+
+    `lost` turns True once a renewal finds the request no longer belongs to this worker; the worker checks it
+    between stages (check()) and drops the request instead of overwriting another worker's results.
+    """
+
+    def __init__(self, OBJ_db, request_id: str, worker_id: str, interval: float = None):
+        self.OBJ_db = OBJ_db
+        self.request_id = request_id
+        self.worker_id = worker_id
+        self.interval = interval or OBJ_db.LEASE_SECONDS / 3
+        self.renewals = 0
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"lease-{self.request_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            renewed = self.OBJ_db.renew_lease(self.request_id, self.worker_id)
+            if renewed is False:
+                self.lost = True
+                print(f"\t\t [⚠️-ERROR] Lease on request {self.request_id} was lost; it has been re-queued")
+                return
+            if renewed:
+                self.renewals += 1
+            # None: the DB call failed, try again on the next beat while the lease still runs
+
+    def check(self):
+        """Raises LeaseLost if the lease has been lost."""
+        if self.lost:
+            raise LeaseLost(f"Lease on request {self.request_id} was lost")
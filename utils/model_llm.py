@@ -1,21 +1,63 @@
 import os
 import time
 import json
-from google import genai
-from google.genai import types
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import threading
+from utils.batch_scheduler import BatchScheduler
+from utils.response_cache import LLMResponseCache
+
+# torch / transformers / google-genai are imported where they are first needed (load_LLM and the local-model
+# methods): importing this module, e.g. for the agents' type hints or a worker that only talks to the shared
+# inference process, must not pull in the ML stack.
 
 class ModelLLM:
 
-    def __init__(self, device_map="auto"):
+    # Dynamic batching of concurrent local queries (model_config.json keys BatchWindowMs / MaxBatchSize).
+    # A window of 0 disables the scheduler and every query runs its own generate().
+    DEFAULT_BATCH_WINDOW_MS = 20
+    DEFAULT_MAX_BATCH_SIZE = 8
+    # KV cache for the agents' static system prompts (model_config.json key PrefixCacheMB, 0 disables it)
+    DEFAULT_PREFIX_CACHE_MB = 1024
+    # On-disk cache of whole responses (ResponseCacheMB, 0 disables it; ResponseCacheTTLHours).
+    # Sampled queries are only cached when ResponseCacheAllowSampled is true or the caller passes use_cache=True.
+    DEFAULT_RESPONSE_CACHE_MB = 128
+    DEFAULT_RESPONSE_CACHE_TTL_HOURS = 168
+    # Gemini fan-out (GeminiMaxConcurrency, GeminiMaxRetries) and rate limits (GeminiRPM / GeminiTPM, 0 = unlimited).
+    # GeminiBaseUrl points the client at another endpoint, e.g. a local stand-in server.
+    DEFAULT_GEMINI_MAX_CONCURRENCY = 8
+    DEFAULT_GEMINI_MAX_RETRIES = 5
+    GEMINI_CONTEXT_WINDOW = 1048576
+    # Local inference backend (model_config.json LocalBackend):
+    #   "torch" - transformers defaults (torch_dtype="auto", device_map), the reference
+    #   "int8"  - CPU, float32 model with every nn.Linear dynamically quantized to int8
+    #   "onnx"  - CPU, ONNX Runtime through optimum (optional dependency), exported once under data/models/onnx
+    # CPUThreads sets torch's intra-op thread count.
+    LOCAL_BACKENDS = ("torch", "int8", "onnx")
+
+    def __init__(self, device_map="auto", config:dict=None):
+        """Prefer utils.model_registry.acquire_model() over constructing this directly, so the weights load once per process."""
         self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 
         self.device_map = device_map
         
-        config = self.load_config()
+        if config is None:
+            config = self.load_config()
+        self.config = config
         self.local_model = config.get("LocalMode", True)
         self.api_key = config.get("API_KEY", None)
+        self.batch_scheduler = None
+        self.prefix_cache = None
+        self.context_window = None
+        self.local_backend = None
+        # generate() is not safe to run from several threads at once (batch dispatcher, streaming requests)
+        self._generate_lock = threading.Lock()
+        self.response_cache = None
+        response_cache_mb = config.get("ResponseCacheMB", self.DEFAULT_RESPONSE_CACHE_MB)
+        if response_cache_mb and response_cache_mb > 0:
+            self.response_cache = LLMResponseCache(max_bytes=int(response_cache_mb * 1024 * 1024),
+                                                   ttl_seconds=config.get("ResponseCacheTTLHours", self.DEFAULT_RESPONSE_CACHE_TTL_HOURS) * 3600)
+        self.generation_stats = {"calls": 0, "sequences": 0, "generated_tokens": 0, "seconds": 0.0}
+        # Constrained (response_schema) sequences: closed their JSON / ran out of max_new_tokens first
+        self.json_stats = {"sequences": 0, "completed": 0, "truncated": 0, "dead_ends": 0, "generated_tokens": 0}
 
         self.load_LLM()
 
@@ -34,46 +76,297 @@ class ModelLLM:
     def load_LLM(self):
         self.ARGS_generation = {"max_new_tokens": 512, "temperature": 0.2, "do_sample": True}
         if self.local_model:
+            from transformers import AutoTokenizer
+            from utils.prefix_cache import PrefixKVCache
             self.ModelLoaded = "microsoft/Phi-3.5-mini-instruct"
             self.tokenizer = AutoTokenizer.from_pretrained(self.ModelLoaded, trust_remote_code=False, padding_side='left')
-            self.model = AutoModelForCausalLM.from_pretrained(self.ModelLoaded, device_map=self.device_map, torch_dtype="auto", trust_remote_code=False)
-            print(f"\t\t [✅-INFO] Model {self.ModelLoaded} loaded successfully. Default Generation Args: {self.ARGS_generation}")
+            self.model = self.load_local_model()
+            self.context_window = getattr(self.model.config, "max_position_embeddings", None)
+            print(f"\t\t [✅-INFO] Model {self.ModelLoaded} ({self.local_backend} backend) loaded successfully. Default Generation Args: {self.ARGS_generation}")
+
+            prefix_cache_mb = self.config.get("PrefixCacheMB", self.DEFAULT_PREFIX_CACHE_MB)
+            # ONNX Runtime models keep their past-key-values inside the session, there is no DynamicCache to reuse
+            if prefix_cache_mb and prefix_cache_mb > 0 and self.local_backend != "onnx":
+                self.prefix_cache = PrefixKVCache(self.model, self.tokenizer, max_bytes=int(prefix_cache_mb * 1024 * 1024))
+
+            window_ms = self.config.get("BatchWindowMs", self.DEFAULT_BATCH_WINDOW_MS)
+            if window_ms and window_ms > 0:
+                self.batch_scheduler = BatchScheduler(self.generate_batch, window_ms=window_ms,
+                                                      max_batch_size=self.config.get("MaxBatchSize", self.DEFAULT_MAX_BATCH_SIZE),
+                                                      length_fn=self.prompt_length)
+                print(f"\t\t [✅-INFO] Dynamic batching enabled. Window: {window_ms} ms | Max batch size: {self.batch_scheduler.max_batch_size}")
 
         else:
             if not self.api_key:
                 raise ValueError("API_KEY for Gemini is not set in model_config.json!")
-            os.environ['GEMINI_API_KEY'] = self.api_key
-            self.gemini_client = genai.Client()
+            from utils.gemini_client import GeminiClient
             self.gemini_model = "gemini-2.5-flash"
-            self.gemini_types = types
+            self.gemini = GeminiClient(self.api_key, self.gemini_model, base_url=self.config.get("GeminiBaseUrl"),
+                                       rpm=self.config.get("GeminiRPM", 0), tpm=self.config.get("GeminiTPM", 0),
+                                       max_concurrency=self.config.get("GeminiMaxConcurrency", self.DEFAULT_GEMINI_MAX_CONCURRENCY),
+                                       max_retries=self.config.get("GeminiMaxRetries", self.DEFAULT_GEMINI_MAX_RETRIES))
+            self.gemini_client = self.gemini.client
+            self.context_window = self.GEMINI_CONTEXT_WINDOW
             self.ModelLoaded = self.gemini_model
             print(f"\t\t [✅-INFO] Model {self.ModelLoaded} loaded successfully. Default Generation Args: {self.ARGS_generation}")
 
 
-    def query(self, prompt, generation_args:dict=None, thinking_budget=False):
-        """Query the model with a prompt and return the response. For Gemini, thinking_budget can be set (default True)."""
+    def load_local_model(self):
+        """Loads self.ModelLoaded for the configured LocalBackend."""
+        import torch
+        from transformers import AutoModelForCausalLM
+        self.local_backend = self.config.get("LocalBackend", "torch")
+        if self.local_backend not in self.LOCAL_BACKENDS:
+            raise ValueError(f"LocalBackend must be one of {self.LOCAL_BACKENDS}, got {self.local_backend!r}")
+        if self.config.get("CPUThreads"):
+            torch.set_num_threads(int(self.config["CPUThreads"]))
+
+        if self.local_backend == "int8":
+            model = AutoModelForCausalLM.from_pretrained(self.ModelLoaded, device_map="cpu", torch_dtype=torch.float32, trust_remote_code=False)
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        if self.local_backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForCausalLM
+            except ImportError as e:
+                raise ImportError("LocalBackend 'onnx' needs optimum with ONNX Runtime: pip install optimum[onnxruntime]") from e
+            export_dir = os.path.join(self.PATH_self_dir, 'data', 'models', 'onnx', self.ModelLoaded.replace('/', '--'))
+            if os.path.isdir(export_dir):
+                return ORTModelForCausalLM.from_pretrained(export_dir, use_cache=True)
+            print(f"\t\t [📦-INFO] Exporting {self.ModelLoaded} to ONNX under {export_dir}, first start only ...")
+            model = ORTModelForCausalLM.from_pretrained(self.ModelLoaded, export=True, use_cache=True)
+            model.save_pretrained(export_dir)
+            return model
+
+        return AutoModelForCausalLM.from_pretrained(self.ModelLoaded, device_map=self.device_map, torch_dtype="auto", trust_remote_code=False)
+
+
+    def register_prefix(self, name: str, system_prompt: str):
+        """Registers an agent's constant system prompt so its KV cache is kept between queries (local model only)."""
+        if self.prefix_cache is not None:
+            self.prefix_cache.register(name, system_prompt)
+
+
+    def should_cache(self, generation_args: dict, use_cache=None) -> bool:
+        """use_cache=True/False forces the decision; otherwise only deterministic generations are cached unless the config allows sampled ones."""
+        if use_cache is not None:
+            return use_cache
+        deterministic = generation_args.get("do_sample") is False or generation_args.get("temperature") == 0
+        return deterministic or bool(self.config.get("ResponseCacheAllowSampled", False))
+
+
+    def cache_lookup(self, prompt, generation_args: dict, thinking_budget, use_cache):
+        """Returns (cache_key, hit, response); cache_key is None when this query must not be cached."""
+        if self.response_cache is None:
+            return None, False, None
+        if not self.should_cache(generation_args, use_cache):
+            self.response_cache.bypassed += 1
+            return None, False, None
+        # thinking_budget is keyed separately; the Gemini path writes it into generation_args
+        key_args = {k: v for k, v in generation_args.items() if k != "thinking_budget"}
+        cache_key = self.response_cache.make_key(self.ModelLoaded, prompt, key_args, thinking_budget)
+        hit, response = self.response_cache.get(cache_key)
+        if hit:
+            print(f"\t\t [🧠-INFO] Response cache hit for Model - {self.ModelLoaded}")
+        return cache_key, hit, response
+
+
+    def query(self, prompt, generation_args:dict=None, thinking_budget=False, use_cache=None, on_text=None, response_schema=None):
+        """
+        Query the model with a prompt and return the response. For Gemini, thinking_budget can be set (default True).
+        use_cache=False always generates a fresh response; use_cache=True caches this query even if it samples.
+        on_text(chunk) is called with partial output as it is generated (single conversations only, see query_stream).
+        response_schema (a JSON schema, or one per conversation / None for a list of prompts) constrains the output
+        to JSON matching it: masked decoding that stops when the JSON closes locally, response_json_schema on Gemini.
+        """
 
         if generation_args is None:
                 generation_args = self.ARGS_generation
+        if response_schema is not None:
+            # Travels inside the generation args so it is part of the cache key and of the batch grouping
+            generation_args = {**generation_args, "response_schema": response_schema}
+        if on_text is not None and not isinstance(prompt[0], list):
+            chunks = []
+            for chunk in self.query_stream(prompt, generation_args, thinking_budget, use_cache):
+                chunks.append(chunk)
+                on_text(chunk)
+            return "".join(chunks).strip()
         t1 = time.time()
 
+        cache_key, hit, response = self.cache_lookup(prompt, generation_args, thinking_budget, use_cache)
+        if hit:
+            return response
+
         if self.local_model:
             print(f"\t\t [🧠-INFO] Query with Model - {self.ModelLoaded} - GenerationArgs - {generation_args}")
-            response = self.infer_local_llm(prompt, generation_args)
+            if self.batch_scheduler is not None:
+                response = self.query_batched(prompt, generation_args)
+            else:
+                response = self.infer_local_llm(prompt, generation_args)
         
         else:
             generation_args.update({"thinking_budget":thinking_budget})
             print(f"\t\t [🧠-INFO] Query with Model - {self.ModelLoaded} - GenerationArgs - {generation_args}")
             response = self.infer_gemini_llm(prompt, generation_args, thinking_budget)
-            
+
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.ModelLoaded, response)
         print("\t\t [🧠-INFO] Total Generation Time:", time.time() - t1)
         return response
 
 
+    def query_stream(self, prompt, generation_args:dict=None, thinking_budget=False, use_cache=None):
+        """
+        Like query() for a single conversation, but yields the response text piece by piece as it is generated
+        (TextIteratorStreamer locally, generate_content_stream for Gemini). A cached response is yielded whole.
+        """
+        if generation_args is None:
+            generation_args = self.ARGS_generation
+        t1 = time.time()
+        cache_key, hit, response = self.cache_lookup(prompt, generation_args, thinking_budget, use_cache)
+        if hit:
+            yield response
+            return
+
+        print(f"\t\t [🧠-INFO] Streaming query with Model - {self.ModelLoaded} - GenerationArgs - {generation_args}")
+        if self.local_model:
+            stream = self.stream_local_llm(prompt, generation_args)
+        else:
+            generation_args.update({"thinking_budget": thinking_budget})
+            stream = self.stream_gemini_llm(prompt, thinking_budget, generation_args.get("response_schema"))
+        chunks = []
+        first_token_time = None
+        for chunk in stream:
+            if first_token_time is None:
+                first_token_time = time.time() - t1
+            chunks.append(chunk)
+            yield chunk
+
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.ModelLoaded, "".join(chunks).strip())
+        print(f"\t\t [🧠-INFO] Time to first token: {first_token_time} | Total Generation Time: {time.time() - t1}")
+
+
+    def stream_local_llm(self, prompt, generation_args):
+        from transformers import TextIteratorStreamer
+        inputs = self.tokenizer.apply_chat_template(prompt, add_generation_prompt=True, return_tensors="pt").to(self.model.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def run_generate():
+            try:
+                self.generate(inputs, {**generation_args, "streamer": streamer})
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run_generate, name="stream-generate", daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+        if errors:
+            raise errors[0]
+
+
+    def stream_gemini_llm(self, prompt, thinking_budget, response_schema=None):
+        yield from self.gemini.stream(prompt, thinking_budget, response_schema)
+
+
+    def count_tokens(self, content) -> int:
+        """
+        Tokens of a message list (chat template included) or of a plain string with the loaded tokenizer. Gemini has
+        no local tokenizer and its count_tokens is a network round trip, so there it is the ~4 characters/token estimate.
+        """
+        if not self.local_model:
+            text = content if isinstance(content, str) else "".join(message['content'] for message in content)
+            return len(text) // 4 + 1
+        if isinstance(content, str):
+            return len(self.tokenizer.encode(content, add_special_tokens=False))
+        return self.prompt_length(content)
+
+
+    def query_batched(self, prompt, generation_args):
+        """Hands each conversation to the batch scheduler; same return shape as infer_local_llm()."""
+        if isinstance(prompt[0], list):
+            schemas = generation_args.get("response_schema")
+            if isinstance(schemas, list):
+                futures = [self.batch_scheduler.submit(conversation, {**generation_args, "response_schema": schema})
+                           for conversation, schema in zip(prompt, schemas)]
+            else:
+                futures = [self.batch_scheduler.submit(conversation, generation_args) for conversation in prompt]
+            return [future.result() for future in futures]
+        return self.batch_scheduler.query(prompt, generation_args)
+
+
+    def prompt_length(self, conversation):
+        return len(self.tokenizer.apply_chat_template(conversation, add_generation_prompt=True, tokenize=True))
+
+
+    def generate_batch(self, conversations, generation_args):
+        """BatchScheduler callback: one generate() over several conversations, one response each."""
+        response = self.infer_local_llm(conversations, generation_args)
+        return response if isinstance(response, list) else [response]
+
+
+    def json_constraint(self, inputs, generation_args):
+        """Turns a response_schema generation arg into the logits processor / stopping criteria model.generate() takes."""
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+        from utils.json_constraint import JsonSchemaLogitsProcessor, JsonCompleteCriteria
+        generation_args = dict(generation_args)
+        schemas = generation_args.pop("response_schema", None)
+        if schemas is None:
+            return generation_args, None
+        if not isinstance(schemas, list):
+            schemas = [schemas] * inputs.shape[0]
+        eos_token_id = self.model.generation_config.eos_token_id
+        processor = JsonSchemaLogitsProcessor(self.tokenizer, schemas, inputs.shape[1],
+                                              eos_token_id if eos_token_id is not None else self.tokenizer.eos_token_id)
+        generation_args["logits_processor"] = LogitsProcessorList([processor])
+        generation_args["stopping_criteria"] = StoppingCriteriaList([JsonCompleteCriteria(processor)])
+        return generation_args, processor
+
+
+    def generate(self, inputs, generation_args, attention_mask=None):
+        """
+        The one place model.generate() runs: serialized, through the prefix cache, counted in generation_stats.
+        A left-padded batch must come with its attention_mask: Phi-3.5's pad token is also an eos token, so
+        transformers cannot infer the mask and the shorter rows would attend over their padding.
+        """
+        import torch
+        generation_args, json_processor = self.json_constraint(inputs, generation_args)
+        with self._generate_lock, torch.no_grad():
+            t1 = time.time()
+            if self.prefix_cache is not None and inputs.shape[0] == 1:
+                output = self.prefix_cache.generate(inputs, generation_args)
+                print(f"\t\t [🧠-INFO] Prefix cache saved {self.prefix_cache.last_saved_tokens} of {inputs.shape[1]} prefill tokens")
+            elif attention_mask is not None:
+                output = self.model.generate(inputs, attention_mask=attention_mask, **generation_args)
+            else:
+                output = self.model.generate(inputs, **generation_args)
+            new_tokens = output[:, inputs.shape[1]:]
+            pad_token_id = self.tokenizer.pad_token_id
+            self.generation_stats["calls"] += 1
+            self.generation_stats["sequences"] += output.shape[0]
+            self.generation_stats["generated_tokens"] += int((new_tokens != pad_token_id).sum()) if pad_token_id is not None else new_tokens.numel()
+            self.generation_stats["seconds"] += time.time() - t1
+            if json_processor is not None:
+                json_processor.advance(output)
+                for row, state in enumerate(json_processor.states):
+                    if state is None:
+                        continue
+                    self.json_stats["sequences"] += 1
+                    self.json_stats["completed" if state.done else "truncated"] += 1
+                    self.json_stats["generated_tokens"] += int((new_tokens[row] != pad_token_id).sum()) if pad_token_id is not None else new_tokens.shape[1]
+                self.json_stats["dead_ends"] += json_processor.dead_ends
+        return output
+
+
     def infer_local_llm(self, prompt, generation_args):
-        inputs = self.tokenizer.apply_chat_template(prompt, add_generation_prompt=True, return_tensors="pt", padding=True).to(self.model.device)
-        with torch.no_grad():
-            output = self.model.generate(inputs, **generation_args)
+        encoded = self.tokenizer.apply_chat_template(prompt, add_generation_prompt=True, return_tensors="pt", padding=True,
+                                                     return_dict=True).to(self.model.device)
+        output = self.generate(encoded["input_ids"], generation_args, attention_mask=encoded["attention_mask"])
         tokenized_response = self.tokenizer.batch_decode(output, skip_special_tokens=False, clean_up_tokenization_spaces=True)
 
         if len(tokenized_response) > 1:
@@ -86,35 +379,8 @@ class ModelLLM:
 
 
     def infer_gemini_llm(self, prompt, generation_args, thinking_budget):
-
+        """A list of conversations is sent concurrently; GeminiClient applies the rate limits and retries."""
+        response_schema = generation_args.get("response_schema")
         if (isinstance(prompt[0], list)):
-            
-            response = []
-            for indv_prompt in prompt:
-
-                if thinking_budget:
-                    config = self.gemini_types.GenerateContentConfig(system_instruction=indv_prompt[0]['content'])
-                else:
-                    config = self.gemini_types.GenerateContentConfig(thinking_config=types.ThinkingConfig(thinking_budget=0),
-                                                                        system_instruction=indv_prompt[0]['content'])
-                content = indv_prompt[1]['content']
-                gemni_response = self.gemini_client.models.generate_content(
-                        model=self.gemini_model,
-                        contents=content,
-                        config=config)
-                response.append(gemni_response.text)
-        else:
-
-            if thinking_budget:
-                config = self.gemini_types.GenerateContentConfig(system_instruction=prompt[0]['content'])
-            else:
-                config = self.gemini_types.GenerateContentConfig(thinking_config=types.ThinkingConfig(thinking_budget=0),
-                                                                    system_instruction=prompt[0]['content'])
-            content = prompt[1]['content']
-            gemni_response = self.gemini_client.models.generate_content(
-                    model=self.gemini_model,
-                    contents=content,
-                    config=config)
-            response = gemni_response.text
-
-        return response
\ No newline at end of file
+            return self.gemini.generate_many(prompt, thinking_budget, response_schema)
+        return self.gemini.generate(prompt, thinking_budget, response_schema)
@@ -0,0 +1,103 @@
+import os
+import json
+import sys
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded ModelLLM instances.
+
+    Every caller (WordFileManager, the agents, DBManager, Worker) asks the registry for a model instead of
+    constructing ModelLLM() itself, so the weights are loaded at most once per process for a given
+    backend/config. Models are loaded lazily on the first acquire() and stay resident for the life of the process.
+    data/model_config.json is read once per process; restart the process to pick up a changed config.
+    """
+
+    def __init__(self):
+        self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        self._lock = threading.Lock()
+        self._models = {}       # key -> ModelLLM
+        self._config = None
+        self.load_count = 0
+        self.load_time = 0.0
+
+    def load_config(self):
+        """data/model_config.json, read on the first call only so every acquire() resolves to the same model."""
+        if self._config is None:
+            config_path = os.path.join(self.PATH_self_dir, 'data', 'model_config.json')
+            if os.path.exists(config_path):
+                with open(config_path, 'r') as f:
+                    self._config = json.load(f)
+            else:
+                self._config = {"LocalMode": True, "API_KEY": None}
+        return self._config
+
+    def make_key(self, config: dict, device_map="auto"):
+        """Key a model by backend plus the config values that change what gets loaded."""
+        backend = "local" if config.get("LocalMode", True) else "gemini"
+        config_str = json.dumps({k: v for k, v in config.items() if k != "API_KEY"}, sort_keys=True)
+        return (backend, str(device_map), config_str)
+
+    def acquire(self, device_map="auto"):
+        """
+        Return the shared ModelLLM for this process's config, loading it on first use. Inside a supervised worker
+        process (PEPPER_INFERENCE_ADDRESS set) this is a RemoteModelLLM for the shared inference process instead.
+        """
+        remote_address = os.environ.get("PEPPER_INFERENCE_ADDRESS")
+        with self._lock:
+            if remote_address:
+                key = ("remote", remote_address, "")
+            else:
+                config = self.load_config()
+                key = self.make_key(config, device_map)
+            if key not in self._models:
+                t1 = time.time()
+                if remote_address:
+                    from utils.inference_service import remote_model_from_env
+                    self._models[key] = remote_model_from_env()
+                else:
+                    from utils.model_llm import ModelLLM
+                    self._models[key] = ModelLLM(device_map=device_map, config=config)
+                self.load_time += time.time() - t1
+                self.load_count += 1
+                print(f"\t\t [✅-INFO] ModelRegistry loaded model #{self.load_count} for backend '{key[0]}'. RSS: {self.resident_memory_mb():.1f} MB")
+            return self._models[key]
+
+    def resident_memory_mb(self):
+        """Current resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+        try:
+            with open("/proc/self/status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS and KB on Linux
+            return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        except ImportError:
+            return 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "load_count": self.load_count,
+                "load_time": round(self.load_time, 3),
+                "loaded_models": [{"backend": key[0], "device_map": key[1]} for key in self._models],
+                "resident_memory_mb": round(self.resident_memory_mb(), 1),
+            }
+
+
+REGISTRY = ModelRegistry()
+
+
+def acquire_model(device_map="auto"):
+    return REGISTRY.acquire(device_map)
+
+
+def registry_stats():
+    return REGISTRY.stats()
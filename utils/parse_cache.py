@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class ResumeParseCache:
+    """
+    Persistent cache of parsed resume JSON, keyed by the SHA-256 of the .docx bytes plus the parser version.
+
+    Entries live in a small SQLite file under data/dbms so they survive restarts and are shared by the API
+    and worker processes. Least recently used entries are evicted once the stored JSON exceeds max_bytes.
+    Because the key is the content hash, overwriting a resume file automatically misses the old entry;
+    invalidate_bytes() lets callers free the stale entry straight away.
+    """
+
+    def __init__(self, db_path: str = None, max_bytes: int = 64 * 1024 * 1024):
+        self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        self.db_path = db_path or os.path.join(self.PATH_self_dir, 'data', 'dbms', 'parse_cache.db')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tblParseCache ("
+                "CacheKey TEXT PRIMARY KEY, ContentHash TEXT NOT NULL, Payload TEXT NOT NULL, "
+                "SizeBytes INTEGER NOT NULL, LastAccess REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idxParseCacheHash ON tblParseCache (ContentHash)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def content_hash(file_bytes: bytes) -> str:
+        return hashlib.sha256(file_bytes).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, parser_version: str) -> str:
+        return f"{content_hash}:{parser_version}"
+
+    def get(self, content_hash: str, parser_version: str):
+        """Returns the cached payload dict, or None on a miss."""
+        key = self.make_key(content_hash, parser_version)
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute("SELECT Payload FROM tblParseCache WHERE CacheKey = ?", (key,)).fetchone()
+                if row:
+                    conn.execute("UPDATE tblParseCache SET LastAccess = ? WHERE CacheKey = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Parse cache lookup failed: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, content_hash: str, parser_version: str, payload: dict):
+        key = self.make_key(content_hash, parser_version)
+        payload_str = json.dumps(payload, ensure_ascii=False)
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tblParseCache (CacheKey, ContentHash, Payload, SizeBytes, LastAccess) VALUES (?, ?, ?, ?, ?)",
+                    (key, content_hash, payload_str, len(payload_str.encode('utf-8')), time.time()))
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Parse cache store failed: {e}")
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(SizeBytes), 0) FROM tblParseCache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT CacheKey, SizeBytes FROM tblParseCache ORDER BY LastAccess ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM tblParseCache WHERE CacheKey = ?", stale)
+
+    def invalidate_bytes(self, file_bytes: bytes):
+        """Remove every cached parse (any parser version) of the given file contents."""
+        self.invalidate_hash(self.content_hash(file_bytes))
+
+    def invalidate_hash(self, content_hash: str):
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute("DELETE FROM tblParseCache WHERE ContentHash = ?", (content_hash,))
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Parse cache invalidation failed: {e}")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(SizeBytes), 0) FROM tblParseCache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_PARSE_CACHE = None
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def get_parse_cache() -> ResumeParseCache:
+    """Process-wide parse cache, created on first use."""
+    global _PARSE_CACHE
+    with _PARSE_CACHE_LOCK:
+        if _PARSE_CACHE is None:
+            _PARSE_CACHE = ResumeParseCache()
+        return _PARSE_CACHE
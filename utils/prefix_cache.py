@@ -0,0 +1,146 @@
+import threading
+from collections import OrderedDict
+import torch
+from transformers import DynamicCache
+
+
+class PrefixKVCache:
+    """
+    Keeps the past-key-values of registered static prompt prefixes (the agents' system prompts) so a
+    generate() only prefills the part of the prompt after the prefix.
+
+    - register(name, system_prompt) tokenizes the system turn; its KV cache is computed on first use.
+    - generate() matches the prompt against the registered prefixes by longest common token prefix, feeds
+      the cached KV to model.generate() and crops it back to the prefix afterwards, so the same cache object
+      is reused in place without copying.
+    - Computed caches are evicted least-recently-used once they exceed `max_bytes` in total.
+
+    Only single-sequence generate() calls use the cache: in a left-padded batch the prefix is not aligned.
+    Callers must not run generate() concurrently (ModelLLM's batch scheduler / inference service ensure that).
+    """
+
+    def __init__(self, model, tokenizer, max_bytes: int = 1024 * 1024 * 1024, min_prefix_tokens: int = 32):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # name -> {"ids": [token ids], "cache": DynamicCache | None, "bytes": int}
+        self.last_saved_tokens = 0
+        self.metrics = {"hits": 0, "misses": 0, "computed": 0, "evictions": 0, "prefill_tokens_saved": 0, "prompt_tokens": 0}
+
+    def register(self, name: str, system_prompt: str):
+        """Idempotent: re-registering the same text keeps the already computed cache."""
+        ids = self.tokenizer.apply_chat_template([{"role": "system", "content": system_prompt}], tokenize=True,
+                                                 add_generation_prompt=False)
+        ids = list(ids)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry["ids"] == ids[:len(entry["ids"])]:
+                return
+            self._entries[name] = {"ids": ids, "cache": None, "bytes": 0}
+
+    @staticmethod
+    def _common_prefix(a, b) -> int:
+        n = min(len(a), len(b))
+        i = 0
+        while i < n and a[i] == b[i]:
+            i += 1
+        return i
+
+    @staticmethod
+    def _cache_nbytes(cache) -> int:
+        if hasattr(cache, "layers"):
+            tensors = [t for layer in cache.layers for t in (layer.keys, layer.values) if t is not None]
+        else:
+            tensors = list(cache.key_cache) + list(cache.value_cache)
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    @staticmethod
+    def _crop(cache, length: int):
+        # A negative crop() (drop N tokens) works on every transformers version; a positive one is deprecated
+        drop = cache.get_seq_length() - length
+        if drop > 0:
+            cache.crop(-drop)
+
+    def _match(self, ids):
+        best_name, best_len = None, 0
+        for name, entry in self._entries.items():
+            length = self._common_prefix(ids, entry["ids"])
+            if length > best_len:
+                best_name, best_len = name, length
+        # Always leave at least one prompt token for generate() to process
+        best_len = min(best_len, len(ids) - 1)
+        if best_len < self.min_prefix_tokens:
+            return None, 0
+        return best_name, best_len
+
+    def _compute(self, name):
+        entry = self._entries[name]
+        cache = DynamicCache()
+        with torch.no_grad():
+            self.model(torch.tensor([entry["ids"]], device=self.model.device), past_key_values=cache, use_cache=True)
+        entry["cache"] = cache
+        entry["bytes"] = self._cache_nbytes(cache)
+        self.metrics["computed"] += 1
+        self._evict(keep=name)
+
+    def _evict(self, keep=None):
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        for name, entry in self._entries.items():
+            if total <= self.max_bytes:
+                break
+            if entry["cache"] is None or name == keep:
+                continue
+            total -= entry["bytes"]
+            entry["cache"], entry["bytes"] = None, 0
+            self.metrics["evictions"] += 1
+        if total > self.max_bytes and keep is not None:
+            # A single prefix larger than the whole budget is not kept
+            self._entries[keep]["cache"], self._entries[keep]["bytes"] = None, 0
+            self.metrics["evictions"] += 1
+
+    def generate(self, inputs, generation_args: dict):
+        """model.generate(inputs, **generation_args) for a batch of one, reusing a cached prefix when one matches."""
+        ids = inputs[0].tolist()
+        with self._lock:
+            self.metrics["prompt_tokens"] += len(ids)
+            name, reuse = self._match(ids)
+            if name is None:
+                self.metrics["misses"] += 1
+                self.last_saved_tokens = 0
+                return self.model.generate(inputs, **generation_args)
+
+            entry = self._entries[name]
+            self._entries.move_to_end(name)
+            was_cached = entry["cache"] is not None
+            if not was_cached:
+                self._compute(name)
+            cache = entry["cache"]
+            if cache is None:
+                self.metrics["misses"] += 1
+                self.last_saved_tokens = 0
+                return self.model.generate(inputs, **generation_args)
+
+            if reuse < len(entry["ids"]):
+                # The prompt diverges inside the registered prefix; keep only the shared part from now on
+                entry["ids"] = entry["ids"][:reuse]
+                self._crop(cache, reuse)
+                entry["bytes"] = self._cache_nbytes(cache)
+            self._crop(cache, reuse)
+            try:
+                output = self.model.generate(inputs, past_key_values=cache, **generation_args)
+            finally:
+                # generate() appended the prompt and the answer to the cache, drop them again
+                self._crop(cache, reuse)
+            self.metrics["hits"] += 1
+            self.last_saved_tokens = reuse if was_cached else 0
+            self.metrics["prefill_tokens_saved"] += self.last_saved_tokens
+            return output
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.metrics, "max_bytes": self.max_bytes,
+                    "bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                    "prefixes": {name: {"tokens": len(entry["ids"]), "cached": entry["cache"] is not None}
+                                 for name, entry in self._entries.items()}}
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class RequestProgressStore:
+    """
+    Append-only log of per-request progress events (agent started / partial text / agent finished / done),
+    written by the worker processes and tailed by the API's server-sent-events endpoint.
+
+    A SQLite file under data/dbms, like the parse and response caches: the API and the workers run on the
+    same machine, and this keeps high-frequency partial output out of the SQL Server request tables.
+    """
+
+    TERMINAL_EVENTS = ("request_finished", "request_failed")
+
+    def __init__(self, db_path: str = None, retention_seconds: float = 24 * 3600):
+        self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        self.db_path = db_path or os.path.join(self.PATH_self_dir, 'data', 'dbms', 'progress.db')
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tblRequestProgress ("
+                "Seq INTEGER PRIMARY KEY AUTOINCREMENT, RequestId TEXT NOT NULL, Event TEXT NOT NULL, "
+                "Agent TEXT, Payload TEXT NOT NULL, CreatedOn REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idxRequestProgress ON tblRequestProgress (RequestId, Seq)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def append(self, request_id: str, event: str, agent: str = None, **payload):
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute("INSERT INTO tblRequestProgress (RequestId, Event, Agent, Payload, CreatedOn) VALUES (?, ?, ?, ?, ?)",
+                             (str(request_id), event, agent, json.dumps(payload, ensure_ascii=False, default=str), now))
+                if now - self._last_prune > 3600:
+                    conn.execute("DELETE FROM tblRequestProgress WHERE CreatedOn < ?", (now - self.retention_seconds,))
+                    self._last_prune = now
+        except sqlite3.Error as e:
+            # Progress is best effort, it must never fail the task itself
+            print(f"\t\t [⚠️-ERROR] Progress store write failed: {e}")
+
+    def read_since(self, request_id: str, after_seq: int = 0, limit: int = 500) -> list:
+        """Events of one request with Seq > after_seq, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT Seq, Event, Agent, Payload, CreatedOn FROM tblRequestProgress "
+                                "WHERE RequestId = ? AND Seq > ? ORDER BY Seq LIMIT ?",
+                                (str(request_id), after_seq, limit)).fetchall()
+        return [{"seq": seq, "event": event, "agent": agent, "created_on": created_on, **json.loads(payload)}
+                for seq, event, agent, payload, created_on in rows]
+
+    def clear(self, request_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM tblRequestProgress WHERE RequestId = ?", (str(request_id),))
+
+
+class ProgressReporter:
+    """
+    Worker-side helper for one request: brackets each agent with started/finished events and turns streamed
+    tokens into 'partial' events, flushed at most every `flush_interval` seconds to keep writes cheap.
+    """
+
+    def __init__(self, store: RequestProgressStore, request_id: str, flush_interval: float = 0.3):
+        self.store = store
+        self.request_id = request_id
+        self.flush_interval = flush_interval
+        self._agent = None
+        self._buffer = []
+        self._last_flush = 0.0
+        self._started_at = 0.0
+        self._first_token_at = None
+
+    def agent_started(self, agent: str):
+        self._agent, self._buffer = agent, []
+        self._started_at, self._first_token_at = time.time(), None
+        self._last_flush = self._started_at
+        self.store.append(self.request_id, "agent_started", agent)
+
+    def on_text(self, text: str):
+        """Streaming callback handed to the agents (ModelLLM.query(on_text=...))."""
+        if not text:
+            return
+        now = time.time()
+        if self._first_token_at is None:
+            self._first_token_at = now
+            self.store.append(self.request_id, "first_token", self._agent, ttft=round(now - self._started_at, 3))
+        self._buffer.append(text)
+        if now - self._last_flush >= self.flush_interval:
+            self._flush(now)
+
+    def _flush(self, now=None):
+        if self._buffer:
+            self.store.append(self.request_id, "partial", self._agent, text="".join(self._buffer))
+            self._buffer = []
+        self._last_flush = now or time.time()
+
+    def agent_finished(self, agent: str, output=None):
+        self._flush()
+        self.store.append(self.request_id, "agent_finished", agent, output=output,
+                          seconds=round(time.time() - self._started_at, 3))
+
+    def request_finished(self, status: str):
+        self.store.append(self.request_id, "request_finished", status=status)
+
+    def request_failed(self, error: str):
+        self._flush()
+        self.store.append(self.request_id, "request_failed", self._agent, error=error)
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of LLM responses, keyed by the SHA-256 of model id + full message list + generation args.
+
+    Same layout as the parse cache: a SQLite file under data/dbms shared by every process on the machine.
+    Entries expire after ttl_seconds, and least recently used entries are evicted once the stored responses
+    exceed max_bytes. ModelLLM decides whether a query may use the cache at all (see ModelLLM.query).
+    """
+
+    def __init__(self, db_path: str = None, max_bytes: int = 128 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600):
+        self.PATH_self_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        self.db_path = db_path or os.path.join(self.PATH_self_dir, 'data', 'dbms', 'response_cache.db')
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bypassed = 0
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tblResponseCache ("
+                "CacheKey TEXT PRIMARY KEY, ModelId TEXT NOT NULL, Payload TEXT NOT NULL, "
+                "SizeBytes INTEGER NOT NULL, CreatedOn REAL NOT NULL, LastAccess REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def make_key(model_id: str, prompt, generation_args: dict, thinking_budget=False) -> str:
+        key_source = json.dumps({"model": model_id, "messages": prompt, "args": generation_args or {},
+                                 "thinking_budget": thinking_budget}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Returns (True, response) on a hit, (False, None) on a miss or an expired entry."""
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute("SELECT Payload, CreatedOn FROM tblResponseCache WHERE CacheKey = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM tblResponseCache WHERE CacheKey = ?", (key,))
+                    self.expired += 1
+                    row = None
+                elif row:
+                    conn.execute("UPDATE tblResponseCache SET LastAccess = ? WHERE CacheKey = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Response cache lookup failed: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, json.loads(row[0])
+
+    def put(self, key: str, model_id: str, response):
+        payload_str = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tblResponseCache (CacheKey, ModelId, Payload, SizeBytes, CreatedOn, LastAccess) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_id, payload_str, len(payload_str.encode('utf-8')), now, now))
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"\t\t [⚠️-ERROR] Response cache store failed: {e}")
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        conn.execute("DELETE FROM tblResponseCache WHERE CreatedOn < ?", (time.time() - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(SizeBytes), 0) FROM tblResponseCache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT CacheKey, SizeBytes FROM tblResponseCache ORDER BY LastAccess ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM tblResponseCache WHERE CacheKey = ?", stale)
+
+    def clear(self, model_id: str = None):
+        with self._lock, self._connect() as conn:
+            if model_id is None:
+                conn.execute("DELETE FROM tblResponseCache")
+            else:
+                conn.execute("DELETE FROM tblResponseCache WHERE ModelId = ?", (model_id,))
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(SizeBytes), 0) FROM tblResponseCache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired, "bypassed": self.bypassed,
+                "entries": entries, "bytes": size, "max_bytes": self.max_bytes, "ttl_seconds": self.ttl_seconds}
@@ -0,0 +1,94 @@
+import os
+import time
+import socket
+import select
+
+
+# Loopback UDP port the API process pings whenever it enqueues work. UDP on 127.0.0.1 works the same on
+# Windows and Linux, needs no shared files and a lost or unheard datagram costs nothing: the worker
+# still polls on its idle back-off.
+NOTIFY_HOST = "127.0.0.1"
+NOTIFY_PORT = int(os.environ.get("PEPPER_NOTIFY_PORT", 47831))
+
+
+class TaskNotifier:
+    """Sender side, used by DBManager: fire-and-forget 'there is new work' pings."""
+
+    def __init__(self, host: str = NOTIFY_HOST, port: int = NOTIFY_PORT):
+        self.address = (host, port)
+        self.sent = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def notify(self, reason: str = "task"):
+        """Never raises: a missed wakeup only delays the task until the worker's next poll."""
+        try:
+            self._sock.sendto(reason.encode("utf-8")[:64], self.address)
+            self.sent += 1
+        except OSError:
+            pass
+
+
+class TaskListener:
+    """
+    Receiver side, used by the worker loop. wait(timeout) returns True as soon as a ping arrives and False
+    when the timeout passes without one. If the port cannot be bound (another listener on this host owns it)
+    wait() degrades to a plain sleep, i.e. the old polling behaviour.
+    """
+
+    def __init__(self, host: str = NOTIFY_HOST, port: int = NOTIFY_PORT):
+        self.address = (host, port)
+        self.received = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self._sock.bind(self.address)
+            self._sock.setblocking(False)
+            self.bound = True
+        except OSError as e:
+            print(f"\t\t [⚠️-ERROR] TaskListener could not bind {host}:{port} ({e}); falling back to polling.")
+            self._sock.close()
+            self._sock = None
+            self.bound = False
+
+    def _drain(self) -> int:
+        """Consumes every queued ping, so a burst of enqueues results in a single wakeup."""
+        count = 0
+        while True:
+            try:
+                self._sock.recv(64)
+                count += 1
+            except (BlockingIOError, InterruptedError):
+                return count
+            except OSError:
+                # e.g. WSAECONNRESET on Windows after an ICMP port-unreachable; the socket is still usable
+                return count
+
+    def wait(self, timeout: float) -> bool:
+        if self._sock is None:
+            time.sleep(timeout)
+            return False
+        readable, _, _ = select.select([self._sock], [], [], timeout)
+        if not readable:
+            return False
+        self.received += self._drain()
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class EventWakeup:
+    """
+    wait(timeout) over a multiprocessing.Event, for worker processes run by WorkerSupervisor: the supervisor
+    owns the TaskListener and sets every worker's event when a ping arrives.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def wait(self, timeout: float) -> bool:
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
@@ -1,4 +1,5 @@
 import os
+import io
 import json
 from docx import Document
 import docx
@@ -9,20 +10,109 @@ from typing import Dict, List
 import docxedit  # Make sure this is installed
 import sys
 import copy
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils import model_llm
+from utils import model_registry
+from utils.parse_cache import get_parse_cache
+from utils import docx_fastreader
+
+# Bump whenever read() / section detection changes the shape of the parsed JSON, so cached parses are ignored
+PARSER_VERSION = "2"
 
 class WordFileManager:
-    def __init__(self, filepath: str):
+
+    # Headers commonly used in resumes; used by the heuristic section detector
+    COMMON_SECTION_HEADERS = {
+        "SUMMARY", "PROFESSIONAL SUMMARY", "PROFILE", "PROFESSIONAL PROFILE", "OBJECTIVE", "CAREER OBJECTIVE",
+        "ABOUT ME", "OVERVIEW", "EXPERIENCE", "WORK EXPERIENCE", "PROFESSIONAL EXPERIENCE", "EMPLOYMENT HISTORY",
+        "RELEVANT EXPERIENCE", "RESEARCH EXPERIENCE", "INTERNSHIPS", "EDUCATION", "ACADEMIC BACKGROUND",
+        "SKILLS", "TECHNICAL SKILLS", "CORE COMPETENCIES", "KEY SKILLS", "PROJECTS", "ACADEMIC PROJECTS",
+        "PERSONAL PROJECTS", "CERTIFICATIONS", "CERTIFICATES", "ACHIEVEMENTS", "ACHIEVEMENTS & CERTIFICATIONS",
+        "AWARDS", "HONORS", "HONORS & AWARDS", "PUBLICATIONS", "RESEARCH", "LANGUAGES", "INTERESTS", "HOBBIES",
+        "VOLUNTEERING", "VOLUNTEER EXPERIENCE", "LEADERSHIP", "ACTIVITIES", "EXTRACURRICULAR ACTIVITIES",
+        "COURSEWORK", "RELEVANT COURSEWORK", "REFERENCES", "TOOLS", "TECHNOLOGIES", "CONTACT",
+    }
+    HEADER_KEYWORDS = {"SUMMARY", "PROFILE", "OBJECTIVE", "EXPERIENCE", "EMPLOYMENT", "EDUCATION", "SKILLS",
+                       "PROJECTS", "CERTIFICATIONS", "CERTIFICATES", "ACHIEVEMENTS", "AWARDS", "HONORS",
+                       "PUBLICATIONS", "LANGUAGES", "INTERESTS", "COMPETENCIES", "COURSEWORK", "INTERNSHIPS",
+                       "VOLUNTEERING", "ACTIVITIES", "REFERENCES"}
+    HEADER_SCORE_CUTOFF = 0.5           # per-paragraph score needed to count as a header
+    SECTION_CONFIDENCE_THRESHOLD = 0.6  # document confidence below this falls back to the LLM
+    READERS = ("lxml", "docx")          # lxml: streaming fast path, docx: python-docx object model
+    DEFAULT_READER = "lxml"
+
+    # Which path section detection took, across every manager in this process
+    section_detection_counts = {"heuristic": 0, "llm": 0, "cache": 0}
+
+    def __init__(self, filepath: str = None, OBJ_ModelLLM=None, section_confidence_threshold: float = None, use_cache: bool = True, file_bytes: bytes = None, reader: str = None):
+        if filepath is None and file_bytes is None:
+            raise ValueError("WordFileManager needs either a filepath or file_bytes.")
+        self.reader = reader or self.DEFAULT_READER
+        if self.reader not in self.READERS:
+            raise ValueError(f"reader must be one of {self.READERS}, got '{self.reader}'")
+        self.paragraph_records = None  # paragraphs from the lxml reader, parsed once
         self.filepath = filepath
+        self.file_bytes = file_bytes  # raw .docx bytes, read from filepath at most once
         self.sections = {}  # structured resume data
         self.formatting = {}  # global formatting metadata
         self.doc = None
         self.BULLETS_RE = re.compile(r"[•·●◦\-–—•]")
         self.STAR_FMT_RE = re.compile(r"[*_`]+")
         self.PATH_self_dir = os.path.join(os.path.dirname(__file__))
-        self.OBJ_ModeLLM = model_llm.ModelLLM()
-        self._get_known_sections(self.filepath)
+        # Share the process-wide model instead of reloading the weights for every resume.
+        # It is only fetched if the heuristic section detector is not confident enough.
+        self.OBJ_ModeLLM = OBJ_ModelLLM
+        self.section_confidence_threshold = self.SECTION_CONFIDENCE_THRESHOLD if section_confidence_threshold is None else section_confidence_threshold
+        self.section_detection = {}
+        self.known_sections = None  # detected lazily by read(), skipped on a parse cache hit
+        self.use_cache = use_cache
+
+    @classmethod
+    def from_bytes(cls, file_bytes: bytes, OBJ_ModelLLM=None, **kwargs):
+        """Build a manager straight from in-memory .docx bytes (e.g. an upload), without touching disk."""
+        return cls(None, OBJ_ModelLLM, file_bytes=file_bytes, **kwargs)
+
+    def get_bytes(self) -> bytes:
+        if self.file_bytes is None:
+            with open(self.filepath, 'rb') as f:
+                self.file_bytes = f.read()
+        return self.file_bytes
+
+    def load_document(self) -> Document:
+        """
+        Parses the .docx package with python-docx once per manager. With reader="docx", section detection
+        and read() share this Document with write(); with the default lxml reader it is only built for write().
+        """
+        if self.doc is None:
+            self.doc = Document(io.BytesIO(self.get_bytes()))
+        return self.doc
+
+    def iter_paragraphs(self):
+        """
+        Top-level body paragraphs for the read-only paths (section detection, docx_to_text, read()).
+        The lxml reader streams them out of the zip without building python-docx objects; write() always
+        works on the python-docx Document.
+        """
+        if self.reader == "lxml":
+            if self.paragraph_records is None:
+                self.paragraph_records = docx_fastreader.read_body_paragraphs(self.get_bytes())
+            return self.paragraph_records
+        return self.load_document().paragraphs
+
+    def _font_size_pt(self, run):
+        if isinstance(run, docx_fastreader.RunRecord):
+            return run.size_pt
+        return run.font.size.pt if run.font.size else None
+
+    def _style_name(self, para) -> str:
+        if isinstance(para, docx_fastreader.ParagraphRecord):
+            return para.style_name or ""
+        return (para.style.name if para.style is not None else "") or ""
+
+    def get_model(self):
+        if self.OBJ_ModeLLM is None:
+            self.OBJ_ModeLLM = model_registry.acquire_model()
+        return self.OBJ_ModeLLM
 
     def _format_text(self, run: Run) -> str:
         text = run.text
@@ -35,19 +125,120 @@ class WordFileManager:
         return text
     
     
-    def docx_to_text(self, path: str) -> str:
-        doc = docx.Document(path)
-        return "\n".join(p.text.strip() for p in doc.paragraphs if p.text.strip())
-    
-    
-    def _get_known_sections(self, docx_path: str) -> list[str]:
+    def docx_to_text(self, path: str = None, doc: Document = None) -> str:
+        if doc is not None:
+            paragraphs = doc.paragraphs
+        else:
+            paragraphs = docx.Document(path).paragraphs if path else self.iter_paragraphs()
+        return "\n".join(p.text.strip() for p in paragraphs if p.text.strip())
+
+
+    def _score_header(self, para, norm_text: str) -> tuple:
+        """
+        Scores how much a paragraph looks like a section header, from 0 to 1.
+        Returns (score, vocabulary_match).
+        """
+        if not norm_text or len(norm_text) > 30 or len(norm_text.split()) > 5:
+            return 0.0, False
+
+        score = 0.15  # short enough to be a header
+        vocab_match = False
+        if norm_text in self.COMMON_SECTION_HEADERS:
+            score += 0.45
+            vocab_match = True
+        elif set(re.split(r"[\s&/,]+", norm_text)) & self.HEADER_KEYWORDS:
+            score += 0.3
+            vocab_match = True
+
+        letters = [c for c in para.text if c.isalpha()]
+        if letters and all(c.isupper() for c in letters):
+            score += 0.15
+
+        text_runs = [run for run in para.runs if run.text.strip()]
+        if text_runs and all(run.bold for run in text_runs):
+            score += 0.15
+
+        if self._style_name(para).lower().startswith(("heading", "title")):
+            score += 0.1
+
+        return min(score, 1.0), vocab_match
+
+
+    def _detect_sections_heuristic(self, paragraphs) -> tuple:
+        """
+        Deterministic section-header detection from paragraph style, bold/caps runs, length and a
+        vocabulary of common resume headers. Returns (headers, confidence) where headers uses the same
+        "TITLE_<info>" convention as the LLM path.
+        """
+        headers = []
+        title_lines = []
+        vocab_matches = 0
+        for para in paragraphs:
+            text = para.text.strip()
+            if not text:
+                continue
+            norm_text = self.normalize(text)
+            score, vocab_match = self._score_header(para, norm_text)
+            if score >= self.HEADER_SCORE_CUTOFF:
+                headers.append(norm_text)
+                vocab_matches += int(vocab_match)
+            elif not headers:
+                title_lines.append(text)
+
+        if not headers:
+            return [], 0.0
+
+        # Confident when most headers are recognisable and there is more than one of them
+        confidence = (vocab_matches / len(headers)) * min(1.0, len(headers) / 2)
+        if title_lines:
+            headers.insert(0, "TITLE_" + " | ".join(title_lines))
+        return headers, confidence
+
+
+    def _get_known_sections(self) -> list[str]:
         """
         1. Reads a .docx resume.
-        2. Sends the text to Gemini with a prompt that asks ONLY for section headers
+        2. Tries the heuristic header detector first; only if its confidence is below
+        section_confidence_threshold, sends the text to the LLM with a prompt that asks ONLY for section headers
         (including inferred 'SUMMARY' if no explicit title).
         3. Returns a Python list of headers in document order.
         """
-        resume_text = self.docx_to_text(docx_path)
+        t1 = time.time()
+        paragraphs = self.iter_paragraphs()
+        header_list, confidence = self._detect_sections_heuristic(paragraphs)
+        method = "heuristic"
+        if confidence < self.section_confidence_threshold:
+            method = "llm"
+            header_list = self._get_known_sections_llm(self.docx_to_text())
+
+        # Ensure it's a list of uppercase strings (deduplicated, order kept)
+        self.known_sections = []
+        seen    = set()
+        for h in header_list:
+            h_upper = h.strip().upper()
+            if h_upper and h_upper not in seen:
+                self.known_sections.append(h_upper)
+                seen.add(h_upper)
+
+        WordFileManager.section_detection_counts[method] += 1
+        self.section_detection = {"method": method,
+                                  "confidence": round(confidence, 3),
+                                  "headers": len(self.known_sections),
+                                  "seconds": round(time.time() - t1, 3)}
+        return self.known_sections
+
+
+    @classmethod
+    def section_detection_summary(cls) -> dict:
+        """Fraction of parses in this process that skipped the model for section detection."""
+        counts = cls.section_detection_counts
+        total = sum(counts.values())
+        return {**counts,
+                "skipped_model_fraction": round((counts["heuristic"] + counts["cache"]) / total, 3) if total else None}
+
+
+    def _get_known_sections_llm(self, resume_text: str) -> list:
+        """Asks the LLM for the section headers of the resume text, in document order."""
 
         system_prompt = {"role": "system", "content":  f"""
                         You will be given a resume document. Your task is to analyze its structure and return a list of section headers that are present in the resume.
@@ -67,21 +258,13 @@ class WordFileManager:
                         """}
         
         prompt = [system_prompt, input_prompt]
-        output = self.OBJ_ModeLLM.query(prompt)
+        # Section headers of identical text are worth reusing even though the default generation samples
+        output = self.get_model().query(prompt, use_cache=True, response_schema={"type": "array", "items": {"type": "string"}})
         raw = output.strip()
         start = raw.find('[')
         end   = raw.rfind(']') + 1
         isolated_str = raw[start:end]
-        header_list = ast.literal_eval(isolated_str)
-
-        # Ensure it's a list of uppercase strings (deduplicated, order kept)
-        self.known_sections = []
-        seen    = set()
-        for h in header_list:
-            h_upper = h.strip().upper()
-            if h_upper and h_upper not in seen:
-                self.known_sections.append(h_upper)
-                seen.add(h_upper)
+        return ast.literal_eval(isolated_str)
 
 
     def normalize(self, s: str) -> str:
@@ -104,10 +287,23 @@ class WordFileManager:
         return None
 
     def read(self):
-        self.doc = Document(self.filepath)
+        content_hash = None
+        if self.use_cache:
+            content_hash = get_parse_cache().content_hash(self.get_bytes())
+            cached = get_parse_cache().get(content_hash, PARSER_VERSION)
+            if cached:
+                self.sections = cached["sections"]
+                self.known_sections = cached["known_sections"]
+                WordFileManager.section_detection_counts["cache"] += 1
+                self.section_detection = {"method": "cache", "headers": len(self.known_sections)}
+                return
+
+        if self.known_sections is None:
+            self._get_known_sections()
+
         current_section = None
 
-        for para in self.doc.paragraphs:
+        for para in self.iter_paragraphs():
             para_text = "".join([self._format_text(run) for run in para.runs])
             if not para_text:
                 continue
@@ -118,7 +314,7 @@ class WordFileManager:
                 self.sections[current_section] = {
                     "content": [],
                     "formatting": {
-                        "font_size": para.runs[0].font.size.pt if para.runs[0].font.size else None,
+                        "font_size": self._font_size_pt(para.runs[0]),
                         "bold": para.runs[0].bold,
                         "italic": para.runs[0].italic
                     }
@@ -132,6 +328,9 @@ class WordFileManager:
             if "TITLE" in section:
                 self.sections["TITLE"] = section.split("TITLE_")[1]
 
+        if content_hash is not None:
+            get_parse_cache().put(content_hash, PARSER_VERSION, {"sections": self.sections, "known_sections": self.known_sections})
+
     def mark_updates_for_docxedit(self, change_suggestions: dict):
         """
         Combine Agent‑5 suggestions into self.sections so write() can
@@ -179,78 +378,123 @@ class WordFileManager:
             # print(json.dumps(self.sections, indent=2, ensure_ascii=False))
 
 
-    def replace_paragraph_runs(self, doc: Document, old_str_full: str, new_str_full: str) -> bool:
+    def _paragraph_key(self, text: str) -> str:
+        """Cleaned paragraph text used for exact matching (aligns with read() and mark_updates_for_docxedit)."""
+        return text.replace('\n', ' ').strip()
+
+    def iter_all_paragraphs(self, doc: Document):
+        """Yields body paragraphs followed by the paragraphs of every table cell (nested tables included)."""
+        yield from doc.paragraphs
+        for table in doc.tables:
+            yield from self._iter_table_paragraphs(table)
+
+    def _iter_table_paragraphs(self, table):
+        seen_cells = set()
+        for row in table.rows:
+            for cell in row.cells:
+                # Merged cells are returned once per grid position; visit each underlying cell once
+                if id(cell._tc) in seen_cells:
+                    continue
+                seen_cells.add(id(cell._tc))
+                yield from cell.paragraphs
+                for nested_table in cell.tables:
+                    yield from self._iter_table_paragraphs(nested_table)
+
+    def build_paragraph_index(self, doc: Document) -> dict:
+        """
+        Maps cleaned paragraph text -> list of paragraphs (body and tables, in document order), so that a whole
+        edit set can be applied without rescanning the document for every edit.
+        """
+        paragraph_index = {}
+        for paragraph in self.iter_all_paragraphs(doc):
+            paragraph_index.setdefault(self._paragraph_key(paragraph.text), []).append(paragraph)
+        return paragraph_index
+
+    def replace_paragraph_runs(self, doc: Document, old_str_full: str, new_str_full: str, paragraph_index: dict = None) -> bool:
         """
         Replaces run-level text in a paragraph that matches `old_str_full` with aligned substrings
         from `new_str_full`, preserving formatting and handling edge cases with proportional distribution.
+        If `paragraph_index` (from build_paragraph_index) is given, the paragraph is looked up in it and the
+        index is updated with the paragraph's new text; otherwise every paragraph is scanned.
         """
-        for paragraph in doc.paragraphs:
-            # Cleaned match to handle whitespace/newlines (aligns with your read() and mark_updates_for_docxedit)
-            cleaned_para = paragraph.text.replace('\n', ' ').strip()
-            cleaned_old = old_str_full.replace('\n', ' ').strip()
-            if cleaned_old == cleaned_para:  # Exact match on cleaned text (safer than 'in')
-                runs = paragraph.runs
-                if not runs:
-                    # No runs: Add new text as a single run
-                    paragraph.add_run(new_str_full)
-                    return True
-
-                # Get original run lengths (handle empty runs)
-                old_lengths = [len(run.text) for run in runs]
-                total_old = sum(old_lengths)
-                if total_old == 0:
-                    # All empty: Add to first or create one
-                    if runs:
-                        runs[0].text = new_str_full
-                    else:
-                        paragraph.add_run(new_str_full)
-                    return True
-
-                # Distribute new_str_full proportionally (fixes uneven lengths/short runs)
-                new_parts = []
-                pos = 0
-                for length in old_lengths:
-                    if length == 0:
-                        new_parts.append('')  # Preserve empty runs (e.g., for spacing)
-                        continue
-                    # Proportional slice (scales to new length)
-                    proportion = length / total_old
-                    slice_len = int(len(new_str_full) * proportion)
-                    slice_len = max(1, slice_len)  # Avoid zero-length for short runs
-                    end = min(pos + slice_len, len(new_str_full))
-                    new_parts.append(new_str_full[pos:end])
-                    pos = end
-
-                # Append any remainder to the last non-empty part (handles longer new text)
-                if pos < len(new_str_full):
-                    for i in range(len(new_parts) - 1, -1, -1):
-                        if new_parts[i]:
-                            new_parts[i] += new_str_full[pos:]
-                            break
-                    else:
-                        new_parts[-1] += new_str_full[pos:]
-
-                # Apply new parts to runs (preserves each run's formatting)
-                for i, run in enumerate(runs):
-                    run.text = new_parts[i]
-
-                # Clean up empty runs (avoids bloat, but keeps formatting-only ones)
-                for run in list(paragraph.runs):
-                    if not run.text.strip() and not self.is_formatting_only_run(run):
-                        run._element.getparent().remove(run._element)
-
-                # If new text is much longer, add a new run for overflow (copies last run's formatting)
-                if len(paragraph.text) > 1.5 * len(old_str_full):  # Adjustable threshold
-                    last_run = paragraph.runs[-1] if paragraph.runs else None
-                    if last_run and len(last_run.text) > 2 * old_lengths[-1]:
-                        overflow_text = last_run.text[old_lengths[-1]:]
-                        last_run.text = last_run.text[:old_lengths[-1]]
-                        new_run = paragraph.add_run(overflow_text)
-                        self.copy_formatting(last_run, new_run)
-
-                return True
-        return False
-    
+        cleaned_old = self._paragraph_key(old_str_full)
+        if paragraph_index is None:
+            paragraph = next((p for p in self.iter_all_paragraphs(doc) if self._paragraph_key(p.text) == cleaned_old), None)
+        else:
+            matches = paragraph_index.get(cleaned_old)
+            paragraph = matches[0] if matches else None
+        if paragraph is None:
+            return False
+
+        self._rewrite_paragraph_runs(paragraph, old_str_full, new_str_full)
+
+        if paragraph_index is not None:
+            matches.pop(0)
+            if not matches:
+                del paragraph_index[cleaned_old]
+            paragraph_index.setdefault(self._paragraph_key(paragraph.text), []).append(paragraph)
+        return True
+
+    def _rewrite_paragraph_runs(self, paragraph, old_str_full: str, new_str_full: str):
+        """Distributes `new_str_full` over the paragraph's existing runs so each keeps its formatting."""
+        runs = paragraph.runs
+        if not runs:
+            # No runs: Add new text as a single run
+            paragraph.add_run(new_str_full)
+            return
+
+        # Get original run lengths (handle empty runs)
+        old_lengths = [len(run.text) for run in runs]
+        total_old = sum(old_lengths)
+        if total_old == 0:
+            # All empty: Add to first or create one
+            if runs:
+                runs[0].text = new_str_full
+            else:
+                paragraph.add_run(new_str_full)
+            return
+
+        # Distribute new_str_full proportionally (fixes uneven lengths/short runs)
+        new_parts = []
+        pos = 0
+        for length in old_lengths:
+            if length == 0:
+                new_parts.append('')  # Preserve empty runs (e.g., for spacing)
+                continue
+            # Proportional slice (scales to new length)
+            proportion = length / total_old
+            slice_len = int(len(new_str_full) * proportion)
+            slice_len = max(1, slice_len)  # Avoid zero-length for short runs
+            end = min(pos + slice_len, len(new_str_full))
+            new_parts.append(new_str_full[pos:end])
+            pos = end
+
+        # Append any remainder to the last non-empty part (handles longer new text)
+        if pos < len(new_str_full):
+            for i in range(len(new_parts) - 1, -1, -1):
+                if new_parts[i]:
+                    new_parts[i] += new_str_full[pos:]
+                    break
+            else:
+                new_parts[-1] += new_str_full[pos:]
+
+        # Apply new parts to runs (preserves each run's formatting)
+        for i, run in enumerate(runs):
+            run.text = new_parts[i]
+
+        # Clean up empty runs (avoids bloat, but keeps formatting-only ones)
+        for run in list(paragraph.runs):
+            if not run.text.strip() and not self.is_formatting_only_run(run):
+                run._element.getparent().remove(run._element)
+
+        # If new text is much longer, add a new run for overflow (copies last run's formatting)
+        if len(paragraph.text) > 1.5 * len(old_str_full):  # Adjustable threshold
+            last_run = paragraph.runs[-1] if paragraph.runs else None
+            if last_run and len(last_run.text) > 2 * old_lengths[-1]:
+                overflow_text = last_run.text[old_lengths[-1]:]
+                last_run.text = last_run.text[:old_lengths[-1]]
+                new_run = paragraph.add_run(overflow_text)
+                self.copy_formatting(last_run, new_run)
 
     def is_formatting_only_run(self, run):
         """Check if a run is empty but carries formatting (e.g., bold space)."""
@@ -270,18 +514,20 @@ class WordFileManager:
         replacement_pairs = self.generate_replacement_pairs_from_docx()
 
         # Then apply them using docxedit:
-        doc = Document(self.filepath)
+        doc = self.load_document()
         for old, new in replacement_pairs:
             docxedit.replace_string(doc, old_string=old, new_string=new)
 
         doc.save(output_doc_path)
     
-    def write(self, output_path: str):
+    def write(self, output_path: str = None) -> bytes:
         """
         Uses docxedit to replace existing content without breaking formatting.
-        Assumes original file still exists and edits in-place.
+        Edits the already loaded Document in-place, saves it to output_path (if given)
+        and returns the written .docx bytes so they can be re-parsed without reading the file back.
         """
-        doc = Document(self.filepath)
+        doc = self.load_document()
+        paragraph_index = self.build_paragraph_index(doc)
         replacements_made = 0
 
         for section, data in self.sections.items():
@@ -295,14 +541,20 @@ class WordFileManager:
                         try:
                             # replacement_pairs = self.generate_replacement_pairs_from_docx(doc, old, new)
                             # for replacement_pair in replacement_pairs:
-                            if(self.replace_paragraph_runs(doc, old, new)):
+                            if(self.replace_paragraph_runs(doc, old, new, paragraph_index)):
                             # docxedit.replace_string(doc, old_string=old, new_string=new)
                                 replacements_made += 1
                         except Exception as e:
                             print(f"\t\t [!] -WordParser- Could not replace:\n'{old}' ➝ '{new}'\nError: {e}")
 
-        doc.save(output_path)
         # print(f"[+] Updated {replacements_made} item(s) in '{output_path}'")
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        output_bytes = buffer.getvalue()
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(output_bytes)
+        return output_bytes
 
     def export_json(self, output_path: str = None):
         """
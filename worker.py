@@ -1,41 +1,86 @@
 import os
-import time
 import json
+import time
+import uuid
+import socket
+import hashlib
+import traceback
 from data.dbms_manager import DBManager
 from utils.wordparser import WordFileManager
-from utils.model_llm import ModelLLM
+from utils import model_registry
+from utils.task_notifier import TaskListener
+from utils.progress_store import RequestProgressStore, ProgressReporter
+from utils.lease_heartbeat import LeaseHeartbeat, LeaseLost
+from utils.job_fingerprint import job_fingerprint
+from utils.job_index import JobIndex
 from agents import agent2, agent3, agent4, agent5
 
 class Worker:
 
-    def __init__(self):
+    # Idle back-off between queue polls: doubles while the queue stays empty, resets on any task or wakeup
+    IDLE_SLEEP_MIN = 0.5
+    IDLE_SLEEP_MAX = 30.0
+    # The request Types this worker has handlers for; it never claims anything else from tblRequests
+    TASK_TYPES = ("Parse", "Curate")
+    # How often this worker looks for requests whose worker died (expired leases) and re-queues them
+    REQUEUE_INTERVAL = 30.0
+    # Reposted jobs: an earlier request whose posting is at least this similar (MinHash Jaccard) lends its Agent3
+    # output, and Agent4's own output too when Agent4 ran on exactly the same inputs and the request was not rejected
+    NEAR_DUPLICATE_SIMILARITY = 0.8
+    REUSE_NEAR_DUPLICATE_AGENT4 = True
+
+    def __init__(self, wakeup=None):
         self.PATH_self_dir = os.path.dirname(os.path.realpath(__file__))
+        # Recorded on every request this worker claims, so concurrent workers can be told apart
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Anything with wait(timeout) -> bool; by default the API's loopback pings (utils/task_notifier.py)
+        self.wakeup = wakeup or TaskListener()
+        # Heartbeat of the request being processed, see utils/lease_heartbeat.py
+        self.lease = None
         self.initialize_utils()
 
 
     def initialize_utils(self):
 
-        self.OBJ_db = DBManager()
+        self.OBJ_ModelLLM = model_registry.acquire_model()
+        print("\t\t [✅-INFO] ModelLLM initialized successfully.")
+
+        self.OBJ_db = DBManager(self.OBJ_ModelLLM)
         self.OBJ_db.test_connection()
+        self.OBJ_db.ensure_schema()
         print("\t\t [✅-INFO] DBManager initialized successfully.")
 
-        self.OBJ_ModelLLM = ModelLLM()
-        print("\t\t [✅-INFO] ModelLLM initialized successfully.")
+        # Per-agent progress and partial output, streamed to users by the API (/user/request/stream)
+        self.OBJ_progress = RequestProgressStore()
+
+        # Near-duplicate index of curated job descriptions, filled from the database once (by whichever worker
+        # gets there first); returns at once when that already happened or another worker is on it
+        self.job_index = JobIndex(threshold=self.NEAR_DUPLICATE_SIMILARITY)
+        self.job_index.backfill(self.OBJ_db.fetch_curated_job_descriptions)
+
+    def check_lease(self):
+        """Stops work on the current request if its lease was lost to another worker (raises LeaseLost)."""
+        if self.lease is not None:
+            self.lease.check()
 
-    def parse_resume(self, task):
+    def parse_resume(self, task, progress: ProgressReporter):
 
-        self.OBJ_db.update_task_info(task["Id"], status="processing")
+        # The request was already flipped to 'processing' when this worker claimed it
         print(f"\t\t [📦-INFO] Parsing resume ...")
         
         resume_path = os.path.join(self.PATH_self_dir, 'data', task["Input"])
-        OBJResume = WordFileManager(resume_path)
+        OBJResume = WordFileManager(resume_path, self.OBJ_ModelLLM)
         OBJResume.read()
         parsed_resume = OBJResume.export_json()
+        print(f"\t\t [📦-INFO] Section detection: {OBJResume.section_detection} | Process totals: {WordFileManager.section_detection_summary()}")
 
         print(f"\t\t [🧠-INFO] Running Agent2 ...")
+        progress.agent_started("Agent2")
         agent2_instance = agent2.Agent2VirtualMe(self.OBJ_ModelLLM)
-        vimi_json = agent2_instance.run(parsed_resume)
+        vimi_json = agent2_instance.run(parsed_resume, on_text=progress.on_text)
+        progress.agent_finished("Agent2", vimi_json)
 
+        self.check_lease()
         print(f"\t\t [📦-INFO] Updating DataBase ...")
         # Prepare agent_outputs dict for update_task_info
         agent_outputs = {"Agent2": vimi_json}
@@ -43,73 +88,173 @@ class Worker:
         status = "finished"
         self.OBJ_db.update_task_info(task["Id"], agent_outputs, status)
         self.OBJ_db.update_tblResume(task["ResumeId"], vimi_json)
+        progress.request_finished(status)
 
 
-    def curate_resume(self, task):
+    @staticmethod
+    def inputs_hash(*inputs) -> str:
+        """Order-stable hash of a stage's JSON inputs, stored with its checkpoint to tell when it can be reused."""
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def run_stage(self, task, checkpoints: dict, stage: str, run, column: str = None, inputs_hash: str = None):
+        """
+        Runs one stage of a request and checkpoints its output (DBManager.save_stage_checkpoint) the moment it
+        finishes. A stage already in `checkpoints` (from an earlier, interrupted attempt) is skipped and its
+        saved output returned instead.
+        """
+        self.check_lease()
+        if stage in checkpoints:
+            print(f"\t\t [📦-INFO] {stage} already finished in an earlier attempt ({checkpoints[stage]['seconds']}s), skipping it")
+            return checkpoints[stage]["output"]
+        started = time.perf_counter()
+        output = run()
+        seconds = time.perf_counter() - started
+        self.OBJ_db.save_stage_checkpoint(task["Id"], stage, output, seconds, column=column, inputs_hash=inputs_hash)
+        checkpoints[stage] = {"output": output, "seconds": round(seconds, 3)}
+        print(f"\t\t [📦-INFO] {stage} checkpointed after {seconds:.1f}s")
+        return output
+
+    def curate_resume(self, task, progress: ProgressReporter):
 
         resume_details = self.OBJ_db.fetch_resume_detail(task["ResumeId"], fetch_resume_parse=True)
+        # Stages a previous attempt at this request already finished
+        state = self.OBJ_db.fetch_stage_checkpoints(task["Id"])
+        checkpoints = state["stages"]
 
         if task['Status'] == 'queued':
             agent_outputs = {"Agent2": json.loads(resume_details["ResumeJson"])}
             # print(json.dumps(agent_outputs["Agent2"], indent=2))    
 
-            print(f"\t\t [🧠-INFO] Running Agent3 ...")
-            agent3_instance = agent3.Agent3Recruiter(self.OBJ_ModelLLM)
-            agent3_recruiter_response = agent3_instance.run(task["Input"])
-            agent_outputs.update({"Agent3": agent3_recruiter_response})
+            # The closest earlier request for a near-identical posting, if any
+            near_match = self.job_index.nearest(task["Input"], exclude=task["Id"])
+            near_state = self.OBJ_db.fetch_stage_checkpoints(near_match["request_id"]) if near_match else {"stages": {}, "agents": {}}
+            near_outputs = near_state["agents"]
+
+            def run_agent3():
+                progress.agent_started("Agent3")
+                # Other users may have curated against the same posting already
+                fingerprint = job_fingerprint(task["Input"])
+                agent3_recruiter_response = self.OBJ_db.fetch_job_analysis(fingerprint, self.OBJ_ModelLLM.ModelLoaded)
+                if agent3_recruiter_response is not None:
+                    print(f"\t\t [🧠-INFO] Agent3 job analysis found in the shared cache ({fingerprint[:12]})")
+                elif near_outputs.get("Agent3"):
+                    agent3_recruiter_response = near_outputs["Agent3"]
+                    print(f"\t\t [🧠-INFO] Agent3 job analysis reused from near-duplicate request {near_match['request_id']} "
+                          f"(similarity {near_match['similarity']})")
+                else:
+                    print(f"\t\t [🧠-INFO] Running Agent3 ...")
+                    agent3_instance = agent3.Agent3Recruiter(self.OBJ_ModelLLM)
+                    agent3_recruiter_response = agent3_instance.run(task["Input"], on_text=progress.on_text)
+                    # An unparseable recruiter answer is not worth sharing
+                    if "error" not in agent3_recruiter_response["recruiter"]:
+                        self.OBJ_db.save_job_analysis(fingerprint, self.OBJ_ModelLLM.ModelLoaded, agent3_recruiter_response)
+                progress.agent_finished("Agent3", agent3_recruiter_response)
+                self.job_index.add(task["Id"], task["Input"])
+                return agent3_recruiter_response
+
+            agent_outputs.update({"Agent3": self.run_stage(task, checkpoints, "Agent3", run_agent3, column="Agent3")})
             # print(json.dumps(agent_outputs["Agent3"], indent=2))
 
-            print('\t\t [🧠-INFO] Running Agent4 ...')
-            agent4_instance = agent4.Agent4CareerAdvisor(self.OBJ_ModelLLM)
-            agent4_career_coach_response = agent4_instance.run(agent_outputs["Agent2"],
-                                                               agent_outputs["Agent3"],
-                                                               resume_details['parsed_json'])
-            agent_outputs.update({"Agent4": agent4_career_coach_response})
+            agent4_inputs = self.inputs_hash(agent_outputs["Agent2"], agent_outputs["Agent3"], resume_details['parsed_json'])
+
+            def run_agent4():
+                progress.agent_started("Agent4")
+                # Agent4's own output (not the column the user edited on approval) for exactly the same inputs;
+                # advice the user rejected is never handed out again
+                near_agent4 = near_state["stages"].get("Agent4", {})
+                if (self.REUSE_NEAR_DUPLICATE_AGENT4 and near_state.get("status") != "rejected"
+                        and near_agent4.get("inputs_hash") == agent4_inputs and near_agent4.get("stage_output") is not None):
+                    print(f"\t\t [🧠-INFO] Agent4 advice reused from near-duplicate request {near_match['request_id']}")
+                    progress.agent_finished("Agent4", near_agent4["stage_output"])
+                    return near_agent4["stage_output"]
+                print('\t\t [🧠-INFO] Running Agent4 ...')
+                agent4_instance = agent4.Agent4CareerAdvisor(self.OBJ_ModelLLM)
+                agent4_career_coach_response = agent4_instance.run(agent_outputs["Agent2"],
+                                                                   agent_outputs["Agent3"],
+                                                                   resume_details['parsed_json'],
+                                                                   on_text=progress.on_text)
+                progress.agent_finished("Agent4", agent4_career_coach_response)
+                return agent4_career_coach_response
+
+            agent_outputs.update({"Agent4": self.run_stage(task, checkpoints, "Agent4", run_agent4, column="Agent4",
+                                                            inputs_hash=agent4_inputs)})
             # print(json.dumps(agent_outputs["Agent4"], indent=2))
+            self.check_lease()
             print(f"\t\t [📦-INFO] Updating DataBase ...")
             self.OBJ_db.update_task_info(task["Id"], agent_outputs, "pending")
+            progress.request_finished("pending")
 
 
         if task['Status'] == 'approved':
 
-            agent5_instance = agent5.Agent5ResumeCoach(self.OBJ_ModelLLM)
-            agent_outputs = self.OBJ_db.fetch_request_state(task["Id"])
+            # Read the outputs straight from tblRequestOutputs: the claim already flipped the request to 'processing'
+            agent_outputs = state["agents"]
 
             print(f"\t\t [📦-INFO] Fetching Resume JSON ...")
             PATH_in_full = os.path.join(self.PATH_self_dir ,'data', resume_details['FilePath'])
-            OBJ_WordFile = WordFileManager(PATH_in_full)
+            OBJ_WordFile = WordFileManager(PATH_in_full, self.OBJ_ModelLLM)
             OBJ_WordFile.read()
             resume_json = OBJ_WordFile.export_json()
 
-            print(f"\t\t [🧠-INFO] Running Agent5 ...")
-            resume_changes = agent5_instance.run(agent_outputs["agents"]["Agent4"], resume_json)
-            OBJ_WordFile.mark_updates_for_docxedit(resume_changes)
+            def run_agent5():
+                print(f"\t\t [🧠-INFO] Running Agent5 ...")
+                progress.agent_started("Agent5")
+                agent5_instance = agent5.Agent5ResumeCoach(self.OBJ_ModelLLM)
+                resume_changes = agent5_instance.run(agent_outputs["Agent4"], resume_json, on_text=progress.on_text)
+                progress.agent_finished("Agent5", resume_changes)
+                return resume_changes
+
+            resume_changes = self.run_stage(task, checkpoints, "Agent5", run_agent5)
 
             output_file_name = resume_details['Id'] + '.docx'
             PATH_out_rel = resume_details['FilePath'].replace('default_resumes', 'curated_resumes')
             PATH_out_rel = PATH_out_rel.replace(os.path.basename(resume_details['FilePath']), output_file_name)
-
-            print(f"\t\t [📦-INFO] Writing Curated Resume ...")
             PATH_out_full = os.path.join(self.PATH_self_dir, 'data', PATH_out_rel)
-            OBJ_WordFile.write(PATH_out_full)
 
-            updated_agent_outputs = {"Agent2" : agent_outputs["agents"]["Agent2"],
-                                     "Agent3" : agent_outputs["agents"]["Agent3"],
-                                     "Agent4" : agent_outputs["agents"]["Agent4"],
+            # Outside the CuratedResume stage: it is cheap and deterministic, and resume_json (saved as Agent5
+            # below) must carry the marked changes even when a resumed attempt skips writing the file
+            OBJ_WordFile.mark_updates_for_docxedit(resume_changes)
+            curated = {}
+
+            def write_curated_resume():
+                print(f"\t\t [📦-INFO] Writing Curated Resume ...")
+                curated["bytes"] = OBJ_WordFile.write(PATH_out_full)
+                return PATH_out_rel
+
+            if "CuratedResume" in checkpoints and not os.path.exists(PATH_out_full):
+                # The checkpoint outlived the file; write it again from the saved Agent5 changes
+                checkpoints.pop("CuratedResume")
+            self.run_stage(task, checkpoints, "CuratedResume", write_curated_resume)
+
+            updated_agent_outputs = {"Agent2" : agent_outputs["Agent2"],
+                                     "Agent3" : agent_outputs["Agent3"],
+                                     "Agent4" : agent_outputs["Agent4"],
                                      "Agent5" : resume_json}
             
             # Create Agent2 Output for Curated Resume-
-            OBJResumeCurated = WordFileManager(PATH_out_full)
-            OBJResumeCurated.read()
-            parsed_resume_curated = OBJResumeCurated.export_json()
-
-            print(f"\t\t [🧠-INFO] Running Agent2 ...")
-            agent2_instance = agent2.Agent2VirtualMe(self.OBJ_ModelLLM)
-            vimi_json = agent2_instance.run(parsed_resume_curated)
-
+            def run_curated_agent2():
+                # Re-parse the bytes just written, or the file an earlier attempt wrote
+                if "bytes" in curated:
+                    OBJResumeCurated = WordFileManager.from_bytes(curated["bytes"], self.OBJ_ModelLLM)
+                else:
+                    OBJResumeCurated = WordFileManager(PATH_out_full, self.OBJ_ModelLLM)
+                OBJResumeCurated.read()
+                parsed_resume_curated = OBJResumeCurated.export_json()
+
+                print(f"\t\t [🧠-INFO] Running Agent2 ...")
+                progress.agent_started("Agent2")
+                agent2_instance = agent2.Agent2VirtualMe(self.OBJ_ModelLLM)
+                vimi_json = agent2_instance.run(parsed_resume_curated, on_text=progress.on_text)
+                progress.agent_finished("Agent2", vimi_json)
+                return vimi_json
+
+            vimi_json = self.run_stage(task, checkpoints, "CuratedAgent2", run_curated_agent2)
+
+            self.check_lease()
             print(f"\t\t [📦-INFO] Updating DataBase ...")
             self.OBJ_db.update_tblResume(task["ResumeId"], vimi_json, FilePath=PATH_out_rel)
             self.OBJ_db.update_task_info(task["Id"], updated_agent_outputs, "finished")
+            progress.request_finished("finished")
             
 
     def replace_paragraph_text(doc, old_string, new_string, include_tables=True, show_errors=False):
@@ -152,22 +297,67 @@ class Worker:
                         
 
     def start_worker_loop(self):
-        print("\n\n\t\t[🚀-INIT] Process Queue Worker Intiated.")
-        
+        print(f"\n\n\t\t[🚀-INIT] Process Queue Worker Intiated. Worker Id - {self.worker_id}")
+
+        idle_sleep = self.IDLE_SLEEP_MIN
+        last_requeue = 0.0
         while True:
-            task = self.OBJ_db.get_next_pending_request()  # your own logic
+            if time.monotonic() - last_requeue >= self.REQUEUE_INTERVAL:
+                last_requeue = time.monotonic()
+                requeued = self.OBJ_db.requeue_expired_leases()
+                for request_id in requeued["dead_lettered"]:
+                    ProgressReporter(self.OBJ_progress, request_id).request_failed(
+                        f"Gave up after {self.OBJ_db.MAX_ATTEMPTS} attempts")
+
+            task = self.OBJ_db.get_next_pending_request(self.worker_id, task_types=self.TASK_TYPES)
 
             if task:
-                print_task_header = f"\n\n\t\t [📦-INFO] " + "="*10 + f" Running task - [{task['Id']}] | Type - [{task["Type"]}] " + "="*10
+                print_task_header = f"\n\n\t\t [📦-INFO] " + "="*10 + f" Running task - [{task['Id']}] | Type - [{task["Type"]}] | Attempt - [{task["Attempts"]}] " + "="*10
                 print(print_task_header)
                 
-                if task["Type"] == "Parse":
-                    self.parse_resume(task)
-                elif task["Type"] == "Curate":
-                    self.curate_resume(task)
-                
+                progress = ProgressReporter(self.OBJ_progress, task["Id"])
+                self.lease = LeaseHeartbeat(self.OBJ_db, task["Id"], self.worker_id).start()
+                try:
+                    if task["Type"] == "Parse":
+                        self.parse_resume(task, progress)
+                    elif task["Type"] == "Curate":
+                        self.curate_resume(task, progress)
+                    else:
+                        # Only reachable if TASK_TYPES lists a type without a handler; retrying would not help
+                        error = f"No handler for request type '{task['Type']}'"
+                        self.OBJ_db.release_request(task["Id"], self.worker_id, error, retry=False)
+                        progress.request_failed(error)
+                        print(f"\t\t [❌-ERROR] {error}, request {task['Id']} moved to '{self.OBJ_db.DEAD_LETTER_STATUS}'")
+                        continue
+                except LeaseLost as e:
+                    # Re-queued while this worker was still on it; whoever claims it next finishes it
+                    print(f"\t\t [⚠️-ERROR] {e}, dropping it")
+                    continue
+                except Exception as e:
+                    # One bad request must not take the worker down: log it, hand it back and move on
+                    traceback.print_exc()
+                    status = self.OBJ_db.release_request(task["Id"], self.worker_id, str(e))
+                    if status == self.OBJ_db.DEAD_LETTER_STATUS:
+                        progress.request_failed(str(e))
+                    print(f"\t\t [❌-ERROR] Task {task['Id']} failed: {e} (now '{status}')")
+                    continue
+                finally:
+                    self.lease.stop()
+                    self.lease = None
+
+                registry_stats = model_registry.registry_stats()
+                print(f"\t\t [🧠-INFO] Model loads this process: {registry_stats['load_count']} | RSS: {registry_stats['resident_memory_mb']} MB")
+
                 print("\t\t"+"="*(len(print_task_header)//2) + " [✅-INFO] Task completed! " + "="*(len(print_task_header)//2) + "\n\n")
-            time.sleep(10)
+                # Keep draining back-to-back while there is work
+                idle_sleep = self.IDLE_SLEEP_MIN
+                continue
+
+            # Queue is empty: sleep until the API signals new work or the back-off expires
+            if self.wakeup.wait(idle_sleep):
+                idle_sleep = self.IDLE_SLEEP_MIN
+            else:
+                idle_sleep = min(idle_sleep * 2, self.IDLE_SLEEP_MAX)
 
 if __name__ == "__main__":
     # Start the worker loop